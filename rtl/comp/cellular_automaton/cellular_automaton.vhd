@@ -19,7 +19,11 @@ use work.CELLULAR_AUTOMATON_CONFIG_PKG.all;
 entity CELLULAR_AUTOMATON is
 generic (
     -- Number of LEDs to be controlled
-    LEDS_NUM      : integer := 8
+    LEDS_NUM      : integer := 8;
+    -- Packed Cells' States Window and its format register (wide read multiplexer)
+    PACKED_WINDOW : boolean := false;
+    -- Cells' States Checksum and its status register (CRC-32 datapath)
+    CHECKSUM      : boolean := false
 );
 port (
     CLK     : in  std_logic;
@@ -41,7 +45,22 @@ port (
     --          Might overflow when Generations Limit is set to 0
     -- 0x0003 - Configured Column Size Register (R/-)
     -- 0x0004 - Configured Row Size Register (R/-)
-    -- 0x0003-0x3FFF - 0xDEADCAFE
+    -- 0x0005 - Packed Cells Format Register (R/-, only with PACKED_WINDOW or CHECKSUM)
+    --          Bits 15:0  - number of Cells packed in one word of the Packed Window
+    --          Bits 23:16 - C_STATE_WIDTH
+    --          Bit  24    - PACKED_WINDOW
+    --          Bit  25    - CHECKSUM
+    -- 0x0006 - Cells' States Checksum Register (R/-, only with CHECKSUM)
+    --          CRC-32 (as in zlib) of all words of the Packed Window
+    --          (little endian bytes, from the lowest address)
+    -- 0x0007 - Checksum Status Register (R/-, only with CHECKSUM)
+    --          Bit 0 - Checksum is valid (no Cell changed since it was computed)
+    -- 0x0008-0x1FFF - 0xDEADCAFE
+    -- 0x2000-0x3FFF - Packed Cells' States Window (R/-, only with PACKED_WINDOW)
+    --                 Word N holds states of Cells N*P to N*P+P-1 (P Cells per word),
+    --                 Cell N*P+k at bits (k+1)*C_STATE_WIDTH-1 downto k*C_STATE_WIDTH
+    --                 Read 0xDEADBEEF when out of bounds
+    -- Registers and the window of disabled features read 0xDEADCAFE.
     -- 0x4000-0x7FFF - Cells' States (R/W)
     --                 Read current Cell's State (any time)
     --                 Read 0xDEADBEEF when out of bounds
@@ -90,6 +109,36 @@ architecture FULL of CELLULAR_AUTOMATON is
     type wire_field_t    is array (COL_SIZE         -1 downto 0) of wire_row_t;
     type wire_long_row_t is array (ROW_SIZE*COL_SIZE-1 downto 0) of std_logic;
 
+    -- Packed Cells' States Window
+    constant PACKED_CELLS : integer := 32/C_STATE_WIDTH;
+    constant PACKED_WORDS : integer := (ROW_SIZE*COL_SIZE+PACKED_CELLS-1)/PACKED_CELLS;
+    type packed_words_t  is array (PACKED_WORDS     -1 downto 0) of std_logic_vector(32-1 downto 0);
+
+    function feature_bit(enabled : boolean; bit : integer) return integer is
+    begin
+        if (enabled) then
+            return 2**bit;
+        end if;
+        return 0;
+    end function;
+
+    -- Value of the Packed Cells Format Register
+    constant PACKED_FORMAT : integer := feature_bit(CHECKSUM,25)+feature_bit(PACKED_WINDOW,24)+C_STATE_WIDTH*2**16+PACKED_CELLS;
+
+    -- One step of CRC-32 (reflected, polynomial 0x04C11DB7) over a 32-bit word, LSB first
+    function crc32_word(crc : std_logic_vector(32-1 downto 0); data : std_logic_vector(32-1 downto 0)) return std_logic_vector is
+        variable c : std_logic_vector(32-1 downto 0) := crc;
+    begin
+        for i in 0 to 32-1 loop
+            if ((c(0) xor data(i))='1') then
+                c := ('0' & c(32-1 downto 1)) xor X"EDB88320";
+            else
+                c := '0' & c(32-1 downto 1);
+            end if;
+        end loop;
+        return c;
+    end function;
+
     -----------------------------------------------------------------------------
 
     -- -------------------------------------------------------------------------
@@ -112,6 +161,15 @@ architecture FULL of CELLULAR_AUTOMATON is
     signal cell_neighbours  : neigh_arr_2d_t;
     signal cell_state       : cell_field_t;
     signal cell_state_lined : cell_long_row_t;
+    signal cell_state_packed : packed_words_t;
+
+    signal crc_restart     : std_logic;
+    signal crc_restart_reg : std_logic;
+    signal crc_busy_reg    : std_logic;
+    signal crc_valid_reg   : std_logic;
+    signal crc_addr_reg    : unsigned(log2(PACKED_WORDS+1)-1 downto 0);
+    signal crc_reg         : std_logic_vector(32-1 downto 0);
+    signal checksum_reg    : std_logic_vector(32-1 downto 0);
 
     signal forced_state          : cell_state_t;
     signal forced_state_en       : wire_field_t;
@@ -231,7 +289,12 @@ begin
             WB_ACK <= WB_STB and WB_CYC;
 
             -- Reading on WB
-            if (WB_ADDR(14)='0') then
+            if (PACKED_WINDOW and WB_ADDR(14)='0' and WB_ADDR(13)='1') then
+                WB_DOUT <= X"DEADBEEF";
+                if (unsigned(WB_ADDR(13-1 downto 0))<PACKED_WORDS) then
+                    WB_DOUT <= cell_state_packed(to_integer(unsigned(WB_ADDR(13-1 downto 0))));
+                end if;
+            elsif (WB_ADDR(14)='0') then
                 WB_DOUT <= X"DEADCAFE";
                 if    (unsigned(WB_ADDR)=0) then
                     WB_DOUT <= (0 => control_reg, others => '0');
@@ -243,6 +306,12 @@ begin
                     WB_DOUT <= std_logic_vector(to_unsigned(COL_SIZE, 32));
                 elsif (unsigned(WB_ADDR)=4) then
                     WB_DOUT <= std_logic_vector(to_unsigned(ROW_SIZE, 32));
+                elsif ((PACKED_WINDOW or CHECKSUM) and unsigned(WB_ADDR)=5) then
+                    WB_DOUT <= std_logic_vector(to_unsigned(PACKED_FORMAT, 32));
+                elsif (CHECKSUM and unsigned(WB_ADDR)=6) then
+                    WB_DOUT <= checksum_reg;
+                elsif (CHECKSUM and unsigned(WB_ADDR)=7) then
+                    WB_DOUT <= (0 => crc_valid_reg, others => '0');
                 end if;
             else
                 WB_DOUT <= X"DEADBEEF";
@@ -357,6 +426,17 @@ begin
         end loop;
     end process;
 
+    -- Cell state packing
+    cell_state_packing_p : process (cell_state_lined)
+    begin
+        cell_state_packed <= (others => (others => '0'));
+        for i in 0 to ROW_SIZE*COL_SIZE-1 loop
+            for b in 0 to C_STATE_WIDTH-1 loop
+                cell_state_packed(i/PACKED_CELLS)((i mod PACKED_CELLS)*C_STATE_WIDTH+b) <= cell_state_lined(i)(b);
+            end loop;
+        end loop;
+    end process;
+
     -- Forced cell state writing
     forced_state_wr_pr : process (CLK)
     begin
@@ -392,6 +472,55 @@ begin
 
     -- -------------------------------------------------------------------------
 
+    -- -------------------------------------------------------------------------
+    -- Cells' States Checksum
+    -- -------------------------------------------------------------------------
+
+    -- Cells might change while running (until the last generation is finished),
+    -- on Control Register Reset and on forced state writing
+    crc_restart <= '1' when cells_en='1' or gen_cycle_reg/=0 or cells_reset='1' or (WB_WR='1' and WB_ADDR(14)='1') else '0';
+
+    checksum_g : if CHECKSUM generate
+
+    -- Words of the Packed Window are processed one per cycle after the last change
+    checksum_pr : process (CLK)
+    begin
+        if (rising_edge(CLK)) then
+            -- Delayed to the cycle in which the Cells' States are updated
+            crc_restart_reg <= crc_restart;
+
+            if (crc_restart_reg='1') then
+                crc_busy_reg  <= '1';
+                crc_valid_reg <= '0';
+                crc_addr_reg  <= (others => '0');
+                crc_reg       <= (others => '1');
+            elsif (crc_busy_reg='1') then
+                crc_reg      <= crc32_word(crc_reg,cell_state_packed(to_integer(crc_addr_reg)));
+                crc_addr_reg <= crc_addr_reg+1;
+                if (crc_addr_reg=PACKED_WORDS-1) then
+                    checksum_reg  <= not crc32_word(crc_reg,cell_state_packed(to_integer(crc_addr_reg)));
+                    crc_busy_reg  <= '0';
+                    crc_valid_reg <= '1';
+                end if;
+            end if;
+
+            if (RESET='1') then
+                crc_restart_reg <= '1';
+                crc_busy_reg    <= '0';
+                crc_valid_reg   <= '0';
+            end if;
+        end if;
+    end process;
+
+    else generate
+
+    checksum_reg  <= (others => '0');
+    crc_valid_reg <= '0';
+
+    end generate;
+
+    -- -------------------------------------------------------------------------
+
     -- -------------------------------------------------------------------------
     -- LEDs control
     -- -------------------------------------------------------------------------
@@ -0,0 +1,151 @@
+--------------------------------------------------------------------------------
+-- PROJECT: CELLULAR AUTOMATON FPGA
+--------------------------------------------------------------------------------
+-- AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+-- LICENSE: The MIT License, please read LICENSE file
+--------------------------------------------------------------------------------
+-- Testbench of the Cells' States Checksum
+-- The Checksum Register is compared with checksums computed on the host by
+-- grid_checksum (sw/control/cellular_automat.py) for the configuration in
+-- CELLULAR_AUTOMATON_CONFIG_PKG. sw/control/tests/test_checksum_rtl.py runs it
+-- with GHDL and passes the expected values as generics.
+
+library IEEE;
+use IEEE.std_logic_1164.all;
+use IEEE.numeric_std.all;
+
+-- ----------------------------------------------------------------------------
+--                           Entity Declaration
+-- ----------------------------------------------------------------------------
+
+entity CHECKSUM_TB is
+generic (
+    -- Expected checksums (as signed 32-bit integers) of
+    -- the initial state,
+    INIT_CRC     : integer := 0;
+    -- the initial state with WRITE_VALUE written to Cells WRITE_CELL_0 and WRITE_CELL_1
+    WRITTEN_CRC  : integer := 0;
+    -- and the written state after RUN_GENS generations
+    RUN_CRC      : integer := 0;
+    WRITE_CELL_0 : integer := 0;
+    WRITE_CELL_1 : integer := 13;
+    WRITE_VALUE  : integer := 2;
+    RUN_GENS     : integer := 4
+);
+end entity;
+
+-- ----------------------------------------------------------------------------
+
+-- ----------------------------------------------------------------------------
+--                             Architecture
+-- ----------------------------------------------------------------------------
+
+architecture FULL of CHECKSUM_TB is
+
+    constant CLK_PERIOD : time := 20 ns;
+
+    signal clk   : std_logic := '0';
+    signal reset : std_logic := '1';
+    signal done  : boolean   := false;
+
+    signal wb_cyc   : std_logic := '0';
+    signal wb_stb   : std_logic := '0';
+    signal wb_we    : std_logic := '0';
+    signal wb_addr  : std_logic_vector(16-1 downto 0) := (others => '0');
+    signal wb_din   : std_logic_vector(32-1 downto 0) := (others => '0');
+    signal wb_stall : std_logic;
+    signal wb_ack   : std_logic;
+    signal wb_dout  : std_logic_vector(32-1 downto 0);
+
+begin
+
+    clk <= not clk after CLK_PERIOD/2 when not done;
+
+    dut_i : entity work.CELLULAR_AUTOMATON
+    generic map(
+        LEDS_NUM      => 8,
+        PACKED_WINDOW => false,
+        CHECKSUM      => true
+    )
+    port map(
+        CLK      => clk,
+        RESET    => reset,
+
+        WB_CYC   => wb_cyc,
+        WB_STB   => wb_stb,
+        WB_WE    => wb_we,
+        WB_ADDR  => wb_addr,
+        WB_DIN   => wb_din,
+        WB_STALL => wb_stall,
+        WB_ACK   => wb_ack,
+        WB_DOUT  => wb_dout,
+
+        LED_OUT  => open
+    );
+
+    test_p : process
+        variable d : std_logic_vector(32-1 downto 0);
+
+        -- One Wishbone transaction, waits for its acknowledge
+        procedure wb_access(addr : integer; we : std_logic; din : integer; dout : out std_logic_vector) is
+        begin
+            wait until rising_edge(clk);
+            wb_cyc  <= '1';
+            wb_stb  <= '1';
+            wb_we   <= we;
+            wb_addr <= std_logic_vector(to_unsigned(addr,16));
+            wb_din  <= std_logic_vector(to_signed(din,32));
+            wait until rising_edge(clk);
+            wb_stb  <= '0';
+            while (wb_ack/='1') loop
+                wait until rising_edge(clk);
+            end loop;
+            dout   := wb_dout;
+            wb_cyc <= '0';
+        end procedure;
+
+        -- Wait until the Checksum Register is valid and compare it with 'expected'
+        procedure check_checksum(expected : integer; name : string) is
+            variable s : std_logic_vector(32-1 downto 0);
+            variable c : std_logic_vector(32-1 downto 0);
+        begin
+            loop
+                wb_access(7,'0',0,s);
+                exit when s(0)='1';
+            end loop;
+            wb_access(6,'0',0,c);
+            assert c=std_logic_vector(to_signed(expected,32))
+                report name & " checksum is 0x" & to_hstring(c) & ", expected 0x" & to_hstring(std_logic_vector(to_signed(expected,32)))
+                severity failure;
+        end procedure;
+    begin
+        reset <= '1';
+        for i in 0 to 4 loop
+            wait until rising_edge(clk);
+        end loop;
+        reset <= '0';
+
+        -- The format register announces the Checksum Registers
+        wb_access(5,'0',0,d);
+        assert d(25)='1' report "Checksum bit of the Packed Cells Format Register is not set" severity failure;
+
+        check_checksum(INIT_CRC,"Initial state");
+
+        -- Forced cell state writing (the automaton is stopped after reset)
+        wb_access(16#4000#+WRITE_CELL_0,'1',WRITE_VALUE,d);
+        wb_access(16#4000#+WRITE_CELL_1,'1',WRITE_VALUE,d);
+        check_checksum(WRITTEN_CRC,"Written state");
+
+        -- Run to the Generations Limit
+        wb_access(1,'1',RUN_GENS,d);
+        wb_access(0,'1',1,d);
+        check_checksum(RUN_CRC,"Final state");
+        wb_access(2,'0',0,d);
+        assert unsigned(d)=RUN_GENS report "Current generation is " & integer'image(to_integer(unsigned(d))) severity failure;
+
+        report "CHECKSUM_TB passed";
+        done <= true;
+        wait;
+    end process;
+
+end architecture;
@@ -11,8 +11,9 @@ use IEEE.NUMERIC_STD.ALL;
 
 entity UART2WBM is
     Generic (
-        CLK_FREQ  : integer := 50e6;  -- system clock frequency in Hz
-        BAUD_RATE : integer := 115200 -- baud rate value
+        CLK_FREQ      : integer := 50e6;   -- system clock frequency in Hz
+        BAUD_RATE     : integer := 115200; -- baud rate value
+        RX_FIFO_WIDTH : integer := 9       -- address width of the RX FIFO (2**RX_FIFO_WIDTH-1 bytes)
     );
     Port (
         -- CLOCK AND RESET
@@ -35,7 +36,11 @@ end entity;
 
 architecture RTL of UART2WBM is
 
-    type state is (cmd, addr_low, addr_high, dout0, dout1, dout2, dout3,
+    -- Command byte: bit 0 = write, bit 1 = burst
+    -- Burst commands are followed by a length byte (LEN+1 words at incrementing
+    -- addresses). Burst read responses contain one echo followed by all words,
+    -- burst write is acknowledged by one echo after the last word is written.
+    type state is (cmd, addr_low, addr_high, burst_len, dout0, dout1, dout2, dout3,
         request, wait4ack, response, din0, din1, din2, din3);
     signal fsm_pstate : state;
     signal fsm_nstate : state;
@@ -47,6 +52,10 @@ architecture RTL of UART2WBM is
     signal dout_reg  : std_logic_vector(31 downto 0);
     signal dout_next : std_logic_vector(31 downto 0);
     signal din_reg   : std_logic_vector(31 downto 0);
+    signal cnt_reg   : unsigned(7 downto 0);
+    signal cnt_next  : unsigned(7 downto 0);
+    signal echo_reg  : std_logic;
+    signal echo_next : std_logic;
 
     signal uart_dout     : std_logic_vector(7 downto 0);
     signal uart_dout_vld : std_logic;
@@ -54,6 +63,11 @@ architecture RTL of UART2WBM is
     signal uart_din_vld  : std_logic;
     signal uart_din_rdy  : std_logic;
 
+    signal rx_data     : std_logic_vector(7 downto 0);
+    signal rx_data_vld : std_logic;
+    signal rx_data_rd  : std_logic;
+    signal rx_fifo_rd  : std_logic;
+
 begin
 
     WB_CYC <= '1';
@@ -64,6 +78,8 @@ begin
             cmd_reg  <= cmd_next;
             addr_reg <= addr_next;
             dout_reg <= dout_next;
+            cnt_reg  <= cnt_next;
+            echo_reg <= echo_next;
         end if;
     end process;
 
@@ -95,41 +111,51 @@ begin
         end if;
     end process;
 
-    process (fsm_pstate, uart_dout, uart_dout_vld, cmd_reg, addr_reg, dout_reg,
-        WB_STALL, WB_ACK, uart_din_rdy, din_reg)
+    process (fsm_pstate, rx_data, rx_data_vld, cmd_reg, addr_reg, dout_reg,
+        cnt_reg, echo_reg, WB_STALL, WB_ACK, uart_din_rdy, din_reg)
     begin
         fsm_nstate   <= cmd;
         cmd_next     <= cmd_reg;
         addr_next    <= addr_reg;
         dout_next    <= dout_reg;
+        cnt_next     <= cnt_reg;
+        echo_next    <= echo_reg;
         WB_STB       <= '0';
         uart_din     <= cmd_reg;
         uart_din_vld <= '0';
+        rx_data_rd   <= '0';
 
         case fsm_pstate is
             when cmd =>
-                cmd_next <= uart_dout;
+                rx_data_rd <= '1';
+                cmd_next  <= rx_data;
+                cnt_next  <= (others => '0'); -- single word
+                echo_next <= '1';
 
-                if (uart_dout_vld = '1') then
+                if (rx_data_vld = '1') then
                     fsm_nstate <= addr_low;
                 else
                     fsm_nstate <= cmd;
                 end if;
 
             when addr_low =>
-                addr_next(7 downto 0) <= uart_dout;
+                rx_data_rd <= '1';
+                addr_next(7 downto 0) <= rx_data;
 
-                if (uart_dout_vld = '1') then
+                if (rx_data_vld = '1') then
                     fsm_nstate <= addr_high;
                 else
                     fsm_nstate <= addr_low;
                 end if;
 
             when addr_high =>
-                addr_next(15 downto 8) <= uart_dout;
+                rx_data_rd <= '1';
+                addr_next(15 downto 8) <= rx_data;
 
-                if (uart_dout_vld = '1') then
-                    if (cmd_reg(0) = '1') then
+                if (rx_data_vld = '1') then
+                    if (cmd_reg(1) = '1') then
+                        fsm_nstate <= burst_len;
+                    elsif (cmd_reg(0) = '1') then
                         fsm_nstate <= dout0;
                     else
                         fsm_nstate <= request; -- read request
@@ -138,37 +164,55 @@ begin
                     fsm_nstate <= addr_high;
                 end if;
 
+            when burst_len =>
+                rx_data_rd <= '1';
+                cnt_next <= unsigned(rx_data);
+
+                if (rx_data_vld = '1') then
+                    if (cmd_reg(0) = '1') then
+                        fsm_nstate <= dout0;
+                    else
+                        fsm_nstate <= request; -- read request
+                    end if;
+                else
+                    fsm_nstate <= burst_len;
+                end if;
+
             when dout0 =>
-                dout_next(7 downto 0) <= uart_dout;
+                rx_data_rd <= '1';
+                dout_next(7 downto 0) <= rx_data;
 
-                if (uart_dout_vld = '1') then
+                if (rx_data_vld = '1') then
                     fsm_nstate <= dout1;
                 else
                     fsm_nstate <= dout0;
                 end if;
 
             when dout1 =>
-                dout_next(15 downto 8) <= uart_dout;
+                rx_data_rd <= '1';
+                dout_next(15 downto 8) <= rx_data;
 
-                if (uart_dout_vld = '1') then
+                if (rx_data_vld = '1') then
                     fsm_nstate <= dout2;
                 else
                     fsm_nstate <= dout1;
                 end if;
 
             when dout2 =>
-                dout_next(23 downto 16) <= uart_dout;
+                rx_data_rd <= '1';
+                dout_next(23 downto 16) <= rx_data;
 
-                if (uart_dout_vld = '1') then
+                if (rx_data_vld = '1') then
                     fsm_nstate <= dout3;
                 else
                     fsm_nstate <= dout2;
                 end if;
 
             when dout3 =>
-                dout_next(31 downto 24) <= uart_dout;
+                rx_data_rd <= '1';
+                dout_next(31 downto 24) <= rx_data;
 
-                if (uart_dout_vld = '1') then
+                if (rx_data_vld = '1') then
                     fsm_nstate <= request; -- write request
                 else
                     fsm_nstate <= dout3;
@@ -185,7 +229,16 @@ begin
 
             when wait4ack =>
                 if (WB_ACK = '1') then
-                    fsm_nstate <= response;
+                    if (cmd_reg(0) = '1' and cnt_reg /= 0) then
+                        -- next word of burst write
+                        cnt_next  <= cnt_reg - 1;
+                        addr_next <= std_logic_vector(unsigned(addr_reg) + 1);
+                        fsm_nstate <= dout0;
+                    elsif (echo_reg = '1') then
+                        fsm_nstate <= response;
+                    else
+                        fsm_nstate <= din0; -- next word of burst read
+                    end if;
                 else
                     fsm_nstate <= wait4ack;
                 end if;
@@ -195,6 +248,7 @@ begin
                 uart_din_vld <= '1';
 
                 if (uart_din_rdy = '1') then
+                    echo_next <= '0';
                     if (cmd_reg(0) = '1') then
                         fsm_nstate <= cmd;
                     else
@@ -239,7 +293,14 @@ begin
                 uart_din_vld <= '1';
 
                 if (uart_din_rdy = '1') then
-                    fsm_nstate <= cmd;
+                    if (cnt_reg /= 0) then
+                        -- next word of burst read
+                        cnt_next  <= cnt_reg - 1;
+                        addr_next <= std_logic_vector(unsigned(addr_reg) + 1);
+                        fsm_nstate <= request;
+                    else
+                        fsm_nstate <= cmd;
+                    end if;
                 else
                     fsm_nstate <= din3;
                 end if;
@@ -274,4 +335,34 @@ begin
         DIN_RDY     => uart_din_rdy
     );
 
+    -- -------------------------------------------------------------------------
+    --  RX FIFO
+    -- -------------------------------------------------------------------------
+
+    -- Buffers received bytes while the FSM is busy with the previous request,
+    -- so the host can send requests back to back without waiting for responses.
+    -- The FIFO output is read when it holds no valid byte or when the FSM
+    -- accepts the current one.
+    rx_fifo_rd <= rx_data_rd or not rx_data_vld;
+
+    rx_fifo_i : entity work.FIFO
+    generic map (
+        DATA_WIDTH => 8,
+        ADDR_WIDTH => RX_FIFO_WIDTH
+    )
+    port map (
+        CLK         => CLK,
+        RST         => RST,
+        -- FIFO WRITE INTERFACE
+        WR_DATA     => uart_dout,
+        WR_REQ      => uart_dout_vld,
+        WR_FULL     => open,
+        -- FIFO READ INTERFACE
+        RD_DATA     => rx_data,
+        RD_DATA_VLD => rx_data_vld,
+        RD_REQ      => rx_fifo_rd,
+        -- FIFO STATUS SIGNAL
+        STATUS      => open
+    );
+
 end architecture;
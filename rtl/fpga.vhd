@@ -11,6 +11,12 @@ use IEEE.STD_LOGIC_1164.ALL;
 use IEEE.NUMERIC_STD.ALL;
 
 entity FPGA is
+    Generic (
+        -- Packed Cells' States Window of the automaton (see README for its cost)
+        PACKED_WINDOW : boolean := true;
+        -- Cells' States Checksum of the automaton (see README for its cost)
+        CHECKSUM      : boolean := true
+    );
     Port (
         -- System clock and reset button
         CLK_12M     : in  std_logic;
@@ -146,7 +152,9 @@ begin
 
     cellular_auto_i : entity work.CELLULAR_AUTOMATON
     generic map(
-        LEDS_NUM => 8
+        LEDS_NUM      => 8,
+        PACKED_WINDOW => PACKED_WINDOW,
+        CHECKSUM      => CHECKSUM
     )
     port map(
         CLK      => clk_usr,
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Binary '.cab' format holding an initial state and/or transition rules
+# The file is memory-mapped and its arrays are used as NumPy views without copying.
+#
+# Layout (little endian):
+#   header (32 B): magic "CAB1", version (u16), connection (u8, 0 without rules),
+#                  state width (u8), rows (u32), cols (u32), rules (u32),
+#                  cells offset (u32), keys offset (u32), outs offset (u32)
+#   cells:         rows*cols states of 'state width' bits, row-major, LSB first
+#   keys:          u64 per rule, input 'k' at bits state_w*k (the order of '.tab' inputs)
+#   outs:          u8 per rule
+# Rules keep the order of the '.tab' file, so the last matching rule still wins.
+
+import mmap
+import os
+from argparse import ArgumentParser
+from math import ceil, log
+from struct import Struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None # Only the detection works without NumPy
+
+cab_magic   = b"CAB1"
+cab_version = 1
+cab_header  = Struct("<4sHBBIIIIII")
+
+# Tells whether 'file_name' is a '.cab' file (by its magic, not by its name)
+def is_cab_file(file_name):
+    if (not isinstance(file_name,str) or not os.path.isfile(file_name)):
+        return False
+    with open(file_name,"rb") as f:
+        return f.read(4)==cab_magic
+
+# Packs a (rules, conn) array of inputs into u64 keys
+def pack_keys(inputs,state_w):
+    inputs = np.asarray(inputs,dtype=np.uint64)
+    inputs = inputs.reshape(len(inputs),inputs.shape[1] if (inputs.ndim>1) else 1)
+    keys = np.zeros(len(inputs),dtype=np.uint64)
+    for k in range(inputs.shape[1]):
+        keys |= inputs[:,k]<<np.uint64(state_w*k)
+    return keys
+
+# Unpacks u64 keys into a (rules, conn) array of inputs
+def unpack_keys(keys,conn,state_w):
+    mask = np.uint64(2**state_w-1)
+    if (conn==0):
+        return np.zeros((len(keys),0),dtype=np.uint8)
+    return np.stack([(keys>>np.uint64(state_w*k))&mask for k in range(conn)],axis=-1).astype(np.uint8)
+
+# Bit-packs a (rows, cols) array of states
+def pack_cells(cells,state_w):
+    bits = np.unpackbits(np.asarray(cells,dtype=np.uint8).reshape(-1,1),axis=1,count=state_w,bitorder="little")
+    return np.packbits(bits.reshape(-1),bitorder="little")
+
+def unpack_cells(packed,rows,cols,state_w):
+    bits = np.unpackbits(packed,count=rows*cols*state_w,bitorder="little").reshape(rows*cols,state_w)
+    return np.packbits(bits,axis=1,bitorder="little").reshape(rows,cols)
+
+# Writes a '.cab' file; 'cells' is a 2D array of states, 'rules' a list of (inputs, output)
+# or a (rules, conn+1) array with the output in the last column
+# The state width is derived from the largest value (at least 1 bit) unless given.
+def write_cab(file_name,cells=None,rules=None,state_w=None):
+    max_val = 1
+    conn    = 0
+    inputs  = np.zeros((0,0),dtype=np.uint8)
+    outs    = np.zeros(0,dtype=np.uint8)
+    if (cells is not None):
+        cells = np.asarray(cells,dtype=np.uint8)
+        max_val = max(max_val,int(cells.max()))
+    if (rules is not None and not isinstance(rules,np.ndarray)):
+        rules = np.array([tuple(i)+(o,) for i,o in rules],dtype=np.uint8)
+    if (rules is not None and len(rules)):
+        conn   = rules.shape[1]-1
+        inputs = rules[:,:-1]
+        outs   = rules[:,-1]
+        max_val = max(max_val,int(inputs.max()),int(outs.max()))
+    if (state_w is None):
+        state_w = ceil(log(max_val+1,2))
+    keys = pack_keys(inputs,state_w)
+
+    rows, cols = cells.shape if (cells is not None) else (0,0)
+    packed = pack_cells(cells,state_w) if (cells is not None) else np.zeros(0,dtype=np.uint8)
+    cells_off = cab_header.size
+    keys_off  = (cells_off+len(packed)+7)//8*8
+    outs_off  = keys_off+8*len(keys)
+    with open(file_name,"wb") as f:
+        f.write(cab_header.pack(cab_magic,cab_version,conn,state_w,rows,cols,len(keys),cells_off,keys_off,outs_off))
+        f.write(packed.tobytes())
+        f.write(bytes(keys_off-cells_off-len(packed)))
+        f.write(keys.astype("<u8").tobytes())
+        f.write(outs.astype(np.uint8).tobytes())
+
+# Memory-mapped '.cab' file
+class cab_file:
+    def __init__(self,file_name):
+        self.file_name = file_name
+        with open(file_name,"rb") as f:
+            self.map = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        (magic,version,self.conn,self.state_w,self.rows,self.cols,self.n_rules,
+         cells_off,keys_off,outs_off) = cab_header.unpack_from(self.map,0)
+        if (magic!=cab_magic or version!=cab_version):
+            raise ValueError("File %s is not a version %d '.cab' file" % (file_name,cab_version))
+        n_packed = (self.rows*self.cols*self.state_w+7)//8
+        self.packed_cells = np.frombuffer(self.map,dtype=np.uint8,count=n_packed,offset=cells_off)
+        self.keys = np.frombuffer(self.map,dtype="<u8",count=self.n_rules,offset=keys_off)
+        self.outs = np.frombuffer(self.map,dtype=np.uint8,count=self.n_rules,offset=outs_off)
+
+    def has_cells(self):
+        return self.rows*self.cols!=0
+
+    # Unpacked (rows, cols) array of the initial state
+    def cells(self):
+        return unpack_cells(self.packed_cells,self.rows,self.cols,self.state_w)
+
+    # Rules as (inputs, output) pairs
+    def rules(self):
+        inputs = unpack_keys(self.keys,self.conn,self.state_w)
+        for i,o in zip(inputs.tolist(),self.outs.tolist()):
+            yield (tuple(i),o)
+
+    def close(self):
+        # Views must not outlive the map
+        self.packed_cells = self.keys = self.outs = None
+        self.map.close()
+
+# Rules of a '.tab' file as a (rules, conn+1) array
+def read_tab_array(file_name):
+    with open(file_name,"r") as f:
+        lines = [l.split("#")[0] for l in f]
+    lines = [l for l in lines if (l.strip())]
+    if (len(lines)==0):
+        return np.zeros((0,1),dtype=np.uint8)
+    conn = len(lines[0].split(":")[0].split())
+    values = np.array(" ".join(lines).replace(":"," ").split(),dtype=np.uint32)
+    if (len(values)%(conn+1)!=0):
+        raise ValueError("Transition table "+file_name+" contains rules with different numbers of inputs")
+    return values.reshape(-1,conn+1).astype(np.uint8)
+
+# Text '.cas'/'.tab' to '.cab' conversion
+def text_to_cab(out_file,init_file=None,trans_tab_file=None):
+    cells = None
+    rules = None
+    if (init_file is not None):
+        cells = np.loadtxt(init_file,dtype=np.uint8,ndmin=2)
+    if (trans_tab_file is not None):
+        rules = read_tab_array(trans_tab_file)
+    write_cab(out_file,cells,rules)
+
+# '.cab' to text '.cas'/'.tab' conversion
+def cab_to_text(cab_name,init_file=None,trans_tab_file=None):
+    from rule_compiler import write_tab
+    cab = cab_file(cab_name)
+    if (init_file is not None and cab.has_cells()):
+        with open(init_file,"w") as f:
+            f.write("".join(" ".join(map(str,row))+"\n" for row in cab.cells().tolist()))
+    if (trans_tab_file is not None and cab.n_rules):
+        with open(trans_tab_file,"w") as f:
+            write_tab(cab.rules(),f,"Converted from "+os.path.basename(cab_name))
+    cab.close()
+
+if (__name__=="__main__"):
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("cab_file",help="Name of the '.cab' file")
+    parser.add_argument("--cas",default=None,help="Name of the '.cas' file with initial automaton state")
+    parser.add_argument("--tab",default=None,help="Name of the '.tab' file with transition rules")
+    parser.add_argument("--to_text",action="store_true",help="Convert the '.cab' file to '.cas'/'.tab' files instead of creating it")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    if (args.to_text):
+        cab_to_text(args.cab_file,args.cas,args.tab)
+    else:
+        text_to_cab(args.cab_file,args.cas,args.tab)
+        cab = cab_file(args.cab_file)
+        print("Written %s: %dx%d cells, %d rules, %d-connected, %d-bit state" % (args.cab_file,cab.cols,cab.rows,cab.n_rules,cab.conn,cab.state_w))
+        cab.close()
@@ -0,0 +1,201 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Software reference model of the Cellular Automaton.
+# Executes the same '.cas' and '.tab' files as the FPGA with the same semantics:
+#  - the field wraps around on all edges (torus),
+#  - when more rules match, the last one in the table wins,
+#  - inputs without a matching rule keep their state.
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from io import StringIO
+from time import time
+
+import numpy as np
+
+from config_pkg_gen import cell_auto_config
+from cell_auto_bin   import is_cab_file, cab_file, pack_keys, unpack_keys
+
+# Neighbour offsets (row,col) in the order of transition rule inputs
+# (the same order as cell_neighbours in cellular_automaton.vhd)
+neigh_offsets = {
+    5 : [(-1,0),(0,-1),(0,0),(0,1),(1,0)],
+    9 : [(-1,-1),(-1,0),(-1,1),(0,-1),(0,0),(0,1),(1,-1),(1,0),(1,1)],
+}
+
+# Maximum width of a packed neighbourhood key for which a direct lookup table is used.
+# Wider keys are looked up by binary search in a sorted key array.
+max_lut_bits = 24
+
+# Smallest unsigned type holding packed keys of 'bits' bits
+def key_dtype(bits):
+    return np.uint32 if (bits<=32) else np.uint64
+
+# Packs a rule input vector into an integer key (input 'k' at bits state_w*k)
+def pack_key(inputs,state_w):
+    key = 0
+    for k,v in enumerate(inputs):
+        key |= v<<(state_w*k)
+    return key
+
+# Rule lookup index over packed neighbourhood keys
+# 'rules' is a list of (inputs, output) or a pair of arrays (keys, outs) packed by pack_key
+class rule_index:
+    def __init__(self,rules,conn,state_w):
+        self.conn     = conn
+        self.state_w  = state_w
+        self.key_bits = conn*state_w
+        if (self.key_bits>64):
+            raise ValueError("Neighbourhood of %d cells with %d-bit state does not fit a 64-bit key" % (conn,state_w))
+
+        if (isinstance(rules,tuple)):
+            keys, outs = rules
+        else:
+            keys = np.array([pack_key(i,state_w) for i,o in rules],dtype=np.uint64)
+            outs = np.array([o for i,o in rules],dtype=np.uint8)
+        # Later rules overwrite earlier ones (the same as in the Cell's ROM)
+        last = len(keys)-1-np.unique(keys[::-1],return_index=True)[1]
+        self.keys = keys[last].astype(key_dtype(self.key_bits))
+        self.outs = outs[last].astype(np.uint8)
+
+        self.lut = None
+        if (self.key_bits<=max_lut_bits):
+            # 0xFF marks keys without a rule (states have at most 4 bits here)
+            self.lut = np.full(2**self.key_bits,0xFF,dtype=np.uint8)
+            self.lut[self.keys.astype(np.intp)] = self.outs
+
+    # New states for packed keys 'keys' of cells with current states 'centre'
+    def apply(self,keys,centre):
+        if (self.lut is not None):
+            new = self.lut[keys.astype(np.intp)]
+            return np.where(new==0xFF,centre,new)
+        if (len(self.keys)==0):
+            return centre.copy()
+        pos = np.searchsorted(self.keys,keys)
+        pos[pos==len(self.keys)] = 0
+        return np.where(self.keys[pos]==keys,self.outs[pos],centre)
+
+# Packed neighbourhood keys of rows r0..r1-1 of 'grid'
+def neigh_keys(grid,r0,r1,conn,state_w):
+    dtype = key_dtype(conn*state_w)
+    rows  = grid.shape[0]
+    band  = grid[np.arange(r0-1,r1+1)%rows].astype(dtype)
+    keys  = np.zeros((r1-r0,grid.shape[1]),dtype=dtype)
+    for k,(dr,dc) in enumerate(neigh_offsets[conn]):
+        nb = band[1+dr:1+dr+r1-r0]
+        if (dc!=0):
+            nb = np.roll(nb,-dc,axis=1)
+        keys |= nb<<dtype(state_w*k)
+    return keys
+
+class cell_auto_engine:
+    def __init__(self,trans_tab_file,init_file=None,rom_ways=1,verbose=False):
+        self.error = 0
+        self.grid  = None
+        self.gen   = 0
+
+        # Binary inputs are used directly from the memory-mapped file
+        if (is_cab_file(trans_tab_file) and (init_file is None or is_cab_file(init_file))):
+            self.load_cab(trans_tab_file,init_file,rom_ways)
+            return
+
+        # Parse the inputs exactly as the package generator does
+        log = StringIO()
+        with redirect_stdout(log):
+            self.config = cell_auto_config(init_file,trans_tab_file,None,rom_ways,0)
+        if (verbose or self.config.error):
+            print(log.getvalue(),end="")
+        self.error = self.config.error
+        if (self.error):
+            return
+
+        self.conn    = 5 if (self.config.is_five_conn) else 9
+        self.state_w = self.config.state_w
+        self.act_rom_items = self.config.act_rom_items
+        # Only the actually checked ROM items (including the padding copies of rule 0)
+        self.rules   = self.config.trans_list[:self.config.act_rom_items*rom_ways]
+        self.index   = rule_index(self.rules,self.conn,self.state_w)
+
+        if (init_file is not None):
+            self.set_state(self.config.init_state)
+
+    # The same as parsing by cell_auto_config, but without converting the arrays to lists
+    def load_cab(self,trans_tab_file,init_file,rom_ways):
+        self.config = None
+        self.rules  = None
+        tab   = cab_file(trans_tab_file)
+        cells = None
+        self.state_w = tab.state_w
+        if (init_file is not None):
+            cas = cab_file(init_file)
+            cells = cas.cells()
+            self.state_w = max(self.state_w,cas.state_w)
+            cas.close()
+        keys = tab.keys
+        outs = tab.outs
+        self.conn = tab.conn
+        if (len(keys)==0):
+            # Default rule '0 0 0 0 0 : 0'
+            self.conn = 5
+            keys = np.zeros(1,dtype=np.uint64)
+            outs = np.zeros(1,dtype=np.uint8)
+        elif (self.state_w!=tab.state_w):
+            keys = pack_keys(unpack_keys(keys,self.conn,tab.state_w),self.state_w)
+        pad = (-len(keys))%rom_ways
+        keys = np.concatenate([keys,np.repeat(keys[:1],pad)])
+        outs = np.concatenate([outs,np.repeat(outs[:1],pad)])
+        self.act_rom_items = len(keys)//rom_ways
+        self.index = rule_index((keys,outs),self.conn,self.state_w)
+        tab.close()
+        if (cells is not None):
+            self.set_state(cells)
+
+    def set_state(self,grid):
+        self.grid = np.array(grid,dtype=np.uint8)
+        self.gen  = 0
+
+    # Next state of rows r0..r1-1 of 'grid' (the whole grid by default)
+    def next_state(self,grid,r0=0,r1=None):
+        if (r1 is None):
+            r1 = grid.shape[0]
+        keys = neigh_keys(grid,r0,r1,self.conn,self.state_w)
+        return self.index.apply(keys,grid[r0:r1])
+
+    def step(self,n=1):
+        for i in range(n):
+            self.grid = self.next_state(self.grid)
+        self.gen += n
+        return self.grid
+
+if (__name__=="__main__"):
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("init_state_file",help="Name of input '.cas' (or '.cab') file with initial automaton state")
+    parser.add_argument("trans_table_file",help="Name of input '.tab' (or '.cab') file with explicit automaton transition rules")
+    parser.add_argument("--gens",type=int,default=1,help="Number of generations to compute (default: 1)")
+    parser.add_argument("--rom_ways",type=int,default=1,help="Number of ROM ways of the modelled hardware; affects only padding of the rule list (default: 1)")
+    parser.add_argument("--repeat",type=int,nargs=2,default=(1,1),metavar=("ROWS","COLS"),help="Repeat the initial state to build a larger field (default: 1 1)")
+    parser.add_argument("--quiet",action="store_true",help="Do not print the resulting state")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    # Run the model
+    engine = cell_auto_engine(args.trans_table_file,args.init_state_file,args.rom_ways)
+    if (engine.error!=0):
+        exit(engine.error)
+    engine.set_state(np.tile(engine.grid,args.repeat))
+    print("Field size: %dx%d, %d-connected, %d-bit state, %d rules" % (engine.grid.shape[1],engine.grid.shape[0],engine.conn,engine.state_w,len(engine.index.keys)))
+    t = time()
+    engine.step(args.gens)
+    t = time()-t
+    print("Generations: %d, time: %.3f s, speed: %.0f generations per second" % (args.gens,t,args.gens/t if (t>0) else 0))
+    if (not args.quiet):
+        for row in engine.grid:
+            print("".join("%02d " % v for v in row))
@@ -6,9 +6,13 @@
 # LICENSE: The MIT License, please read LICENSE file
 #-------------------------------------------------------------------------------
 
+import hashlib
+import os
 from argparse import ArgumentParser
 from math import log, ceil
 
+from cell_auto_bin import is_cab_file, cab_file
+
 # Helper functions
 def my_bin(number,digits):
     str = bin(number)
@@ -20,14 +24,134 @@ def my_bin(number,digits):
         str = str[-digits:]
     return str
 
+# Resource usage data points from README (Quartus Prime Lite 18.1, Cyclone 10 LP 10CL025)
+# (cells, explicit rules, connection, state width, ROM ways, LUTs, FFs)
+# FFs are None where they were not reported; LUTs of the CYC1000 limit designs are
+# their reported share of the device. GoF_20x12_4 is left out as it reports fewer
+# resources than GoF_10x6_4 with the same rules.
+calibration_points = [
+    (  60,228,9,1, 4, 2377,625), # GoF_10x6_4
+    (  60,228,9,1, 8, 3791,655), # GoF_10x6_8
+    (  96,  7,5,2, 4, 1211,549), # Test_Glider4_12x8_4
+    (  96, 25,9,3, 4, 2355,659), # Test_Glider8_12x8_4
+    (2500,228,9,1, 1, 0.95*24624,None), # CYC1000 50x50
+    (1024,228,9,1, 7, 0.98*24624,None), # CYC1000 32x32
+    ( 256,228,9,1,16, 0.99*24624,None), # CYC1000 16x16
+]
+
+# Device budget of the CYC1000 FPGA (10CL025YU256C8G)
+device_luts     = 24624
+device_ffs      = 24624
+device_m_blocks = 66
+
+# M9K block configurations (depth, width)
+m9k_configs = [(256,36),(512,18),(1024,9),(2048,4),(4096,2),(8192,1)]
+
+# Weighted least squares fit (minimizes relative error) of y ~ sum(c_i*x_i)
+def fit_relative(rows,ys):
+    n = len(rows[0])
+    a = [[0.0]*n for i in range(n)]
+    b = [0.0]*n
+    for x,y in zip(rows,ys):
+        x = [v/y for v in x]
+        for i in range(n):
+            b[i] += x[i]
+            for e in range(n):
+                a[i][e] += x[i]*x[e]
+    # Gaussian elimination
+    for i in range(n):
+        p = max(range(i,n),key=lambda r: abs(a[r][i]))
+        a[i],a[p] = a[p],a[i]
+        b[i],b[p] = b[p],b[i]
+        for r in range(i+1,n):
+            f = a[r][i]/a[i][i]
+            for e in range(i,n):
+                a[r][e] -= f*a[i][e]
+            b[r] -= f*b[i]
+    c = [0.0]*n
+    for i in range(n-1,-1,-1):
+        c[i] = (b[i]-sum(a[i][e]*c[e] for e in range(i+1,n)))/a[i][i]
+    return c
+
+# Resource and speed model calibrated from calibration_points
+# LUTs: constant part, ROMs held in logic (per cell: ways*items*state_w)
+#       and way comparators with their priority multiplexing (per cell: ways**2)
+# FFs:  constant part and registered cell inputs (per cell: conn*state_w)
+class resource_model:
+    def __init__(self):
+        self.lut_coef = fit_relative([self.lut_features(c,r,n,w,W,0) for c,r,n,w,W,l,f in calibration_points],
+                                     [l for c,r,n,w,W,l,f in calibration_points])
+        ff_points = [p for p in calibration_points if (p[6] is not None)]
+        self.ff_coef = fit_relative([self.ff_features(c,r,n,w,W) for c,r,n,w,W,l,f in ff_points],
+                                    [f for c,r,n,w,W,l,f in ff_points])
+
+    def lut_features(self,cells,rules,conn,state_w,ways,m_cells):
+        items = ceil(rules/ways)
+        return [1.0,(cells-m_cells)*ways*items*state_w,cells*ways**2]
+
+    def ff_features(self,cells,rules,conn,state_w,ways):
+        return [1.0,cells*conn*state_w]
+
+    def luts(self,cells,rules,conn,state_w,ways,m_cells=0):
+        return sum(c*x for c,x in zip(self.lut_coef,self.lut_features(cells,rules,conn,state_w,ways,m_cells)))
+
+    def ffs(self,cells,rules,conn,state_w,ways):
+        return sum(c*x for c,x in zip(self.ff_coef,self.ff_features(cells,rules,conn,state_w,ways)))
+
+    # Number of M9K blocks needed for ROM of one Cell
+    def m_blocks_per_cell(self,rules,conn,state_w,ways):
+        items = ceil(rules/ways)
+        depth = 2**ceil(log(items,2)) if (items>1) else 1
+        width = ways*(conn+1)*state_w
+        for d,w in m9k_configs:
+            if (depth<=d):
+                return ceil(width/w)
+        return ceil(width/m9k_configs[-1][1])*ceil(depth/m9k_configs[-1][0])
+
+    def report_calibration(self):
+        print("Resource model calibration (relative error of LUT estimate):")
+        for c,r,n,w,W,l,f in calibration_points:
+            print("    %4d cells, %3d rules, %d-conn, %d-bit, %2d ways: %+6.1f %%" % (c,r,n,w,W,(self.luts(c,r,n,w,W)-l)/l*100))
+
+# Generated packages carry a hash of their inputs, generation is skipped when it matches
+hash_prefix = "-- Configuration hash: "
+
+# Hash of the input files (or data), generation parameters and of this generator
+def config_hash(init_in_file,trans_tab_in_file,rom_ways,max_m_blocks,minimize):
+    h = hashlib.sha256()
+    for src in (os.path.abspath(__file__),init_in_file,trans_tab_in_file):
+        if (src is None):
+            h.update(b"\0")
+        elif (os.path.isfile(src)):
+            with open(src,"rb") as f:
+                h.update(hashlib.sha256(f.read()).digest())
+        else:
+            h.update(hashlib.sha256(src.encode()).digest())
+    h.update(("%d %d %d" % (rom_ways,max_m_blocks,minimize)).encode())
+    return h.hexdigest()
+
+# Hash stored in an existing package (None when there is none)
+def pkg_file_hash(pkg_file):
+    if (not os.path.isfile(pkg_file)):
+        return None
+    with open(pkg_file,"r") as f:
+        for i,line in enumerate(f):
+            if (line.startswith(hash_prefix)):
+                return line[len(hash_prefix):].strip()
+            if (i>=16):
+                break
+    return None
+
 # Configuration class
 class cell_auto_config:
-    def __init__(self,init_in_file,trans_tab_in_file,out_file,rom_ways,max_m_blocks):
+    def __init__(self,init_in_file,trans_tab_in_file,out_file,rom_ways,max_m_blocks,minimize=False,clk_freq=50e6):
         self.init_in_file      = init_in_file
         self.trans_tab_in_file = trans_tab_in_file
         self.out_file          = out_file
         self.rom_ways          = rom_ways
         self.max_m_blocks   = max_m_blocks
+        self.minimize       = minimize
+        self.clk_freq       = clk_freq
 
         self.is_five_conn   = None
         self.rows           = None
@@ -40,7 +164,12 @@ class cell_auto_config:
 
         self.error = 0
 
-        val0 = self.parse_init_file()
+        # Inputs given as files can be hashed before parsing
+        self.config_hash = None
+        if (isinstance(trans_tab_in_file,str)):
+            self.config_hash = config_hash(init_in_file,trans_tab_in_file,rom_ways,max_m_blocks,minimize)
+
+        val0 = self.parse_init_file() if (self.init_in_file is not None) else 1
         if (self.error):
             return
         val1 = self.parse_trans_file()
@@ -50,6 +179,8 @@ class cell_auto_config:
         self.state_w = ceil(log(max_val+1,2))
 
     def parse_init_file(self):
+        if (is_cab_file(self.init_in_file)):
+            return self.parse_init_cab()
         self.init_state = []
         with open(self.init_in_file,"r") as f:
             for line in f:
@@ -81,9 +212,35 @@ class cell_auto_config:
                     max_val = v
         return max_val
 
-    def parse_trans_file(self):
-        self.trans_list = []
-        max_val = 1
+    # Initial state from a binary '.cab' file
+    def parse_init_cab(self):
+        cab = cab_file(self.init_in_file)
+        if (not cab.has_cells()):
+            print("Error: Input file "+self.init_in_file+" contains no initial state.")
+            self.error = -1
+            cab.close()
+            return self.error
+        cells = cab.cells()
+        cab.close()
+        self.init_state = cells.tolist()
+        self.rows = cells.shape[0]
+        self.cols = cells.shape[1]
+        print("Detected automaton size: "+str(self.cols)+"x"+str(self.rows))
+        return max(1,int(cells.max()))
+
+    # Transition rules as (inputs, output, text) read from the '.tab' (or '.cab') file,
+    # or taken from an iterable of (inputs, output) pairs (e.g. from rule_compiler)
+    def read_trans_rules(self):
+        if (not isinstance(self.trans_tab_in_file,str)):
+            for i,o in self.trans_tab_in_file:
+                yield (tuple(i),o," ".join(map(str,i))+" : "+str(o))
+            return
+        if (is_cab_file(self.trans_tab_in_file)):
+            cab = cab_file(self.trans_tab_in_file)
+            for i,o in cab.rules():
+                yield (i,o," ".join(map(str,i))+" : "+str(o))
+            cab.close()
+            return
         with open(self.trans_tab_in_file,"r") as f:
             for line in f:
                 line = line.split("#")[0].strip()
@@ -93,29 +250,36 @@ class cell_auto_config:
                 i = i.split(" ")
                 #print("in: "+str(i))
                 #print("out: "+str(o))
-                if (self.is_five_conn==None):
-                    self.is_five_conn = (len(i)==5)
-                if (self.is_five_conn and len(i)!=5):
-                    print("Error: Transition table in input file "+self.trans_tab_in_file+" detected as five-connected, but line "+line+" contains "+str(len(i))+" inputs.")
-                    self.error = -2
-                    return self.error
-                if (not self.is_five_conn and len(i)!=9):
-                    print("Error: Transition table in input file "+self.trans_tab_in_file+" detected as nine-connected, but line "+line+" contains "+str(len(i))+" inputs.")
-                    self.error = -2
-                    return self.error
-
-                i = tuple([int(x) for x in i])
-                o = int(o)
-                self.trans_list.append((i,o))
-
-                for v in i:
-                    if (v>max_val):
-                        max_val = v
-                if (o>max_val):
-                    max_val = o
+                yield (tuple([int(x) for x in i]),int(o),line)
+
+    def parse_trans_file(self):
+        self.trans_list = []
+        max_val = 1
+        source = self.trans_tab_in_file if (isinstance(self.trans_tab_in_file,str)) else "rule stream"
+        for i,o,line in self.read_trans_rules():
+            if (self.is_five_conn==None):
+                self.is_five_conn = (len(i)==5)
+            if (self.is_five_conn and len(i)!=5):
+                print("Error: Transition table in input file "+source+" detected as five-connected, but line "+line+" contains "+str(len(i))+" inputs.")
+                self.error = -2
+                return self.error
+            if (not self.is_five_conn and len(i)!=9):
+                print("Error: Transition table in input file "+source+" detected as nine-connected, but line "+line+" contains "+str(len(i))+" inputs.")
+                self.error = -2
+                return self.error
+
+            self.trans_list.append((i,o))
+
+            for v in i:
+                if (v>max_val):
+                    max_val = v
+            if (o>max_val):
+                max_val = o
 
         print("ROM ways set:",self.rom_ways)
         print("Explicit transition rules parsed:",len(self.trans_list))
+        if (self.minimize and len(self.trans_list)!=0):
+            self.minimize_trans_list()
         if (len(self.trans_list)==0):
             print("Zero explicit rules found; Adding one default 5-connected rule '0 0 0 0 0 : 0'")
             self.trans_list.append(((0,0,0,0,0),0))
@@ -141,71 +305,102 @@ class cell_auto_config:
 
         return max_val
 
-    def write_init_state_def(self,f):
-        f.write("    -- Initial State\n")
-        f.write("    -- It is written using 'x => y' notation, so it would work even when one of the dimensions has size 1.\n")
-        f.write("    constant INIT_STATE     : cell_field_t := (")
-        l = ""
+    # Removes rules which do not change the automaton behaviour
+    # The Cell applies the last matching rule and keeps its state when no rule matches,
+    # so only the last rule for each input matters and rules keeping the centre state are not needed.
+    def minimize_trans_list(self):
+        centre = 2 if (self.is_five_conn) else 4
+        before = len(self.trans_list)
+        final  = {}
+        outs   = {}
+        for i,o in self.trans_list:
+            final[i] = o
+            outs.setdefault(i,set()).add(o)
+
+        conflicts = [i for i in final if len(outs[i])>1]
+        for i in conflicts:
+            print("Warning: Conflicting rules for input '"+" ".join(str(v) for v in i)+"' with outputs "+", ".join(str(v) for v in sorted(outs[i]))+"; the last one ("+str(final[i])+") is effective.")
+
+        self.trans_list = [(i,o) for i,o in final.items() if (o!=i[centre])]
+        print("Minimization: removed",before-len(final),"duplicate or overridden rules and",len(final)-len(self.trans_list),"rules without state change;",len(conflicts),"conflicting inputs found")
+        if (len(self.trans_list)==0):
+            print("Minimization left zero rules; Keeping one rule without state change")
+            self.trans_list.append((tuple(0 for v in range(centre*2+1)),0))
+
+        items_before = ceil(before/self.rom_ways)
+        items_after  = ceil(len(self.trans_list)/self.rom_ways)
+        print("Explicit transition rules after minimization:",len(self.trans_list))
+        print("ACT_ROM_ITEMS: %d -> %d" % (items_before,items_after))
+        print("Generations per second at %.1f MHz: %.0f -> %.0f" % (self.clk_freq/1e6,self.clk_freq/(items_before+3),self.clk_freq/(items_after+3)))
+
+    def write_init_state_def(self,out):
+        out.append("    -- Initial State\n")
+        out.append("    -- It is written using 'x => y' notation, so it would work even when one of the dimensions has size 1.\n")
+        out.append("    constant INIT_STATE     : cell_field_t := (")
+        state = ['"%s"' % (my_bin(v,self.state_w)) for v in range(2**self.state_w)]
+        sep = ""
         for i in range(self.rows-1,-1,-1):
-            l += " %03d => (" % (i)
-            l += ",".join(' %03d => "%s"' % (e,my_bin(s,self.state_w)) for e,s in enumerate(self.init_state[i]))
-            l += ")"
-            if (i>0):
-                l += ",\n"
-            else:
-                l += ");\n"
-            f.write(l);
-            l = "                                               "
-        f.write("\n")
-
-    def write_trans_rule_rom(self,f):
-        f.write("    -- Transition rule ROM itself\n")
-        f.write("    -- It is written using 'x => y' notation, so it would work even when one of the dimensions has size 1.\n")
-        f.write("    constant TRANS_RULE_ROM : trans_rule_rom_t := (")
-        l = ""
+            out.append(sep)
+            out.append(" %03d => (" % (i))
+            out.append(",".join(' %03d => %s' % (e,state[s]) for e,s in enumerate(self.init_state[i])))
+            out.append(")")
+            sep = ",\n                                               "
+        out.append(");\n")
+        out.append("\n")
+
+    def write_trans_rule_rom(self,out):
+        out.append("    -- Transition rule ROM itself\n")
+        out.append("    -- It is written using 'x => y' notation, so it would work even when one of the dimensions has size 1.\n")
+        out.append("    constant TRANS_RULE_ROM : trans_rule_rom_t := (")
+        state = ['"%s"' % (my_bin(v,self.state_w)) for v in range(2**self.state_w)]
+        indent = "\n                                                   "
         for i in range(2**self.rom_addr_width-1,-1,-1):
-            l += " %03d => (" % (i)
+            out.append(" %03d => (" % (i))
             for e in range(self.rom_ways-1,-1,-1):
-                l += " %03d => (" % (e)
-                l += '"%s",' % (my_bin(self.trans_list[i*self.rom_ways+e][1],self.state_w))
-                l += ",".join(['"%s"' % (my_bin(in_s,self.state_w)) for in_s in self.trans_list[i*self.rom_ways+e][0][::-1]])
-                l += ")"
+                rule = self.trans_list[i*self.rom_ways+e]
+                out.append(" %03d => (" % (e))
+                out.append(state[rule[1]])
+                out.append(",")
+                out.append(",".join([state[in_s] for in_s in rule[0][::-1]]))
+                out.append(")")
                 if (e==0):
-                    l += ")"
-                    if (i==0):
-                        l += ");"
-                    else:
-                        l += ","
+                    out.append(")")
+                    out.append(");\n" if (i==0) else ","+indent)
                 else:
-                    l += ","
-                l += "\n"
-                f.write(l)
-                l = "                                                   "
-                if (e!=0):
-                    l += "         "
-        f.write("\n")
-
-    def generate_pkg_file(self):
-        with open(self.out_file,'w') as f:
-            # Header
-            f.write("--------------------------------------------------------------------------------\n")
-            f.write("-- PROJECT: CELLULAR AUTOMATON FPGA\n")
-            f.write("--------------------------------------------------------------------------------\n")
-            f.write("-- AUTHORS: Jan Kubalek <kubalekj492@gmail.com>\n")
-            f.write("-- LICENSE: The MIT License, please read LICENSE file\n")
-            f.write("--------------------------------------------------------------------------------\n")
-            f.write("-- This is a generated file containing definition of variables\n")
-            f.write("-- for initial configuration and transition table of the Cellular Automaton.\n")
-            f.write("library IEEE;\n")
-            f.write("use IEEE.std_logic_1164.all;\n")
-            f.write("use IEEE.numeric_std.all;\n")
-            f.write("\n")
-
-            # Package declarations and correct definitions
-            f.write("package CELLULAR_AUTOMATON_CONFIG_PKG is\n")
-
-            # Constant part of the package
-            f.write("""
+                    out.append(","+indent+"         ")
+        out.append("\n")
+
+    # Writes the package unless the existing one was generated from the same inputs
+    # Returns True when the file was written.
+    def generate_pkg_file(self,force=False):
+        cfg_hash = self.config_hash
+        if (cfg_hash is None):
+            cfg_hash = config_hash(self.init_in_file,repr(self.trans_list),self.rom_ways,self.max_m_blocks,self.minimize)
+        if (not force and pkg_file_hash(self.out_file)==cfg_hash):
+            print("Package "+self.out_file+" is up to date.")
+            return False
+
+        out = []
+        # Header
+        out.append("--------------------------------------------------------------------------------\n")
+        out.append("-- PROJECT: CELLULAR AUTOMATON FPGA\n")
+        out.append("--------------------------------------------------------------------------------\n")
+        out.append("-- AUTHORS: Jan Kubalek <kubalekj492@gmail.com>\n")
+        out.append("-- LICENSE: The MIT License, please read LICENSE file\n")
+        out.append("--------------------------------------------------------------------------------\n")
+        out.append("-- This is a generated file containing definition of variables\n")
+        out.append("-- for initial configuration and transition table of the Cellular Automaton.\n")
+        out.append(hash_prefix+cfg_hash+"\n")
+        out.append("library IEEE;\n")
+        out.append("use IEEE.std_logic_1164.all;\n")
+        out.append("use IEEE.numeric_std.all;\n")
+        out.append("\n")
+
+        # Package declarations and correct definitions
+        out.append("package CELLULAR_AUTOMATON_CONFIG_PKG is\n")
+
+        # Constant part of the package
+        out.append("""
     -- 2-logarithm function
     function log2(number : integer) return integer;
 
@@ -250,20 +445,20 @@ class cell_auto_config:
 
 """ % (self.cols,self.rows,5 if (self.is_five_conn) else 9,self.state_w,self.rom_ways,self.rom_addr_width,self.act_rom_items,self.max_m_blocks))
 
-            # Init state declaration and definition
-            self.write_init_state_def(f)
+        # Init state declaration and definition
+        self.write_init_state_def(out)
 
-            # Transition rules ROM declaration and definition
-            self.write_trans_rule_rom(f)
+        # Transition rules ROM declaration and definition
+        self.write_trans_rule_rom(out)
 
-            f.write("    -- -------------------------------------------------------------------------\n")
-            f.write("\n")
-            f.write("end CELLULAR_AUTOMATON_CONFIG_PKG;\n")
-            f.write("\n")
+        out.append("    -- -------------------------------------------------------------------------\n")
+        out.append("\n")
+        out.append("end CELLULAR_AUTOMATON_CONFIG_PKG;\n")
+        out.append("\n")
 
-            # Package body (constant)
-            f.write("package body CELLULAR_AUTOMATON_CONFIG_PKG is\n")
-            f.write("""
+        # Package body (constant)
+        out.append("package body CELLULAR_AUTOMATON_CONFIG_PKG is\n")
+        out.append("""
 
     -- -------------------------------------------------------------------------
 
@@ -284,7 +479,52 @@ class cell_auto_config:
     -- -------------------------------------------------------------------------
 
 """)
-            f.write("end;\n")
+        out.append("end;\n")
+
+        with open(self.out_file,'w') as f:
+            f.write("".join(out))
+        return True
+
+# Sweeps ROM ways for a parsed configuration (parsed with rom_ways=1) and reports
+# predicted speed and resources; returns list of Pareto-optimal candidates fitting the budget
+def tune_config(config,ways_list,fmax,luts,ffs,m_blocks):
+    model = resource_model()
+    model.report_calibration()
+    cells = config.rows*config.cols
+    rules = config.act_rom_items
+    conn  = 5 if (config.is_five_conn) else 9
+    cands = []
+    for ways in sorted(set(ways_list)):
+        # Ways beyond a single ROM item only add LUTs
+        if (cands and ceil(rules/cands[-1]["ways"])==1):
+            break
+        blocks  = model.m_blocks_per_cell(rules,conn,config.state_w,ways)
+        m_cells = min(cells,m_blocks//blocks)
+        c = {
+            "ways"      : ways,
+            "m_cells"   : m_cells,
+            "cycles"    : ceil(rules/ways)+3,
+            "gen_per_s" : fmax/(ceil(rules/ways)+3),
+            "luts"      : model.luts(cells,rules,conn,config.state_w,ways,m_cells),
+            "ffs"       : model.ffs(cells,rules,conn,config.state_w,ways),
+            "m_blocks"  : m_cells*blocks,
+        }
+        c["fits"] = (c["luts"]<=luts and c["ffs"]<=ffs)
+        cands.append(c)
+
+    # Pareto front over speed (higher is better) and LUTs (lower is better)
+    pareto = [c for c in cands if (c["fits"] and not any(o["fits"] and o["gen_per_s"]>=c["gen_per_s"] and o["luts"]<=c["luts"] and
+                                                          (o["gen_per_s"]>c["gen_per_s"] or o["luts"]<c["luts"]) for o in cands))]
+    print("Candidate configurations for %dx%d cells, %d rules, %d-connected, %d-bit state at %.1f MHz:" % (config.cols,config.rows,rules,conn,config.state_w,fmax/1e6))
+    print("    ways  M-RAM cells  cycles/gen       gen/s      LUTs       FFs  M9K  ")
+    for c in cands:
+        mark = "pareto" if (c in pareto) else ("" if (c["fits"]) else "over budget")
+        print("    %4d  %11d  %10d  %10.0f  %8.0f  %8.0f  %3d  %s" % (c["ways"],c["m_cells"],c["cycles"],c["gen_per_s"],c["luts"],c["ffs"],c["m_blocks"],mark))
+    return pareto
+
+# The fastest of the Pareto-optimal candidates (the smaller one on a tie)
+def best_config(pareto):
+    return max(pareto,key=lambda c: (c["gen_per_s"],-c["luts"]))
 
 if (__name__=="__main__"):
     # Define parameters
@@ -294,14 +534,46 @@ if (__name__=="__main__"):
     parser.add_argument("trans_table_file",help="Name of input '.tab 'file with explicit automaton transition rules")
     parser.add_argument("--rom_ways",type=int,default=4,help="Number of parallel ways in Cell associative ROM for transition rules (default: 4)")
     parser.add_argument("--max_m_block_cells",type=int,default=0,help="Maximum number of Cells, which can store their ROM in an M-RAM block (the rest will be logic LUTs instead) (default: 0)")
+    parser.add_argument("--minimize",action="store_true",help="Remove duplicate, overridden and no-change transition rules before building the ROM")
+    parser.add_argument("--clk_freq",type=float,default=50e6,help="Clock frequency used to report generations per second (default: 50e6)")
+    parser.add_argument("--tune",action="store_true",help="Predict speed and resource usage for a sweep of ROM ways and report Pareto-optimal configurations; --clk_freq is used as Fmax")
+    parser.add_argument("--tune_ways",type=int,nargs="+",default=None,help="ROM ways values to sweep in tuning mode (default: 1 to 32)")
+    parser.add_argument("--tune_emit",action="store_true",help="In tuning mode, generate the package for the fastest configuration fitting the budget")
+    parser.add_argument("--budget_luts",type=int,default=device_luts,help="LUT budget for tuning mode (default: %d)" % (device_luts))
+    parser.add_argument("--budget_ffs",type=int,default=device_ffs,help="FF budget for tuning mode (default: %d)" % (device_ffs))
+    parser.add_argument("--budget_m_blocks",type=int,default=device_m_blocks,help="M9K block budget for tuning mode (default: %d)" % (device_m_blocks))
+    parser.add_argument("--force",action="store_true",help="Generate the package even when it is up to date")
     parser.add_argument("--vhdl_pkg_output",default="../../rtl/comp/cellular_automaton/cellular_automaton_config_pkg.vhd",help="Name of output file (default: ../../rtl/comp/cellular_automaton/cellular_automaton_config_pkg.vhd)")
 
     # Parse arguments
     args = parser.parse_args()
 
+    # Search for the best ROM ways setting
+    if (args.tune):
+        ways_list = args.tune_ways if (args.tune_ways) else list(range(1,33))
+        tune_cfg = cell_auto_config(args.init_state_file,args.trans_table_file,args.vhdl_pkg_output,1,0,args.minimize,args.clk_freq)
+        if (tune_cfg.error!=0):
+            exit(tune_cfg.error)
+        pareto = tune_config(tune_cfg,ways_list,args.clk_freq,args.budget_luts,args.budget_ffs,args.budget_m_blocks)
+        if (len(pareto)==0):
+            print("Error: No configuration fits the device budget.")
+            exit(-3)
+        best = best_config(pareto)
+        print("Fastest configuration fitting the budget: --rom_ways %d --max_m_block_cells %d" % (best["ways"],best["m_cells"]))
+        if (not args.tune_emit):
+            exit(0)
+        args.rom_ways          = best["ways"]
+        args.max_m_block_cells = best["m_cells"]
+
+    # Skip parsing when the package was generated from the same inputs
+    cfg_hash = config_hash(args.init_state_file,args.trans_table_file,args.rom_ways,args.max_m_block_cells,args.minimize)
+    if (not args.force and pkg_file_hash(args.vhdl_pkg_output)==cfg_hash):
+        print("Package "+args.vhdl_pkg_output+" is up to date.")
+        exit(0)
+
     # Run configuration generator
-    ca_config = cell_auto_config(args.init_state_file,args.trans_table_file,args.vhdl_pkg_output,args.rom_ways,args.max_m_block_cells)
+    ca_config = cell_auto_config(args.init_state_file,args.trans_table_file,args.vhdl_pkg_output,args.rom_ways,args.max_m_block_cells,args.minimize,args.clk_freq)
     if (ca_config.error!=0):
         exit(ca_config.error)
-    ca_config.generate_pkg_file()
+    ca_config.generate_pkg_file(args.force)
 
@@ -0,0 +1,227 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Memoized quadtree (Hashlife) model of the Cellular Automaton for long runs
+# The torus of the FPGA is evolved as the infinite plane tiled with it. A node
+# of level L is a 2^L x 2^L square of cells made of four level L-1 nodes (level 0
+# nodes are cell states). Nodes are shared by content and each node remembers
+# its centre half after 2^j generations, so regular (settled) patterns reach
+# generation 2^k in time roughly proportional to k. The rules are those of
+# 'cell_auto_engine' (last matching rule wins, unmatched inputs keep the state).
+#
+# The table of shared nodes is bounded and the least recently used nodes are
+# dropped from it; dropped nodes stay valid, only their sharing and results are lost.
+
+from argparse import ArgumentParser
+from collections import OrderedDict
+from math import ceil, log
+from time import time
+
+import numpy as np
+
+from cell_auto_engine import cell_auto_engine, neigh_offsets
+
+class node:
+    __slots__ = ("level","nw","ne","sw","se","res")
+
+    def __init__(self, level, nw, ne, sw, se):
+        self.level = level
+        self.nw    = nw
+        self.ne    = ne
+        self.sw    = sw
+        self.se    = se
+        self.res   = {} # j -> centre after 2^j generations
+
+class hashlife:
+    def __init__(self, trans_tab_file, init_file=None, rom_ways=1, max_nodes=2**20, verbose=False):
+        self.engine = cell_auto_engine(trans_tab_file,init_file,rom_ways,verbose)
+        self.error  = self.engine.error
+        if (self.error):
+            return
+        self.conn    = self.engine.conn
+        self.state_w = self.engine.state_w
+        # Packed key -> output, the same rules as checked by the engine
+        self.rules   = dict(zip(self.engine.index.keys.tolist(),self.engine.index.outs.tolist()))
+        # Positions of inputs of the centre Cells in a 4x4 block (row-major)
+        self.base_inputs = [[(r+dr)*4+c+dc for dr,dc in neigh_offsets[self.conn]] for r,c in ((1,1),(1,2),(2,1),(2,2))]
+
+        self.max_nodes = max_nodes
+        self.nodes     = OrderedDict()
+        self.hits      = 0 # results found in nodes
+        self.misses    = 0 # results computed
+        self.evicted   = 0
+
+        self.grid = self.engine.grid
+        self.gen  = 0
+
+    def set_state(self, grid):
+        self.grid = np.array(grid,dtype=np.uint8)
+        self.gen  = 0
+
+    # Shared node with given quadrants
+    def join(self, nw, ne, sw, se):
+        key = (nw,ne,sw,se)
+        n = self.nodes.get(key)
+        if (n is not None):
+            self.nodes.move_to_end(key)
+            return n
+        level = 1 if (isinstance(nw,int)) else nw.level+1
+        n = node(level,nw,ne,sw,se)
+        self.nodes[key] = n
+        if (len(self.nodes)>self.max_nodes):
+            old = self.nodes.popitem(last=False)[1]
+            # Results would keep whole generations of nodes alive
+            old.res.clear()
+            self.evicted += 1
+        return n
+
+    # Centre half of a node (level L-1)
+    def centre(self, n):
+        return self.join(n.nw.se,n.ne.sw,n.sw.ne,n.se.nw)
+
+    # Centre 2x2 of a 4x4 node after one generation
+    def base(self, n):
+        cells = [n.nw.nw,n.nw.ne,n.ne.nw,n.ne.ne,
+                 n.nw.sw,n.nw.se,n.ne.sw,n.ne.se,
+                 n.sw.nw,n.sw.ne,n.se.nw,n.se.ne,
+                 n.sw.sw,n.sw.se,n.se.sw,n.se.se]
+        new = []
+        for pos,c in zip(self.base_inputs,(5,6,9,10)):
+            key = 0
+            for k,p in enumerate(pos):
+                key |= cells[p]<<(self.state_w*k)
+            new.append(self.rules.get(key,cells[c]))
+        return self.join(*new)
+
+    # Centre half of node 'n' (level L) after 2^j generations, 0 <= j <= L-2
+    def result(self, n, j):
+        r = n.res.get(j)
+        if (r is not None):
+            self.hits += 1
+            return r
+        self.misses += 1
+        if (n.level==2):
+            r = self.base(n)
+        else:
+            nw, ne, sw, se = n.nw, n.ne, n.sw, n.se
+            # Nine overlapping nodes of level L-1
+            sub = [nw,                              self.join(nw.ne,ne.nw,nw.se,ne.sw), ne,
+                   self.join(nw.sw,nw.se,sw.nw,sw.ne), self.join(nw.se,ne.sw,sw.ne,se.nw), self.join(ne.sw,ne.se,se.nw,se.ne),
+                   sw,                              self.join(sw.ne,se.nw,sw.se,se.sw), se]
+            full = (j==n.level-2)
+            s = [self.result(x,n.level-3 if (full) else j) for x in sub]
+            quads = [self.join(s[0],s[1],s[3],s[4]),self.join(s[1],s[2],s[4],s[5]),
+                     self.join(s[3],s[4],s[6],s[7]),self.join(s[4],s[5],s[7],s[8])]
+            if (full):
+                # The second half of the generations
+                r = self.join(*[self.result(q,n.level-3) for q in quads])
+            else:
+                r = self.join(*[self.centre(q) for q in quads])
+        n.res[j] = r
+        return r
+
+    # Level 'level' node of the tiled plane with its top left Cell at (x,y)
+    def build(self, level, x, y):
+        rows, cols = self.grid.shape
+        grid = self.grid.tolist()
+        # The plane repeats the torus, so a node only depends on its offset within it
+        memo = {}
+        def node_at(l, x, y):
+            if (l==0):
+                return grid[y%rows][x%cols]
+            key = (l,x%cols,y%rows)
+            n = memo.get(key)
+            if (n is None):
+                h = 2**(l-1)
+                n = self.join(node_at(l-1,x,y),node_at(l-1,x+h,y),node_at(l-1,x,y+h),node_at(l-1,x+h,y+h))
+                memo[key] = n
+            return n
+        return node_at(level,x,y)
+
+    # Cells of node 'n' within the window of the grid size (top left corner of the node at 0,0)
+    def extract(self, n):
+        rows, cols = self.grid.shape
+        out = np.zeros((rows,cols),dtype=np.uint8)
+        def fill(n, size, x, y):
+            if (x>=cols or y>=rows):
+                return
+            if (size==1):
+                out[y,x] = n
+                return
+            h = size//2
+            fill(n.nw,h,x,y)
+            fill(n.ne,h,x+h,y)
+            fill(n.sw,h,x,y+h)
+            fill(n.se,h,x+h,y+h)
+        fill(n,2**n.level,0,0)
+        return out
+
+    # Advance the torus by 2^j generations
+    def step_pow2(self, j):
+        # Level whose centre half covers the whole torus
+        level = max(j+2,ceil(log(max(self.grid.shape),2))+1,2)
+        h = 2**(level-2)
+        root = self.build(level,-h,-h)
+        self.grid = self.extract(self.result(root,j))
+        self.gen += 2**j
+
+    # Compute 'n' generations (any number, as a sum of powers of 2)
+    def step(self, n=1):
+        j = 0
+        left = n # generations not computed yet
+        while (n>0):
+            # A still life stays the same forever
+            if (np.array_equal(self.engine.next_state(self.grid),self.grid)):
+                self.gen += left
+                break
+            if (n&1):
+                self.step_pow2(j)
+                left -= 2**j
+            n >>= 1
+            j += 1
+        return self.grid
+
+    def report(self):
+        print("Nodes: %d (limit %d, %d evicted), results: %d computed, %d reused" % (len(self.nodes),self.max_nodes,self.evicted,self.misses,self.hits))
+
+if (__name__=="__main__"):
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("init_state_file",help="Name of input '.cas' (or '.cab') file with initial automaton state")
+    parser.add_argument("trans_table_file",help="Name of input '.tab' (or '.cab') file with explicit automaton transition rules")
+    parser.add_argument("--gens",type=int,default=1,help="Number of generations to compute (default: 1)")
+    parser.add_argument("--log2_gens",type=int,default=None,help="Compute 2^K generations instead of --gens")
+    parser.add_argument("--rom_ways",type=int,default=1,help="Number of ROM ways of the modelled hardware; affects only padding of the rule list (default: 1)")
+    parser.add_argument("--max_nodes",type=int,default=2**20,help="Maximum number of shared nodes kept (default: 2**20)")
+    parser.add_argument("--validate",action="store_true",help="Compare the result with step by step computation by cell_auto_engine")
+    parser.add_argument("--quiet",action="store_true",help="Do not print the resulting state")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    gens = 2**args.log2_gens if (args.log2_gens is not None) else args.gens
+
+    # Run the model
+    life = hashlife(args.trans_table_file,args.init_state_file,args.rom_ways,args.max_nodes)
+    if (life.error!=0):
+        exit(life.error)
+    t = time()
+    life.step(gens)
+    t = time()-t
+    print("Generations: %d, time: %.3f s" % (gens,t))
+    life.report()
+    if (not args.quiet):
+        for row in life.grid:
+            print("".join("%02d " % v for v in row))
+
+    if (args.validate):
+        life.engine.step(gens)
+        diff = int(np.count_nonzero(life.engine.grid!=life.grid))
+        print("Validation against cell_auto_engine:","OK" if (diff==0) else "%d cells differ" % (diff))
+        if (diff):
+            exit(1)
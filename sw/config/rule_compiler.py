@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Compiler of transition tables from compact rule descriptions
+# Rules are generated lazily and only those changing the Cell state are emitted
+# (the Cell keeps its state when no rule matches), so tables can be streamed
+# to a '.tab' file or directly into 'cell_auto_config' in constant memory.
+#
+# Supported descriptions:
+#  - Outer totalistic (Life-like) rules 'B3/S23', von Neumann neighbourhood with suffix 'V' ('B1/S1V')
+#  - Generations rules 'B2/S/C3' with C states: 0 is dead, 1 is alive and the others are dying
+#  - Compact '.tab' tables expanded over a symmetry class (none, rotate4, rotate4reflect, permute)
+
+from argparse import ArgumentParser
+from itertools import combinations, product
+from math import ceil, log
+
+# Neighbours in the order used in '.tab' files
+# 9-connected: NW N NE W C E SW S SE
+# 5-connected: N W C E S
+centre_index = {9 : 4, 5 : 2}
+
+# Positions of the inputs within the 3x3 neighbourhood (row*3+column)
+neigh_positions = {9 : [0,1,2,3,4,5,6,7,8], 5 : [1,3,4,5,7]}
+
+symmetries = ["none","rotate4","rotate4reflect","permute"]
+
+# Parses a Life-like or Generations rule
+# Returns (birth counts, survival counts, number of states, connection)
+def parse_rule(text):
+    text  = text.strip().upper()
+    conn  = 9
+    if (text.endswith("V")):
+        conn = 5
+        text = text[:-1]
+    birth   = None
+    survive = None
+    states  = 2
+    for part in text.split("/"):
+        if (part.startswith("B")):
+            birth = set(int(x) for x in part[1:])
+        elif (part.startswith("S")):
+            survive = set(int(x) for x in part[1:])
+        elif (part.startswith("C") or part.startswith("G")):
+            states = int(part[1:])
+        else:
+            raise ValueError("Unknown part '%s' of rule '%s'" % (part,text))
+    if (birth is None or survive is None):
+        raise ValueError("Rule '%s' must contain both B and S parts" % (text))
+    if (states<2):
+        raise ValueError("Rule '%s' must have at least 2 states" % (text))
+    for n in birth | survive:
+        if (n>=conn):
+            raise ValueError("Rule '%s' uses %d neighbours, but a %d-connected Cell only has %d" % (text,n,conn,conn-1))
+    return (birth,survive,states,conn)
+
+# Generates rules of an outer totalistic automaton
+# 'func(centre,live)' returns the next state of a Cell with state 'centre' and 'live' neighbours in state 1.
+# Only rules changing the state are generated; neighbours take all values 0 to 'states'-1.
+def totalistic_rules(conn, states, func):
+    k      = conn-1
+    c      = centre_index[conn]
+    others = [v for v in range(states) if (v!=1)]
+    for centre in range(states):
+        for live in range(k+1):
+            out = func(centre,live)
+            if (out==centre):
+                continue
+            for pos in combinations(range(k),live):
+                neigh = [1]*k
+                free  = [p for p in range(k) if (p not in pos)]
+                for rest in product(others,repeat=k-live):
+                    for p,v in zip(free,rest):
+                        neigh[p] = v
+                    yield (tuple(neigh[:c])+(centre,)+tuple(neigh[c:]),out)
+
+# Generates rules of a Life-like or Generations automaton given as text
+def rule_stream(text):
+    birth, survive, states, conn = parse_rule(text)
+    def func(centre, live):
+        if (centre==0):
+            return 1 if (live in birth) else 0
+        if (centre==1):
+            return 1 if (live in survive) else (2%states)
+        return (centre+1)%states
+    return totalistic_rules(conn,states,func)
+
+# Permutations of input positions forming the symmetry class
+def symmetry_perms(conn, symmetry):
+    pos  = neigh_positions[conn]
+    idx  = {p : i for i,p in enumerate(pos)}
+    def rot(p):
+        return (2-p%3)*3+p//3  # position taking the value after rotation by 90 degrees
+    def ref(p):
+        return p//3*3+2-p%3
+    perms = [list(range(conn))]
+    if (symmetry=="none"):
+        return perms
+    if (symmetry not in ("rotate4","rotate4reflect")):
+        raise ValueError("Unknown symmetry '%s' (use one of %s)" % (symmetry,", ".join(symmetries)))
+    for i in range(3):
+        perms.append([perms[-1][idx[rot(p)]] for p in pos])
+    if (symmetry=="rotate4reflect"):
+        perms += [[q[idx[ref(p)]] for p in pos] for q in perms]
+    return perms
+
+# Distinct permutations of a sequence in lexicographic order
+def distinct_perms(values):
+    v = sorted(values)
+    while (True):
+        yield tuple(v)
+        i = len(v)-2
+        while (i>=0 and v[i]>=v[i+1]):
+            i -= 1
+        if (i<0):
+            return
+        e = len(v)-1
+        while (v[e]<=v[i]):
+            e -= 1
+        v[i], v[e] = v[e], v[i]
+        v[i+1:] = v[:i:-1]
+
+# Expands rules over a symmetry class; each produced input is generated once per source rule
+def symmetric_rules(rules, symmetry):
+    for inputs, out in rules:
+        conn = len(inputs)
+        if (symmetry=="permute"):
+            c = centre_index[conn]
+            for n in distinct_perms(inputs[:c]+inputs[c+1:]):
+                yield (n[:c]+(inputs[c],)+n[c:],out)
+            continue
+        seen = set()
+        for p in symmetry_perms(conn,symmetry):
+            i = tuple(inputs[x] for x in p)
+            if (i not in seen):
+                seen.add(i)
+                yield (i,out)
+
+# Reads rules of a '.tab' file
+def read_tab(file_name):
+    with open(file_name,"r") as f:
+        for line in f:
+            line = line.split("#")[0].strip()
+            if (len(line)==0):
+                continue
+            (i,o) = [x.strip() for x in line.split(":")]
+            yield (tuple(int(x) for x in i.split()),int(o))
+
+# Writes rules in '.tab' format, returns the number of written rules
+def write_tab(rules, f, title=None):
+    if (title is not None):
+        f.write("################################\n# %s\n################################\n\n" % (title))
+    n = 0
+    for i,o in rules:
+        f.write("%s : %d\n" % (" ".join(map(str,i)),o))
+        n += 1
+    f.write("\n################################\n")
+    return n
+
+if __name__ == '__main__':
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("rule",help="Rule in B/S notation ('B3/S23', 'B2/S/C3', suffix 'V' for 5-connection) or name of a compact '.tab' file")
+    parser.add_argument("--symmetry",default="none",choices=symmetries,help="Symmetry class used to expand a compact '.tab' file (default: none)")
+    parser.add_argument("--output",default="a.tab",help="Name of output '.tab' file (default: a.tab)")
+    parser.add_argument("--init_state_file",default=None,help="Stream the rules into a VHDL package with this initial state instead of writing a '.tab' file")
+    parser.add_argument("--rom_ways",type=int,default=4,help="Number of parallel ways in Cell associative ROM (default: 4)")
+    parser.add_argument("--max_m_block_cells",type=int,default=0,help="Maximum number of Cells storing their ROM in an M-RAM block (default: 0)")
+    parser.add_argument("--vhdl_pkg_output",default="../../rtl/comp/cellular_automaton/cellular_automaton_config_pkg.vhd",help="Name of output VHDL package (default: ../../rtl/comp/cellular_automaton/cellular_automaton_config_pkg.vhd)")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    if (args.rule.endswith(".tab")):
+        rules = symmetric_rules(read_tab(args.rule),args.symmetry)
+    else:
+        rules = rule_stream(args.rule)
+
+    if (args.init_state_file):
+        from config_pkg_gen import cell_auto_config
+        ca_config = cell_auto_config(args.init_state_file,rules,args.vhdl_pkg_output,args.rom_ways,args.max_m_block_cells)
+        if (ca_config.error!=0):
+            exit(ca_config.error)
+        ca_config.generate_pkg_file()
+    else:
+        with open(args.output,"w") as f:
+            n = write_tab(rules,f,args.rule)
+        print("Transition rules written to %s: %d" % (args.output,n))
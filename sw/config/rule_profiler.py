@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Profiler of transition rule usage for ROM pruning
+# Representative initial states are replayed by 'cell_auto_engine' and every
+# Cell update is attributed to the rule deciding it (the last matching one, as
+# in the Cell's ROM). Rules which never decide an update are dead for this
+# workload: the pruned table without them computes the same generations of the
+# replayed states with fewer ROM items, but other initial states may differ.
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from io import StringIO
+
+import numpy as np
+
+from config_pkg_gen   import cell_auto_config
+from cell_auto_engine import cell_auto_engine, neigh_keys, pack_key
+from rule_compiler    import write_tab
+
+# Rules of a '.tab' (or '.cab') file as parsed by cell_auto_config,
+# returns (rules, connection) or None when parsing fails
+def parse_rules(trans_tab_file):
+    log = StringIO()
+    with redirect_stdout(log):
+        config = cell_auto_config(None,trans_tab_file,None,1,0)
+    if (config.error):
+        print(log.getvalue(),end="")
+        return None
+    return (config.trans_list[:config.act_rom_items],5 if (config.is_five_conn) else 9)
+
+# Parsed configuration without printing
+def quiet_config(init_file, rules, rom_ways, max_m_blocks=0, out_file=None):
+    with redirect_stdout(StringIO()):
+        return cell_auto_config(init_file,rules,out_file,rom_ways,max_m_blocks)
+
+class rule_profile:
+    def __init__(self, trans_tab_file):
+        self.trans_tab_file = trans_tab_file
+        self.error = 0
+        parsed = parse_rules(trans_tab_file)
+        if (parsed is None):
+            self.error = -2
+            return
+        self.rules, self.conn = parsed
+        self.hits      = np.zeros(len(self.rules),dtype=np.int64)
+        self.unmatched = 0 # updates of Cells without a matching rule
+        self.updates   = 0
+        self.finals    = [] # final states of the replayed workloads
+
+    # Replay 'gens' generations of the initial state in 'init_file'
+    def replay(self, init_file, gens):
+        engine = cell_auto_engine(self.trans_tab_file,init_file)
+        if (engine.error):
+            return engine.error
+        # Packed input -> index of the rule deciding it
+        winner = {}
+        for r,(i,o) in enumerate(self.rules):
+            winner[pack_key(i,engine.state_w)] = r
+        grid = engine.grid
+        rows = grid.shape[0]
+        for g in range(gens):
+            keys = neigh_keys(grid,0,rows,engine.conn,engine.state_w)
+            values, counts = np.unique(keys,return_counts=True)
+            for k,c in zip(values.tolist(),counts.tolist()):
+                r = winner.get(k)
+                if (r is None):
+                    self.unmatched += c
+                else:
+                    self.hits[r] += c
+            self.updates += grid.size
+            grid = engine.index.apply(keys,grid)
+        self.finals.append((init_file,gens,grid))
+        return 0
+
+    def live(self):
+        return [r for r in range(len(self.rules)) if (self.hits[r]>0)]
+
+    def dead(self):
+        return [r for r in range(len(self.rules)) if (self.hits[r]==0)]
+
+    def rule_text(self, r):
+        i, o = self.rules[r]
+        return " ".join(map(str,i))+" : "+str(o)
+
+    def report(self, top=10, list_dead=False):
+        print("Cell updates replayed: %d, decided by rules: %d, without matching rule: %d" % (self.updates,self.updates-self.unmatched,self.unmatched))
+        live = self.live()
+        dead = self.dead()
+        print("Rules: %d, used: %d, dead: %d" % (len(self.rules),len(live),len(dead)))
+        print("Hot rules:")
+        print("    %6s  %12s  %7s  %s" % ("rule","hits","share","inputs : output"))
+        for r in sorted(live,key=lambda r: -self.hits[r])[:top]:
+            print("    %6d  %12d  %6.2f%%  %s" % (r,self.hits[r],100*self.hits[r]/self.updates,self.rule_text(r)))
+        if (list_dead):
+            print("Dead rules:")
+            for r in dead:
+                print("    %6d  %s" % (r,self.rule_text(r)))
+
+    # Rules deciding at least one replayed update, in the original order
+    def pruned_rules(self):
+        return [self.rules[r] for r in self.live()]
+
+    # Replays the workloads with the pruned rules, returns the number of differing final states
+    def check_pruned(self, pruned_tab_file):
+        diff = 0
+        for init_file,gens,grid in self.finals:
+            engine = cell_auto_engine(pruned_tab_file,init_file)
+            engine.step(gens)
+            if (not np.array_equal(engine.grid,grid)):
+                diff += 1
+        return diff
+
+if (__name__=="__main__"):
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("trans_table_file",help="Name of input '.tab' (or '.cab') file with explicit automaton transition rules")
+    parser.add_argument("workload",nargs="+",help="Names of '.cas' (or '.cab') files with representative initial states")
+    parser.add_argument("--gens",type=int,default=1000,help="Generations replayed for each initial state (default: 1000)")
+    parser.add_argument("--top",type=int,default=10,help="Number of hot rules to report (default: 10)")
+    parser.add_argument("--list_dead",action="store_true",help="List all dead rules")
+    parser.add_argument("--output",default=None,help="Write the rules used by the workload to this '.tab' file")
+    parser.add_argument("--rom_ways",type=int,default=4,help="Number of parallel ways in Cell associative ROM used to compare the tables (default: 4)")
+    parser.add_argument("--clk_freq",type=float,default=50e6,help="Clock frequency used to report generations per second (default: 50e6)")
+    parser.add_argument("--vhdl_pkg_output",default=None,help="Generate VHDL package of the pruned table with the first initial state to this file")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    profile = rule_profile(args.trans_table_file)
+    if (profile.error!=0):
+        exit(profile.error)
+    for init_file in args.workload:
+        e = profile.replay(init_file,args.gens)
+        if (e!=0):
+            exit(e)
+    profile.report(args.top,args.list_dead)
+
+    if (args.output):
+        with open(args.output,"w") as f:
+            n = write_tab(profile.pruned_rules(),f,"Rules of %s used by %s" % (args.trans_table_file," ".join(args.workload)))
+        print("Pruned transition rules written to %s: %d" % (args.output,n))
+        diff = profile.check_pruned(args.output)
+        print("Replay with the pruned table:","identical" if (diff==0) else "%d final states differ" % (diff))
+
+        # Effect on the generated hardware
+        before = quiet_config(args.workload[0],args.trans_table_file,args.rom_ways)
+        after  = quiet_config(args.workload[0],args.output,args.rom_ways)
+        print("    %-10s %14s %10s %12s" % ("table","ACT_ROM_ITEMS","GEN_CYCLES","gen/s"))
+        for name,c in (("original",before),("pruned",after)):
+            print("    %-10s %14d %10d %12.0f" % (name,c.act_rom_items,c.act_rom_items+3,args.clk_freq/(c.act_rom_items+3)))
+        if (args.vhdl_pkg_output):
+            after.out_file = args.vhdl_pkg_output
+            after.generate_pkg_file()
+            print("VHDL package written to %s" % (args.vhdl_pkg_output))
@@ -0,0 +1,224 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Multi-process variant of 'cell_auto_engine' for large fields
+# The field lives twice in shared memory (current and next generation). Each
+# worker process owns a band of rows: it reads its band and the halo rows of
+# its neighbours straight from the current buffer and writes the band into the
+# other one. All workers meet at a barrier after every generation and the
+# buffers swap roles, so nothing is copied between processes. When a worker
+# dies, the barrier is aborted and step() raises RuntimeError.
+
+import multiprocessing as mp
+import os
+import threading
+from argparse import ArgumentParser
+from multiprocessing import shared_memory
+from time import time
+
+import numpy as np
+
+from cell_auto_engine import cell_auto_engine, rule_index, key_dtype, neigh_offsets
+
+# Row bands [r0,r1) of nearly equal size
+def row_bands(rows, n):
+    return [(rows*i//n,rows*(i+1)//n) for i in range(n)]
+
+# One generation of a band, working only in arrays allocated once per worker
+# (the same keys as neigh_keys, built from views of the band with its halo)
+class band_step:
+    def __init__(self, shape, band, index):
+        self.rows, self.cols = shape
+        self.r0, self.r1 = band
+        self.index = index
+        n = self.r1-self.r0
+        # Keys index the lookup table directly, otherwise they are searched as in rule_index
+        dtype = np.intp if (index.lut is not None) else key_dtype(index.key_bits)
+        self.halo = np.empty((n+2,self.cols+2),dtype=dtype)
+        self.keys = np.empty((n,self.cols),dtype=dtype)
+        self.tmp  = np.empty((n,self.cols),dtype=dtype)
+        self.new  = np.empty((n,self.cols),dtype=np.uint8)
+        self.mask = np.empty((n,self.cols),dtype=bool)
+        self.offsets = [(1+dr,1+dc,dtype(index.state_w*k)) for k,(dr,dc) in enumerate(neigh_offsets[index.conn])]
+
+    def __call__(self, src, dst):
+        r0, r1, n, cols = self.r0, self.r1, self.r1-self.r0, self.cols
+        h = self.halo
+        h[1:-1,1:-1] = src[r0:r1]
+        h[0,1:-1]    = src[(r0-1)%self.rows]
+        h[-1,1:-1]   = src[r1%self.rows]
+        h[:,0]       = h[:,-2]
+        h[:,-1]      = h[:,1]
+        self.keys.fill(0)
+        for y,x,shift in self.offsets:
+            np.left_shift(h[y:y+n,x:x+cols],shift,out=self.tmp)
+            np.bitwise_or(self.keys,self.tmp,out=self.keys)
+        out = dst[r0:r1]
+        if (self.index.lut is None):
+            # Binary search of wide keys allocates its results
+            out[:] = self.index.apply(self.keys,src[r0:r1])
+            return
+        np.take(self.index.lut,self.keys,out=self.new)
+        np.not_equal(self.new,0xFF,out=self.mask)
+        out[:] = src[r0:r1]
+        np.copyto(out,self.new,where=self.mask)
+
+# Replies None instead of the number of generations when the barrier breaks
+# (another worker died or the parent aborted the step)
+def band_worker(names, shape, band, rules, conn, state_w, barrier, pipe, timeout):
+    shms = [shared_memory.SharedMemory(name=n) for n in names]
+    bufs = [np.ndarray(shape,dtype=np.uint8,buffer=s.buf) for s in shms]
+    step = band_step(shape,band,rule_index(rules,conn,state_w))
+    while (True):
+        cmd = pipe.recv()
+        if (cmd is None):
+            break
+        cur, n = cmd
+        try:
+            for i in range(n):
+                step(bufs[cur],bufs[1-cur])
+                # Nobody may overwrite the buffer before all bands read it
+                barrier.wait(timeout)
+                cur = 1-cur
+        except threading.BrokenBarrierError:
+            pipe.send(None)
+            break
+        pipe.send(n)
+    del bufs, step
+    for s in shms:
+        s.close()
+
+class sharded_engine:
+    # A worker waits at most 'timeout' seconds for the others after each generation
+    def __init__(self, trans_tab_file, init_file=None, rom_ways=1, workers=None, verbose=False, timeout=60.0):
+        self.workers = workers if (workers is not None) else os.cpu_count()
+        self.timeout = timeout
+        self.procs   = []
+        self.shms    = []
+        self.gen     = 0
+        # Rules parsed exactly as by the package generator
+        self.engine = cell_auto_engine(trans_tab_file,init_file,rom_ways,verbose)
+        self.error  = self.engine.error
+        if (self.error):
+            return
+        self.conn    = self.engine.conn
+        self.state_w = self.engine.state_w
+        if (self.engine.grid is not None):
+            self.set_state(self.engine.grid)
+
+    def set_state(self, grid):
+        grid = np.asarray(grid,dtype=np.uint8)
+        if (not self.shms or self.bufs[0].shape!=grid.shape):
+            self.start_workers(grid.shape)
+        self.cur = 0
+        self.bufs[0][:] = grid
+        self.gen = 0
+
+    def start_workers(self, shape):
+        self.close()
+        size = max(1,shape[0]*shape[1])
+        self.shms = [shared_memory.SharedMemory(create=True,size=size) for i in range(2)]
+        self.bufs = [np.ndarray(shape,dtype=np.uint8,buffer=s.buf) for s in self.shms]
+        n = max(1,min(self.workers,shape[0]))
+        self.barrier = mp.Barrier(n)
+        rules = (self.engine.index.keys.astype(np.uint64),self.engine.index.outs)
+        self.pipes = []
+        for band in row_bands(shape[0],n):
+            parent, child = mp.Pipe()
+            p = mp.Process(target=band_worker,args=([s.name for s in self.shms],shape,band,rules,self.conn,self.state_w,self.barrier,child,self.timeout),daemon=True)
+            p.start()
+            self.procs.append(p)
+            self.pipes.append(parent)
+
+    # Current state (a copy, the buffers are reused)
+    @property
+    def grid(self):
+        return self.bufs[self.cur].copy()
+
+    def step(self, n=1):
+        if (n>0):
+            for p in self.pipes:
+                try:
+                    p.send((self.cur,n))
+                except OSError:
+                    pass # the dead worker is found while waiting for the replies
+            for p in self.pipes:
+                self.wait_reply(p)
+            self.cur = (self.cur+n)%2
+            self.gen += n
+        return self.grid
+
+    # Reply of a worker; when a worker dies the others are released from the barrier
+    def wait_reply(self, pipe):
+        while (not pipe.poll(0.1)):
+            dead = [i for i,p in enumerate(self.procs) if (not p.is_alive())]
+            if (dead):
+                code = self.procs[dead[0]].exitcode
+                self.barrier.abort()
+                self.close()
+                raise RuntimeError("Worker process %d exited with code %s" % (dead[0],code))
+        if (pipe.recv() is None):
+            self.close()
+            raise RuntimeError("Workers did not meet at the barrier in %.1f s" % (self.timeout))
+
+    def close(self):
+        for p in self.pipes if (self.procs) else []:
+            try:
+                p.send(None)
+            except OSError:
+                pass # the worker is gone
+        for p in self.procs:
+            p.join(self.timeout)
+            if (p.is_alive()):
+                p.terminate()
+                p.join()
+        self.procs = []
+        self.bufs  = []
+        for s in self.shms:
+            s.close()
+            s.unlink()
+        self.shms = []
+
+if (__name__=="__main__"):
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("init_state_file",help="Name of input '.cas' (or '.cab') file with initial automaton state")
+    parser.add_argument("trans_table_file",help="Name of input '.tab' (or '.cab') file with explicit automaton transition rules")
+    parser.add_argument("--gens",type=int,default=1,help="Number of generations to compute (default: 1)")
+    parser.add_argument("--workers",type=int,default=None,help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--rom_ways",type=int,default=1,help="Number of ROM ways of the modelled hardware; affects only padding of the rule list (default: 1)")
+    parser.add_argument("--repeat",type=int,nargs=2,default=(1,1),metavar=("ROWS","COLS"),help="Repeat the initial state to build a larger field (default: 1 1)")
+    parser.add_argument("--validate",action="store_true",help="Compare the result with the single process cell_auto_engine")
+    parser.add_argument("--quiet",action="store_true",help="Do not print the resulting state")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    # Run the model
+    engine = sharded_engine(args.trans_table_file,args.init_state_file,args.rom_ways,args.workers)
+    if (engine.error!=0):
+        exit(engine.error)
+    field = np.tile(engine.engine.grid,args.repeat)
+    engine.set_state(field)
+    print("Field size: %dx%d, %d worker processes" % (field.shape[1],field.shape[0],len(engine.procs)))
+    t = time()
+    grid = engine.step(args.gens)
+    t = time()-t
+    engine.close()
+    print("Generations: %d, time: %.3f s, speed: %.0f generations per second, %.3g cells per second" % (args.gens,t,args.gens/t if (t>0) else 0,args.gens*field.size/t if (t>0) else 0))
+    if (not args.quiet):
+        for row in grid:
+            print("".join("%02d " % v for v in row))
+
+    if (args.validate):
+        engine.engine.set_state(field)
+        engine.engine.step(args.gens)
+        diff = int(np.count_nonzero(engine.engine.grid!=grid))
+        print("Validation against cell_auto_engine:","OK" if (diff==0) else "%d cells differ" % (diff))
+        if (diff):
+            exit(1)
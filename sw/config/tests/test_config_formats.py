@@ -0,0 +1,102 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+
+import os
+from contextlib import redirect_stdout
+from io import StringIO
+
+import numpy as np
+import pytest
+
+from cell_auto_bin    import *
+from cell_auto_engine import cell_auto_engine
+from config_pkg_gen   import cell_auto_config
+from rule_compiler    import read_tab, write_tab
+from test_engines     import random_tab, random_grid
+
+config = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+cas = os.path.join(config,"glider_init.cas")
+tab = os.path.join(config,"glider_trans.tab")
+
+@pytest.mark.parametrize("state_w",[1,2,3,4,8])
+def test_pack_cells_round_trip(state_w):
+    cells = random_grid((7,5),2**state_w,state_w)
+    packed = pack_cells(cells,state_w)
+    assert len(packed)==(cells.size*state_w+7)//8
+    assert np.array_equal(unpack_cells(packed,7,5,state_w),cells)
+
+def test_cab_round_trip(tmp_path):
+    cab = str(tmp_path/"glider.cab")
+    text_to_cab(cab,cas,tab)
+    assert is_cab_file(cab)
+    assert not is_cab_file(tab)
+    f = cab_file(cab)
+    assert np.array_equal(f.cells(),np.loadtxt(cas,dtype=np.uint8,ndmin=2))
+    assert list(f.rules())==list(read_tab(tab))
+    f.close()
+    # Back to text and again to binary gives the same file
+    cab_to_text(cab,str(tmp_path/"a.cas"),str(tmp_path/"a.tab"))
+    text_to_cab(str(tmp_path/"b.cab"),str(tmp_path/"a.cas"),str(tmp_path/"a.tab"))
+    assert open(cab,"rb").read()==open(str(tmp_path/"b.cab"),"rb").read()
+
+# Files with only one of the parts
+@pytest.mark.parametrize("with_cas,with_tab",[(True,False),(False,True)])
+def test_cab_part_round_trip(tmp_path, with_cas, with_tab):
+    cab = str(tmp_path/"part.cab")
+    text_to_cab(cab,cas if (with_cas) else None,tab if (with_tab) else None)
+    f = cab_file(cab)
+    assert f.has_cells()==with_cas
+    assert (f.n_rules!=0)==with_tab
+    if (with_cas):
+        assert np.array_equal(f.cells(),np.loadtxt(cas,dtype=np.uint8,ndmin=2))
+    assert list(f.rules())==(list(read_tab(tab)) if (with_tab) else [])
+    f.close()
+    cab_to_text(cab,str(tmp_path/"a.cas"),str(tmp_path/"a.tab"))
+    assert os.path.exists(str(tmp_path/"a.cas"))==with_cas
+    assert os.path.exists(str(tmp_path/"a.tab"))==with_tab
+    text_to_cab(str(tmp_path/"b.cab"),str(tmp_path/"a.cas") if (with_cas) else None,str(tmp_path/"a.tab") if (with_tab) else None)
+    assert open(cab,"rb").read()==open(str(tmp_path/"b.cab"),"rb").read()
+
+def test_engine_runs_cab(tmp_path):
+    cab = str(tmp_path/"glider.cab")
+    text_to_cab(cab,cas,tab)
+    text = cell_auto_engine(tab,cas)
+    binary = cell_auto_engine(cab,cab)
+    assert binary.error==0
+    text.step(50)
+    binary.step(50)
+    assert np.array_equal(text.grid,binary.grid)
+
+def test_bad_cab(tmp_path):
+    bad = tmp_path/"bad.cab"
+    bad.write_bytes(b"CAB1"+bytes(60))
+    with pytest.raises(ValueError):
+        cab_file(str(bad))
+
+@pytest.mark.parametrize("conn",[5,9])
+def test_minimized_rules_behave_the_same(tmp_path, conn):
+    full = str(tmp_path/"full.tab")
+    rules = random_tab(full,conn,2,120,conn)
+    # Rules without a state change are removed by the minimization
+    centre = conn//2
+    with open(full,"a") as f:
+        write_tab([(i,i[centre]) for i,o in rules[:20]],f)
+    with redirect_stdout(StringIO()):
+        minimized = cell_auto_config(None,full,None,1,0,True)
+    assert len(minimized.trans_list)<len(list(read_tab(full)))
+    assert all(o!=i[centre] for i,o in minimized.trans_list)
+    small = str(tmp_path/"min.tab")
+    with open(small,"w") as f:
+        write_tab(minimized.trans_list,f)
+    a = cell_auto_engine(full)
+    b = cell_auto_engine(small)
+    grid = random_grid((16,16),2,conn)
+    a.set_state(grid)
+    b.set_state(grid)
+    a.step(10)
+    b.step(10)
+    assert np.array_equal(a.grid,b.grid)
@@ -0,0 +1,105 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+
+import os
+from math import ceil
+
+import pytest
+
+from config_pkg_gen import *
+from rule_compiler  import read_tab
+
+config = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+cas = os.path.join(config,"glider_init.cas")
+tab = os.path.join(config,"glider_trans.tab")
+
+def tune(ways_list, luts=device_luts):
+    cfg = cell_auto_config(cas,tab,None,1,0)
+    return cfg, tune_config(cfg,ways_list,50e6,luts,device_ffs,device_m_blocks)
+
+def dominates(o, c):
+    return (o["gen_per_s"]>=c["gen_per_s"] and o["luts"]<=c["luts"] and
+            (o["gen_per_s"]>c["gen_per_s"] or o["luts"]<c["luts"]))
+
+def test_tune_pareto_front():
+    cfg, pareto = tune(list(range(1,17)))
+    assert pareto and all(c["fits"] for c in pareto)
+    assert not any(dominates(o,c) for c in pareto for o in pareto)
+    # Along the front, speed is paid for with LUTs
+    front = sorted(pareto,key=lambda c: c["luts"])
+    assert all(a["gen_per_s"]<b["gen_per_s"] for a,b in zip(front,front[1:]))
+    # The fastest configuration checks all rules in one ROM item
+    best = best_config(pareto)
+    assert best is front[-1]
+    assert best["ways"]>=cfg.act_rom_items and best["cycles"]==1+3
+    # Without the LUTs for it, the next one on the front is chosen
+    _, tight = tune(list(range(1,17)),best["luts"]-1)
+    assert best_config(tight)==front[-2]
+
+def test_tune_ways_order():
+    _, ordered = tune([1,2,4,8,16])
+    _, unordered = tune([16,4,1,8,2])
+    assert unordered==ordered
+    assert [c["ways"] for c in ordered]==[1,2,4,8]
+
+def test_tune_over_budget():
+    assert tune([1,2,4],0)[1]==[]
+
+def test_pkg_skipped_when_up_to_date(tmp_path):
+    pkg = str(tmp_path/"config_pkg.vhd")
+    assert pkg_file_hash(pkg) is None
+    assert cell_auto_config(cas,tab,pkg,4,0).generate_pkg_file()
+    assert pkg_file_hash(pkg)==config_hash(cas,tab,4,0,False)
+    written = os.path.getmtime(pkg), open(pkg).read()
+    assert not cell_auto_config(cas,tab,pkg,4,0).generate_pkg_file()
+    assert (os.path.getmtime(pkg),open(pkg).read())==written
+    assert cell_auto_config(cas,tab,pkg,4,0).generate_pkg_file(force=True)
+
+# Any change of the inputs or of the parameters regenerates the package
+@pytest.mark.parametrize("change",["tab","cas","rom_ways","max_m_blocks","minimize"])
+def test_pkg_regenerated_on_change(tmp_path, change):
+    pkg = str(tmp_path/"config_pkg.vhd")
+    cas_copy = str(tmp_path/"init.cas")
+    tab_copy = str(tmp_path/"trans.tab")
+    with open(cas_copy,"w") as f:
+        f.write(open(cas).read())
+    with open(tab_copy,"w") as f:
+        f.write(open(tab).read())
+    args = {"rom_ways" : 4, "max_m_blocks" : 0, "minimize" : False}
+    assert cell_auto_config(cas_copy,tab_copy,pkg,**args).generate_pkg_file()
+    old = pkg_file_hash(pkg)
+    if (change=="tab"):
+        with open(tab_copy,"a") as f:
+            f.write("0 0 0 0 0 : 0\n")
+    elif (change=="cas"):
+        text = open(cas).read()
+        with open(cas_copy,"w") as f:
+            f.write(("1" if (text[0]=="0") else "0")+text[1:])
+    elif (change=="rom_ways"):
+        args["rom_ways"] = 2
+    elif (change=="max_m_blocks"):
+        args["max_m_blocks"] = 8
+    else:
+        args["minimize"] = True
+    assert cell_auto_config(cas_copy,tab_copy,pkg,**args).generate_pkg_file()
+    assert pkg_file_hash(pkg)!=old
+    assert not cell_auto_config(cas_copy,tab_copy,pkg,**args).generate_pkg_file()
+
+# Rules given as data are hashed after parsing
+def test_pkg_hash_of_rule_data(tmp_path):
+    pkg = str(tmp_path/"config_pkg.vhd")
+    rules = list(read_tab(tab))
+    assert cell_auto_config(cas,iter(rules),pkg,4,0).generate_pkg_file()
+    assert not cell_auto_config(cas,iter(rules),pkg,4,0).generate_pkg_file()
+    rules[0] = (rules[0][0],(rules[0][1]+1)%4)
+    assert cell_auto_config(cas,iter(rules),pkg,4,0).generate_pkg_file()
+
+def test_pkg_without_hash(tmp_path):
+    pkg = tmp_path/"config_pkg.vhd"
+    pkg.write_text("-- Hand written package\n")
+    assert pkg_file_hash(str(pkg)) is None
+    assert cell_auto_config(cas,tab,str(pkg),4,0).generate_pkg_file()
@@ -0,0 +1,104 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# The software models compared with a naive cell-by-cell reference of the
+# automaton semantics (torus, the last matching rule wins, no match keeps the state)
+
+import os
+import random
+
+import numpy as np
+import pytest
+
+from cell_auto_engine import cell_auto_engine, neigh_offsets
+from hashlife         import hashlife
+from sharded_engine   import sharded_engine
+from rule_compiler    import read_tab, write_tab
+
+config = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def naive_step(grid, rules, conn):
+    rows, cols = len(grid), len(grid[0])
+    new = [row[:] for row in grid]
+    for y in range(rows):
+        for x in range(cols):
+            inputs = tuple(grid[(y+dr)%rows][(x+dc)%cols] for dr,dc in neigh_offsets[conn])
+            for i,o in rules:
+                if (i==inputs):
+                    new[y][x] = o
+    return new
+
+def naive_run(grid, rules, conn, n):
+    grid = np.asarray(grid).tolist()
+    # Only the last rule for each input can win
+    last = {}
+    for i,o in rules:
+        last[i] = o
+    rules = list(last.items())
+    for g in range(n):
+        grid = naive_step(grid,rules,conn)
+    return np.array(grid,dtype=np.uint8)
+
+# Random table over 'states' states with repeated inputs (the later rule wins)
+def random_tab(path, conn, states, n, seed):
+    rng = random.Random(seed)
+    rules = [(tuple(rng.randrange(states) for k in range(conn)),rng.randrange(states)) for r in range(n)]
+    rules += [(i,(o+1)%states) for i,o in rng.sample(rules,n//4)]
+    # The largest state must appear to fix the state width
+    rules.append((tuple([states-1]*conn),states-1))
+    with open(path,"w") as f:
+        write_tab(rules,f)
+    return rules
+
+def random_grid(shape, states, seed):
+    return np.random.default_rng(seed).integers(0,states,shape,dtype=np.uint8)
+
+@pytest.fixture(params=["life","glider","random5","random9"])
+def table(request, tmp_path):
+    if (request.param=="life"):
+        tab = os.path.join(config,"game_of_life.tab")
+        return tab,list(read_tab(tab)),9,2
+    if (request.param=="glider"):
+        tab = os.path.join(config,"glider_trans.tab")
+        return tab,list(read_tab(tab)),5,4
+    conn = 5 if (request.param=="random5") else 9
+    tab = str(tmp_path/"random.tab")
+    return tab,random_tab(tab,conn,3,300,conn),conn,3
+
+@pytest.mark.parametrize("shape,gens",[((1,1),3),((5,7),9),((12,10),20)])
+def test_cell_auto_engine(table, shape, gens):
+    tab, rules, conn, states = table
+    grid = random_grid(shape,states,gens)
+    engine = cell_auto_engine(tab)
+    engine.set_state(grid)
+    engine.step(gens)
+    assert np.array_equal(engine.grid,naive_run(grid,rules,conn,gens))
+
+@pytest.mark.parametrize("gens",[1,5,16,37])
+def test_hashlife(table, gens):
+    tab, rules, conn, states = table
+    grid = random_grid((9,13),states,gens)
+    model = hashlife(tab)
+    model.set_state(grid)
+    assert np.array_equal(model.step(gens),naive_run(grid,rules,conn,gens))
+    assert model.gen==gens
+
+def test_hashlife_small_cache(table):
+    tab, rules, conn, states = table
+    grid = random_grid((8,8),states,1)
+    model = hashlife(tab,max_nodes=64)
+    model.set_state(grid)
+    assert np.array_equal(model.step(24),naive_run(grid,rules,conn,24))
+
+@pytest.mark.parametrize("workers",[1,3])
+def test_sharded_engine(table, workers):
+    tab, rules, conn, states = table
+    grid = random_grid((11,9),states,workers)
+    engine = sharded_engine(tab,workers=workers)
+    engine.set_state(grid)
+    got = engine.step(12)
+    engine.close()
+    assert np.array_equal(got,naive_run(grid,rules,conn,12))
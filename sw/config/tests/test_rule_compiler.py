@@ -0,0 +1,103 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+
+import os
+from itertools import product
+
+import numpy as np
+import pytest
+
+from rule_compiler import *
+
+config = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.mark.parametrize("text,expect",[
+    ("B3/S23",   ({3},{2,3},2,9)),
+    ("b36/s23",  ({3,6},{2,3},2,9)),
+    ("S23/B3",   ({3},{2,3},2,9)),
+    ("B2/S/C3",  ({2},set(),3,9)),
+    ("B2/S/G4",  ({2},set(),4,9)),
+    ("B1/S1V",   ({1},{1},2,5)),
+])
+def test_parse_rule(text, expect):
+    assert parse_rule(text)==expect
+
+@pytest.mark.parametrize("text",["B3","S23","B3/S23/X1","B3/S23/C1","B9/S23","B5/S1V"])
+def test_parse_rule_errors(text):
+    with pytest.raises(ValueError):
+        parse_rule(text)
+
+def test_game_of_life_table():
+    rules = list(rule_stream("B3/S23"))
+    assert len(set(i for i,o in rules))==len(rules)
+    assert set(rules)==set(read_tab(os.path.join(config,"game_of_life.tab")))
+
+# Next state of every neighbourhood given by the rules (the state is kept without a match)
+# compared with the definition of the rule
+@pytest.mark.parametrize("text",["B3/S23","B2/S/C3","B1/S1V","B13/S012/C4V"])
+def test_rule_stream(text):
+    birth, survive, states, conn = parse_rule(text)
+    c = centre_index[conn]
+    rules = dict(rule_stream(text))
+    assert all(rules[i]!=i[c] for i in rules)
+    for neigh in product(range(states),repeat=conn):
+        centre = neigh[c]
+        live = sum(1 for k,v in enumerate(neigh) if (k!=c and v==1))
+        if (centre==0):
+            expect = 1 if (live in birth) else 0
+        elif (centre==1):
+            expect = 1 if (live in survive) else 2%states
+        else:
+            expect = (centre+1)%states
+        assert rules.get(neigh,centre)==expect
+
+# Inputs of 'conn' Cells as a 3x3 grid and back
+def to_grid(inputs):
+    g = np.zeros((3,3),dtype=int)
+    g.flat[neigh_positions[len(inputs)]] = inputs
+    return g
+
+def from_grid(g, conn):
+    return tuple(int(v) for v in g.flat[neigh_positions[conn]])
+
+@pytest.mark.parametrize("conn",[5,9])
+@pytest.mark.parametrize("symmetry,n",[("none",1),("rotate4",4),("rotate4reflect",8)])
+def test_symmetry_perms(conn, symmetry, n):
+    perms = symmetry_perms(conn,symmetry)
+    assert len(perms)==n and len(set(map(tuple,perms)))==n
+    assert all(p[centre_index[conn]]==centre_index[conn] for p in perms)
+
+@pytest.mark.parametrize("conn",[5,9])
+@pytest.mark.parametrize("symmetry",["none","rotate4","rotate4reflect"])
+def test_symmetric_rules(conn, symmetry):
+    inputs = (1,2)+(0,)*(conn-3)+(3,)
+    g = to_grid(inputs)
+    grids = [g] if (symmetry=="none") else [np.rot90(g,k) for k in range(4)]
+    if (symmetry=="rotate4reflect"):
+        grids += [np.fliplr(x) for x in grids]
+    rules = list(symmetric_rules([(inputs,1)],symmetry))
+    assert sorted(rules)==sorted(set((from_grid(x,conn),1) for x in grids))
+    # A symmetric neighbourhood is generated once
+    assert list(symmetric_rules([((0,)*conn,1)],symmetry))==[((0,)*conn,1)]
+
+def test_symmetric_rules_permute():
+    inputs = (1,1,0,0,2,0,0,0,0)
+    rules = list(symmetric_rules([(inputs,3)],"permute"))
+    # Two live neighbours out of eight, the centre stays in place
+    assert len(rules)==28 and len(set(rules))==28
+    assert all(i[4]==2 and sorted(i)==sorted(inputs) and o==3 for i,o in rules)
+
+def test_unknown_symmetry():
+    with pytest.raises(ValueError):
+        list(symmetric_rules([((0,)*9,1)],"rotate2"))
+
+def test_tab_round_trip(tmp_path):
+    rules = list(rule_stream("B2/S/C3"))
+    path = str(tmp_path/"brain.tab")
+    with open(path,"w") as f:
+        assert write_tab(iter(rules),f,"B2/S/C3")==len(rules)
+    assert list(read_tab(path))==rules
@@ -0,0 +1,95 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+
+import os
+from math import ceil
+
+import numpy as np
+import pytest
+
+from cell_auto_engine import neigh_offsets
+from rule_compiler    import read_tab, write_tab
+from rule_profiler    import rule_profile, quiet_config
+from test_engines     import naive_run, random_tab, random_grid
+
+config = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def write_cas(path, grid):
+    np.savetxt(path,grid,fmt="%d")
+    return path
+
+# Hits counted cell by cell, the last matching rule decides
+def naive_hits(rules, conn, grid, gens):
+    winner = {i : r for r,(i,o) in enumerate(rules)}
+    hits = [0]*len(rules)
+    for g in range(gens):
+        rows, cols = grid.shape
+        for y in range(rows):
+            for x in range(cols):
+                inputs = tuple(int(grid[(y+dr)%rows,(x+dc)%cols]) for dr,dc in neigh_offsets[conn])
+                if (inputs in winner):
+                    hits[winner[inputs]] += 1
+        grid = naive_run(grid,rules,conn,1)
+    return hits
+
+@pytest.mark.parametrize("conn,states",[(5,4),(9,2)])
+def test_hits(tmp_path, conn, states):
+    tab = str(tmp_path/"random.tab")
+    rules = random_tab(tab,conn,states,60,conn)
+    grid = random_grid((6,7),states,conn)
+    profile = rule_profile(tab)
+    assert profile.error==0 and profile.rules==rules and profile.conn==conn
+    assert profile.replay(write_cas(str(tmp_path/"init.cas"),grid),5)==0
+    assert profile.hits.tolist()==naive_hits(rules,conn,grid,5)
+    assert profile.updates==5*grid.size
+    assert int(profile.hits.sum())+profile.unmatched==profile.updates
+    # Rules overridden by a later one with the same inputs are never used
+    for r,(i,o) in enumerate(rules):
+        if (i in [x for x,y in rules[r+1:]]):
+            assert r in profile.dead()
+
+# The pruned table computes the same replayed generations with fewer ROM items
+@pytest.mark.parametrize("table,init",[("game_of_life.tab","game_of_life.cas"),("glider_trans.tab","glider_init.cas")])
+def test_pruned_table(tmp_path, table, init):
+    tab  = os.path.join(config,table)
+    cas  = os.path.join(config,init)
+    profile = rule_profile(tab)
+    assert profile.replay(cas,30)==0
+    pruned = profile.pruned_rules()
+    assert pruned==[profile.rules[r] for r in profile.live()]
+    assert sorted(profile.live()+profile.dead())==list(range(len(profile.rules)))
+    out = str(tmp_path/"pruned.tab")
+    with open(out,"w") as f:
+        write_tab(pruned,f)
+    assert list(read_tab(out))==pruned
+    assert profile.check_pruned(out)==0
+    # Each ROM item holds one rule per way
+    before = quiet_config(cas,tab,4)
+    after  = quiet_config(cas,out,4)
+    assert before.act_rom_items==ceil(len(profile.rules)/4)
+    assert after.act_rom_items==ceil(len(pruned)/4)
+    if (table=="game_of_life.tab"):
+        assert after.act_rom_items<before.act_rom_items
+
+# Workload states differing from the replayed ones may need the dropped rules
+def test_pruned_table_other_state(tmp_path):
+    tab = os.path.join(config,"game_of_life.tab")
+    profile = rule_profile(tab)
+    # A still life (block) uses only the rules keeping dead and live Cells empty
+    block = np.zeros((6,6),dtype=np.uint8)
+    block[2:4,2:4] = 1
+    assert profile.replay(write_cas(str(tmp_path/"block.cas"),block),4)==0
+    assert profile.live()==[] and profile.unmatched==profile.updates
+    out = str(tmp_path/"pruned.tab")
+    with open(out,"w") as f:
+        write_tab(profile.pruned_rules(),f)
+    assert profile.check_pruned(out)==0
+
+def test_bad_table(tmp_path):
+    bad = tmp_path/"bad.tab"
+    bad.write_text("0 0 0 : 1\n0 0 0 0 0 : 1\n")
+    assert rule_profile(str(bad)).error!=0
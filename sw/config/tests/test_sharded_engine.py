@@ -0,0 +1,54 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+
+import os
+from time import time
+
+import numpy as np
+import pytest
+
+from cell_auto_engine import cell_auto_engine, rule_index, neigh_keys
+from sharded_engine   import sharded_engine, band_step
+
+config = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+tab = os.path.join(config,"game_of_life.tab")
+
+def random_field(shape, seed):
+    return np.random.default_rng(seed).integers(0,2,shape,dtype=np.uint8)
+
+@pytest.mark.parametrize("band",[(0,1),(0,7),(3,9),(8,9)])
+def test_band_step_matches_neigh_keys(band):
+    engine = cell_auto_engine(tab)
+    grid = random_field((9,11),1)
+    dst = np.zeros_like(grid)
+    band_step(grid.shape,band,engine.index)(grid,dst)
+    keys = neigh_keys(grid,band[0],band[1],engine.conn,engine.state_w)
+    expect = engine.index.apply(keys,grid[band[0]:band[1]])
+    assert np.array_equal(dst[band[0]:band[1]],expect)
+
+@pytest.mark.parametrize("workers",[1,2,5])
+def test_matches_single_process(workers):
+    grid = random_field((23,17),workers)
+    engine = sharded_engine(tab,workers=workers)
+    engine.set_state(grid)
+    got = engine.step(30)
+    engine.close()
+    ref = cell_auto_engine(tab)
+    ref.set_state(grid)
+    ref.step(30)
+    assert np.array_equal(got,ref.grid)
+
+def test_dead_worker_does_not_hang():
+    engine = sharded_engine(tab,workers=2,timeout=5)
+    engine.set_state(random_field((64,64),3))
+    engine.procs[1].terminate()
+    engine.procs[1].join()
+    t = time()
+    with pytest.raises(RuntimeError):
+        engine.step(1000)
+    assert time()-t<5
+    engine.close()
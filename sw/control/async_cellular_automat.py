@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# asyncio variant of 'cellular_automat' working over 'async_wishbone'
+
+import asyncio
+from argparse import ArgumentParser
+
+from cellular_automat import make_grid, format_grid, unpack_cells, packed_window_bit, np
+from wishbone         import burst_version
+
+class async_cellular_automat:
+    # 'gen_cycles' is GEN_CYCLES of the loaded configuration (ACT_ROM_ITEMS+3),
+    # it is only used to estimate how long a run takes.
+    def __init__(self, wishbone, base_addr=0x8000, gen_cycles=None, clk_freq=50e6, bursts=None):
+        self.wb = wishbone
+        self.ba = base_addr
+        self.gen_cycles = gen_cycles
+        self.clk_freq   = clk_freq
+        self.grid_size  = None
+        self.cell_addrs = None
+        self.bursts     = bursts
+        self.packed     = None
+
+    # Must be awaited before using the grid accessors
+    async def connect(self):
+        self.grid_size = (await self.read_row_size(), await self.read_col_size())
+        self.cell_addrs = [self.ba+0x4000+e+i*self.grid_size[0] for i in range(self.grid_size[1]) for e in range(self.grid_size[0])]
+        if (self.bursts is None):
+            self.bursts = (await self.wb.read_static(0x0000))>=burst_version
+        fmt = await self.wb.read_static(self.ba+0x5)
+        if (fmt!=0xDEADCAFE and fmt&packed_window_bit and np is not None):
+            self.packed = (fmt&0xFFFF,(fmt>>16)&0xFF)
+            self.packed_addrs = [self.ba+0x2000+i for i in range(-(-len(self.cell_addrs)//self.packed[0]))]
+        return self
+
+    async def read_ctrl_reg(self):
+        return await self.wb.read(self.ba+0x0)
+    async def read_gen_limit(self):
+        return await self.wb.read(self.ba+0x1)
+    async def read_current_gen(self):
+        return await self.wb.read(self.ba+0x2)
+    async def read_col_size(self):
+        return await self.wb.read_static(self.ba+0x3)
+    async def read_row_size(self):
+        return await self.wb.read_static(self.ba+0x4)
+    async def read_cell_state(self,coords=(0,0)):
+        return await self.wb.read(self.ba+0x4000+coords[0]+coords[1]*self.grid_size[0])
+    async def write_cell_state(self,coords=(0,0), value=0):
+        await self.wb.write(self.ba+0x4000+coords[0]+coords[1]*self.grid_size[0], value)
+
+    async def read_grid(self):
+        if (self.packed is not None):
+            if (self.bursts):
+                words = await self.wb.read_burst(self.packed_addrs[0],len(self.packed_addrs))
+            else:
+                words = await self.wb.read_multi(self.packed_addrs)
+            return make_grid(unpack_cells(words,self.packed[0],self.packed[1],len(self.cell_addrs)),self.grid_size[0])
+        if (self.bursts):
+            return make_grid(await self.wb.read_burst(self.cell_addrs[0],len(self.cell_addrs)),self.grid_size[0])
+        return make_grid(await self.wb.read_multi(self.cell_addrs),self.grid_size[0])
+    async def write_grid(self,grid):
+        values = [int(v) for row in grid for v in row]
+        if (self.bursts):
+            await self.wb.write_burst(self.cell_addrs[0],values)
+        else:
+            await self.wb.write_multi(self.cell_addrs,values)
+    async def print_cell_states(self):
+        print(format_grid(await self.read_grid()))
+
+    async def start(self):
+        await self.wb.write(self.ba+0x0,1)
+    async def stop(self):
+        await self.wb.write(self.ba+0x0,0)
+    async def reset(self):
+        await self.wb.write(self.ba+0x0,2)
+    async def set_gen_limit(self,limit):
+        await self.wb.write(self.ba+0x1,limit)
+    async def set_unlimited_gen(self):
+        await self.set_gen_limit(0)
+
+    # Compute 'n' more generations and return the final generation index
+    # The coroutine sleeps until shortly before the estimated end of the run
+    # and then polls the Current Generation Register with growing intervals
+    # (re-estimating the remaining time from the observed progress).
+    async def run_generations(self, n, min_poll=0.001, max_poll=0.5, timeout=None):
+        loop = asyncio.get_running_loop()
+        await self.stop()
+        gen = await self.read_current_gen()
+        target = gen+n
+        await self.set_gen_limit(target)
+        t0 = loop.time()
+        await self.start()
+
+        if (self.gen_cycles is not None):
+            # Wake up a bit before the expected end
+            await asyncio.sleep(0.9*n*self.gen_cycles/self.clk_freq)
+
+        interval = min_poll
+        while (True):
+            cg = await self.read_current_gen()
+            if (cg>=target):
+                break
+            now = loop.time()
+            if (timeout is not None and now-t0>timeout):
+                raise TimeoutError("Generation %d not reached in %.1f s (current %d)" % (target,timeout,cg))
+            if (cg>gen):
+                # Half of the remaining time at the observed speed
+                delay = 0.5*(target-cg)*(now-t0)/(cg-gen)
+            else:
+                delay = interval
+            interval = min(interval*2,max_poll)
+            await asyncio.sleep(min(max(delay,min_poll),interval))
+        await self.stop()
+        return cg
+
+if __name__ == '__main__':
+    from async_wishbone import async_wishbone
+
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("--port",default="COM4",help="Target device serial port name (default: COM4)")
+    parser.add_argument("--gens",type=int,default=2**24,help="Number of generations to run (default: 2**24)")
+    parser.add_argument("--gen_cycles",type=int,default=None,help="GEN_CYCLES of the loaded configuration (default: unknown)")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    async def progress(cell_auto, done):
+        # Runs concurrently with the long computation
+        while (not done.is_set()):
+            await asyncio.sleep(1)
+            print("current generation:",hex(await cell_auto.read_current_gen()))
+
+    async def main():
+        wb = async_wishbone(args.port)
+        cell_auto = await async_cellular_automat(wb,0x8000,args.gen_cycles).connect()
+        await cell_auto.reset()
+        done = asyncio.Event()
+        viewer = asyncio.create_task(progress(cell_auto,done))
+        t = asyncio.get_running_loop().time()
+        gen = await cell_auto.run_generations(args.gens)
+        t = asyncio.get_running_loop().time()-t
+        done.set()
+        await viewer
+        print("generations:",hex(gen),"time:",t,"s")
+        await cell_auto.print_cell_states()
+        wb.close()
+
+    asyncio.run(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# asyncio variant of 'wishbone'
+# The serial port is used in non-blocking mode and waiting for responses
+# yields to the event loop, so other coroutines can run in the meantime.
+
+import asyncio
+import os
+import serial
+from collections import deque
+from time import time, perf_counter
+
+from wishbone import read_cmd, write_cmd, read_resp, default_window, fifo_version, quiet_time, burst_read_reqs, burst_write_reqs, decode_bursts
+
+class async_wishbone:
+    def __init__(self, port="COM1", baudrate=9600, window=None, timeout=2, poll=0.001, tracer=None):
+        # 'port' is either a serial port name, "unix:" followed by the socket
+        # of wb_daemon, or an open serial-port-like object
+        # 'window' None is resolved from the version register as in 'wishbone'
+        # 'tracer' records all transactions (see wb_tracer)
+        if (isinstance(port,str) and port.startswith("unix:")):
+            from wb_daemon import wb_client
+            self.uart = wb_client(port[5:],timeout=0)
+            if (window is None):
+                window = default_window
+        elif (isinstance(port,str)):
+            self.uart = serial.Serial(port, baudrate, timeout=0)
+        else:
+            self.uart = port
+            self.uart.timeout = 0
+        self.window  = window
+        self.timeout = timeout
+        self.poll    = poll
+        self.rx      = bytearray()
+        self.lock    = None
+        self.tracer  = tracer
+        self.static  = {}
+        print("The UART on " + self.uart.name + " is open.")
+        print("The asynchronous wishbone bus is ready.\n")
+
+    async def read(self,addr):
+        return (await self.transfer([(addr,None)]))[0]
+
+    async def write(self, addr, data):
+        await self.transfer([(addr,data)])
+
+    # The same as wishbone.read_static
+    async def read_static(self,addr):
+        if (addr not in self.static):
+            self.static[addr] = await self.read(addr)
+        return self.static[addr]
+
+    async def read_multi(self,addrs):
+        return await self.transfer([(a,None) for a in addrs])
+
+    async def write_multi(self,addrs,values):
+        await self.transfer(list(zip(addrs,values)))
+
+    async def read_burst(self,addr,n):
+        return decode_bursts(await self.transfer_raw(burst_read_reqs(addr,n)))
+
+    async def write_burst(self,addr,values):
+        await self.transfer_raw(burst_write_reqs(addr,values))
+
+    # Pipelined transfer of (addr,data) pairs, data None means read
+    async def transfer(self,trans):
+        reqs = []
+        for addr,data in trans:
+            if data is None:
+                reqs.append((read_cmd.pack(0x0,addr),read_resp.size))
+            else:
+                reqs.append((write_cmd.pack(0x1,addr,data),1))
+        resps = await self.transfer_raw(reqs)
+        return [read_resp.unpack(r)[1] if len(r)==read_resp.size else None for r in resps]
+
+    # The same as wishbone.transfer_raw; transfers of concurrent coroutines are serialized
+    async def transfer_raw(self,reqs):
+        if (self.lock is None):
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            try:
+                if (self.window is None):
+                    await self.fifo_window()
+                return await self.transfer_locked(reqs)
+            except IOError:
+                # Late responses must not be taken for those of the next transfer
+                await self.drain()
+                raise
+
+    # Drop received bytes until the line is quiet for 'quiet_time'
+    async def drain(self):
+        self.rx = bytearray()
+        idle = time()+quiet_time
+        while (time()<idle):
+            if (self.uart.read(4096)):
+                idle = time()+quiet_time
+            else:
+                await self.wait_readable(idle)
+
+    # The same as wishbone.fifo_window
+    async def fifo_window(self):
+        self.window = 0
+        try:
+            version = read_resp.unpack((await self.transfer_locked([(read_cmd.pack(0x0,0x0000),read_resp.size)]))[0])[1]
+        except IOError:
+            self.window = None
+            raise
+        self.static[0x0000] = version
+        self.window = default_window if (version>=fifo_version) else 0
+
+    async def transfer_locked(self,reqs):
+        resps   = []
+        pending = deque()
+        flight  = 0
+        tracer  = self.tracer
+        i = 0
+        while (len(resps)<len(reqs)):
+            chunk = bytearray()
+            t = perf_counter() if (tracer is not None) else 0.0
+            while (i<len(reqs) and (flight==0 or flight+len(reqs[i][0])<=self.window)):
+                chunk += reqs[i][0]
+                flight += len(reqs[i][0])
+                pending.append((i,t))
+                i += 1
+            if (chunk):
+                self.uart.write(chunk)
+            e, t = pending.popleft()
+            req, rlen = reqs[e]
+            try:
+                rbytes = await self.recv(rlen)
+            except IOError:
+                if (tracer is not None):
+                    tracer.record(req,bytes(self.rx[:rlen]),rlen,t,perf_counter())
+                raise
+            if (tracer is not None):
+                tracer.record(req,rbytes,rlen,t,perf_counter())
+            if (rbytes[0]!=req[0]):
+                raise IOError("Wishbone response echo 0x%02X does not match command 0x%02X" % (rbytes[0],req[0]))
+            resps.append(rbytes)
+            flight -= len(req)
+        return resps
+
+    # Receive exactly 'n' bytes without blocking the event loop
+    async def recv(self,n):
+        deadline = time()+self.timeout
+        while (len(self.rx)<n):
+            data = self.uart.read(4096)
+            if (data):
+                self.rx += data
+                continue
+            if (time()>=deadline):
+                raise IOError("Wishbone response timeout (%d of %d bytes received)" % (len(self.rx),n))
+            await self.wait_readable(deadline)
+        data = bytes(self.rx[:n])
+        del self.rx[:n]
+        return data
+
+    async def wait_readable(self,deadline):
+        loop = asyncio.get_running_loop()
+        # Emulator tells when its next byte is due
+        if (hasattr(self.uart,"next_ready")):
+            ready = self.uart.next_ready()
+            ready = deadline if (ready is None) else min(ready,deadline)
+            await asyncio.sleep(max(0.0,ready-time()))
+            return
+        # Real serial port on POSIX: wake up when the descriptor becomes readable
+        if (os.name=="posix" and hasattr(self.uart,"fileno")):
+            fd = self.uart.fileno()
+            fut = loop.create_future()
+            loop.add_reader(fd,lambda: fut.done() or fut.set_result(None))
+            try:
+                await asyncio.wait_for(fut,max(0.0,deadline-time()))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                loop.remove_reader(fd)
+            return
+        await asyncio.sleep(self.poll)
+
+    def close(self):
+        self.uart.close()
@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Throughput benchmark of the FPGA (or of the emulator)
+# Measures UART transaction latency, full grid transfers and computation
+# speed over a sweep of generation limits. Results can be stored as JSON
+# and compared against a stored baseline.
+
+import json
+import statistics
+import sys
+from argparse import ArgumentParser
+from time import time, strftime
+
+from wishbone         import *
+from sys_module       import *
+from cellular_automat import *
+from wb_tracer        import wb_tracer
+
+# Summary statistics of a list of samples
+def summarize(samples, unit, higher_is_better=False):
+    s = sorted(samples)
+    def pct(p):
+        # Linear interpolation between closest ranks
+        k = (len(s)-1)*p/100
+        f = int(k)
+        c = min(f+1,len(s)-1)
+        return s[f]+(s[c]-s[f])*(k-f)
+    return {
+        "unit"             : unit,
+        "higher_is_better" : higher_is_better,
+        "n"                : len(s),
+        "mean"             : statistics.fmean(s),
+        "stdev"            : statistics.stdev(s) if (len(s)>1) else 0.0,
+        "variance"         : statistics.variance(s) if (len(s)>1) else 0.0,
+        "min"              : s[0],
+        "p50"              : pct(50),
+        "p90"              : pct(90),
+        "p99"              : pct(99),
+        "max"              : s[-1],
+    }
+
+def timed(func, n):
+    samples = []
+    for i in range(n):
+        t = time()
+        func()
+        samples.append(time()-t)
+    return samples
+
+class benchmark:
+    def __init__(self, wb, cell_auto):
+        self.wb        = wb
+        self.cell_auto = cell_auto
+        self.metrics   = {}
+
+    def bench_latency(self, n):
+        # System module debug register is harmless to access at any time
+        self.metrics["uart_read_latency"]  = summarize(timed(lambda: self.wb.read(0x0004),n),"s")
+        self.metrics["uart_write_latency"] = summarize(timed(lambda: self.wb.write(0x0004,0x12345678),n),"s")
+
+    def bench_grid(self, n):
+        self.cell_auto.reset()
+        grid = self.cell_auto.read_grid()
+        self.metrics["grid_readback_time"] = summarize(timed(self.cell_auto.read_grid,n),"s")
+        self.metrics["grid_upload_time"]   = summarize(timed(lambda: self.cell_auto.write_grid(grid),n),"s")
+
+    def bench_speed(self, limits, n):
+        points = []
+        for g in limits:
+            speeds = []
+            for i in range(n):
+                self.cell_auto.reset()
+                t = time()
+                self.cell_auto.run_generations(g)
+                t = time()-t
+                speeds.append(g/t)
+                points.append((g,t))
+            self.metrics["gen_per_s_limit_%d" % g] = summarize(speeds,"gen/s",True)
+        # Slope of run time over generation count excludes the constant
+        # control and polling overhead included in the per-limit speeds
+        if (len(limits)>1):
+            mx = statistics.fmean(p[0] for p in points)
+            my = statistics.fmean(p[1] for p in points)
+            slope = sum((x-mx)*(y-my) for x,y in points)/sum((x-mx)**2 for x,y in points)
+            self.metrics["gen_per_s_fit"] = summarize([1/slope],"gen/s",True)
+            self.metrics["run_overhead"]  = summarize([my-slope*mx],"s")
+
+# Compares results with a baseline, returns list of regressed metrics
+def compare(metrics, baseline, tolerance):
+    regressions = []
+    print("%-28s %14s %14s %9s" % ("metric","baseline","current","change"))
+    for name,m in sorted(metrics.items()):
+        if (name not in baseline):
+            continue
+        b = baseline[name]["mean"]
+        c = m["mean"]
+        change = (c-b)/b if (b!=0) else 0.0
+        worse = -change if (m["higher_is_better"]) else change
+        flag = ""
+        if (worse>tolerance):
+            flag = " REGRESSION"
+            regressions.append(name)
+        print("%-28s %14.6g %14.6g %+8.1f%%%s" % (name,b,c,change*100,flag))
+    return regressions
+
+if __name__ == '__main__':
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("--port",default="COM4",help="Target device serial port name (default: COM4)")
+    parser.add_argument("--emulate",nargs=2,metavar=("CAS","TAB"),help="Benchmark the emulator loaded with given '.cas' and '.tab' files instead of a device")
+    parser.add_argument("--rom_ways",type=int,default=4,help="ROM ways of the emulated configuration (default: 4)")
+    parser.add_argument("--baudrate",type=int,default=9600,help="UART baud rate (default: 9600)")
+    parser.add_argument("--gen_cycles",type=int,default=None,help="GEN_CYCLES of the loaded configuration, improves run time estimation (default: unknown)")
+    parser.add_argument("--limits",type=int,nargs="+",default=[2**20,2**21,2**22,2**23],help="Generation limits to sweep (default: 2**20 to 2**23)")
+    parser.add_argument("--repeat",type=int,default=5,help="Number of runs of each measurement (default: 5)")
+    parser.add_argument("--latency_samples",type=int,default=50,help="Number of single transactions to time (default: 50)")
+    parser.add_argument("--output",default=None,help="Write results to this JSON file")
+    parser.add_argument("--baseline",default=None,help="Compare results with this JSON file")
+    parser.add_argument("--trace",default=None,help="Trace Wishbone transactions and write them to this Chrome trace file")
+    parser.add_argument("--tolerance",type=float,default=0.1,help="Relative change considered a regression (default: 0.1)")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    # Init objects
+    tracer = wb_tracer() if (args.trace) else None
+    gen_cycles = args.gen_cycles
+    if (args.emulate):
+        from fpga_emulator import fpga_emulator
+        emu = fpga_emulator(args.emulate[0],args.emulate[1],args.rom_ways,baudrate=args.baudrate)
+        if (emu.error!=0):
+            exit(emu.error)
+        gen_cycles = emu.gen_cycles
+        wb = wishbone(emu,tracer=tracer)
+    else:
+        wb = wishbone(args.port,args.baudrate,tracer=tracer)
+
+    sys_mod = sys_module(wb)
+    sys_mod.report()
+
+    cell_auto = cellular_automat(wb,0x8000,gen_cycles=gen_cycles)
+
+    bench = benchmark(wb,cell_auto)
+    bench.bench_latency(args.latency_samples)
+    bench.bench_grid(args.repeat)
+    bench.bench_speed(args.limits,args.repeat)
+
+    print("%-28s %8s %12s %12s %12s %12s" % ("metric","unit","mean","stdev","p50","p99"))
+    for name,m in sorted(bench.metrics.items()):
+        print("%-28s %8s %12.6g %12.6g %12.6g %12.6g" % (name,m["unit"],m["mean"],m["stdev"],m["p50"],m["p99"]))
+
+    result = {
+        "meta" : {
+            "time"       : strftime("%Y-%m-%d %H:%M:%S"),
+            "port"       : "emulator" if (args.emulate) else args.port,
+            "baudrate"   : args.baudrate,
+            "grid_size"  : cell_auto.grid_size,
+            "gen_cycles" : gen_cycles,
+        },
+        "metrics" : bench.metrics,
+    }
+    if (args.output):
+        with open(args.output,"w") as f:
+            json.dump(result,f,indent=2)
+
+    if (tracer is not None):
+        tracer.report()
+        tracer.export_chrome(args.trace)
+
+    if (args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(bench.metrics,baseline["metrics"],args.tolerance)
+        if (regressions):
+            print("Regressions found:",", ".join(regressions))
+            sys.exit(1)
+
+    wb.close()
@@ -6,11 +6,114 @@
 # LICENSE: The MIT License, please read LICENSE file
 #-------------------------------------------------------------------------------
 
+import zlib
+from array import array
+from time import sleep, time
+
+from wishbone import write_cmd, burst_version, burst_write_reqs
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Printed form of each possible cell state
+cell_fmt = ["%02d " % v for v in range(256)]
+
+# Features in the Packed Cells Format Register (generics of the automaton)
+packed_window_bit = 1<<24
+checksum_bit      = 1<<25
+
+# Grid helpers
+# A grid is a 2D NumPy array of shape (rows,cols) or a list of array('B') rows
+# when NumPy is not available. Both are indexed as grid[y][x].
+def make_grid(values,cols):
+    if (np is not None):
+        return np.array(values,dtype=np.uint8).reshape(-1,cols)
+    return [array('B',values[i:i+cols]) for i in range(0,len(values),cols)]
+
+def flatten_grid(grid):
+    if (np is not None):
+        return np.asarray(grid,dtype=np.uint8).ravel().tolist()
+    return [v for row in grid for v in row]
+
+def format_grid(grid):
+    return "\n".join("".join(map(cell_fmt.__getitem__,row)) for row in grid)
+
+# Unpacks words read from the Packed Cells' States Window into 'n' cell states
+# (Cell k of a word at bits k*state_w, 'per_word' Cells in each word)
+def unpack_cells(words,per_word,state_w,n):
+    words  = np.array(words,dtype=np.uint32)
+    shifts = np.arange(per_word,dtype=np.uint32)*np.uint32(state_w)
+    cells  = (words[:,None]>>shifts)&np.uint32(2**state_w-1)
+    return cells.astype(np.uint8).ravel()[:n]
+
+# Packs cell states into words of the Packed Cells' States Window
+def pack_cells(values,per_word,state_w):
+    values = np.asarray(values,dtype=np.uint32).ravel()
+    values = np.concatenate([values,np.zeros(-len(values)%per_word,dtype=np.uint32)]).reshape(-1,per_word)
+    shifts = np.arange(per_word,dtype=np.uint32)*np.uint32(state_w)
+    return np.bitwise_or.reduce(values<<shifts,axis=1)
+
+# Checksum of a grid as computed by the automaton (Checksum Register):
+# CRC-32 of the packed words in little endian byte order
+def grid_checksum(grid,state_w):
+    return zlib.crc32(pack_cells(grid,32//state_w,state_w).astype("<u4").tobytes())
+
+# Splits sorted indices into runs of consecutive ones, returns (first index, length) pairs
+def index_runs(idx):
+    runs = []
+    for i in idx:
+        if (runs and runs[-1][0]+runs[-1][1]==i):
+            runs[-1][1] += 1
+        else:
+            runs.append([i,1])
+    return runs
+
 class cellular_automat:
-    def __init__(self, wishbone, base_addr=0x8000):
+    # 'gen_cycles' is GEN_CYCLES of the loaded configuration (ACT_ROM_ITEMS+3),
+    # it is only used to estimate how long a run takes.
+    # Burst transfers are used for the grid when 'bursts' is True, or when it is None
+    # and the System module version says the bitstream supports them.
+    # The grid is read through the Packed Window when the bitstream has it and NumPy is available.
+    # The Checksum Register is used when the bitstream has it and NumPy is available.
+    # With 'cache' the cell reads of a stopped automaton are served from the shadow copy.
+    # The cache only sees changes made through this object, so it must not be used
+    # while other clients (e.g. through wb_daemon) may start or write the automaton.
+    def __init__(self, wishbone, base_addr=0x8000, shadow=False, gen_cycles=None, clk_freq=50e6, bursts=None, cache=False):
         self.wb = wishbone
         self.ba = base_addr
+        self.gen_cycles = gen_cycles
+        self.clk_freq   = clk_freq
+        # Host-side shadow copy of the last known cell states (flat, row-major)
+        # It is only valid while the automaton is stopped and no generation passed.
+        # With the cache the automaton is not assumed to be stopped (running is
+        # None) until the first stop or reset.
+        self.use_shadow = shadow or cache
+        self.use_cache  = cache
+        self.shadow     = None
+        self.running    = None if (cache) else False
+        self.last_gen   = None
+        self.cache_hits   = 0
+        self.cache_misses = 0
         self.grid_size = (self.read_row_size(), self.read_col_size())
+        # Bus addresses of all cells in row-major order
+        self.cell_addrs = [self.ba+0x4000+e+i*self.grid_size[0] for i in range(self.grid_size[1]) for e in range(self.grid_size[0])]
+        if (bursts is None):
+            bursts = self.wb.read_static(0x0000)>=burst_version
+        self.bursts = bursts
+        # (Cells per word, state width) of the Packed Window, None when it is not available
+        self.packed   = None
+        self.state_w  = None
+        self.checksum = False
+        fmt = self.read_packed_format()
+        if (fmt!=0xDEADCAFE and np is not None):
+            self.state_w  = (fmt>>16)&0xFF
+            self.checksum = bool(fmt&checksum_bit)
+        if (self.state_w is not None and fmt&packed_window_bit):
+            self.packed = (fmt&0xFFFF,self.state_w)
+            n_words = -(-len(self.cell_addrs)//self.packed[0])
+            self.packed_addrs = [self.ba+0x2000+i for i in range(n_words)]
 
     def read_ctrl_reg(self):
         v = self.wb.read(self.ba+0x0)
@@ -20,33 +123,178 @@ class cellular_automat:
         return v
     def read_current_gen(self):
         v = self.wb.read(self.ba+0x2)
+        if (v!=self.last_gen):
+            # Cells changed since the shadow copy was taken
+            if (self.last_gen is not None):
+                self.shadow = None
+            self.last_gen = v
         return v
     def read_col_size(self):
-        v = self.wb.read(self.ba+0x3)
+        v = self.wb.read_static(self.ba+0x3)
         return v
     def read_row_size(self):
-        v = self.wb.read(self.ba+0x4)
+        v = self.wb.read_static(self.ba+0x4)
+        return v
+    def read_packed_format(self):
+        v = self.wb.read_static(self.ba+0x5)
         return v
+
+    # Checksum of the current Cells' States computed by the automaton
+    # (see grid_checksum); waits until it is valid
+    def read_grid_checksum(self, timeout=1.0):
+        if (not self.checksum):
+            raise IOError("The bitstream does not provide the Checksum Register")
+        t0 = time()
+        while (True):
+            # Status first, so the checksum read after it belongs to a valid computation
+            status, checksum = self.wb.transfer([(self.ba+0x7,None),(self.ba+0x6,None)])
+            if (status&0x1):
+                return checksum
+            if (time()-t0>timeout):
+                raise TimeoutError("Checksum not valid in %.1f s" % (timeout))
+
+    # Compare the automaton state with 'grid' using only the checksum
+    def verify_grid(self, grid):
+        return self.read_grid_checksum()==grid_checksum(grid,self.state_w)
+
+    # Cell reads served from the shadow copy (counted as cache hits)
+    def cached(self):
+        if (not self.use_cache):
+            return False
+        if (self.shadow is not None):
+            self.cache_hits += 1
+            return True
+        self.cache_misses += 1
+        return False
+
     def read_cell_state(self,coords=(0,0)):
-        v = self.wb.read(self.ba+0x4000+coords[0]+coords[1]*self.grid_size[0])
+        i = coords[0]+coords[1]*self.grid_size[0]
+        if (self.cached()):
+            return int(self.shadow[i])
+        if (self.use_cache and self.running is False):
+            # Fill the cache, the next cell reads need no bus transfer
+            return int(self.fetch_grid()[i])
+        v = self.wb.read(self.ba+0x4000+i)
         return v
     def write_cell_state(self,coords=(0,0), value=0):
         self.wb.write(self.ba+0x4000+coords[0]+coords[1]*self.grid_size[0], value)
+        if (self.shadow is not None):
+            self.shadow[coords[0]+coords[1]*self.grid_size[0]] = value
+
+    # Whole grid access using one pipelined bus transfer
+    def read_grid(self):
+        if (self.cached()):
+            return make_grid(self.shadow,self.grid_size[0])
+        return make_grid(self.fetch_grid(),self.grid_size[0])
+
+    # Flat cell states read from the bus, the shadow copy is updated
+    def fetch_grid(self):
+        if (self.packed is not None):
+            if (self.bursts):
+                words = self.wb.read_burst(self.packed_addrs[0],len(self.packed_addrs))
+            else:
+                words = self.wb.read_multi(self.packed_addrs)
+            values = unpack_cells(words,self.packed[0],self.packed[1],len(self.cell_addrs))
+        elif (self.bursts):
+            values = self.wb.read_burst(self.cell_addrs[0],len(self.cell_addrs))
+        else:
+            values = self.wb.read_multi(self.cell_addrs)
+        self.update_shadow(values)
+        return values
+    def write_grid(self,grid):
+        values = flatten_grid(grid)
+        if (self.bursts):
+            self.wb.write_burst(self.cell_addrs[0],values)
+        else:
+            self.wb.write_multi(self.cell_addrs,values)
+        self.update_shadow(values)
+
+    # Write only the cells which differ from the shadow copy
+    # Falls back to writing the whole grid when the shadow copy is not valid.
+    # Returns the number of written cells.
+    def sync_grid(self,target):
+        values = flatten_grid(target)
+        if (self.shadow is None):
+            self.write_grid(make_grid(values,self.grid_size[0]))
+            return len(values)
+        if (np is not None):
+            values = np.array(values,dtype=np.uint8)
+            idx = np.flatnonzero(self.shadow!=values).tolist()
+        else:
+            idx = [i for i,(a,b) in enumerate(zip(self.shadow,values)) if a!=b]
+        if (self.bursts):
+            # Runs of changed cells as bursts, single cells as plain writes (shorter)
+            reqs = []
+            for i,n in index_runs(idx):
+                if (n==1):
+                    reqs.append((write_cmd.pack(0x1,self.cell_addrs[i],int(values[i])),1))
+                else:
+                    reqs += burst_write_reqs(self.cell_addrs[i],[int(v) for v in values[i:i+n]])
+            self.wb.transfer_raw(reqs)
+        else:
+            self.wb.write_multi([self.cell_addrs[i] for i in idx],[int(values[i]) for i in idx])
+        for i in idx:
+            self.shadow[i] = values[i]
+        return len(idx)
+
+    def update_shadow(self,values):
+        if (not self.use_shadow or self.running is not False):
+            self.shadow = None
+        elif (np is not None):
+            self.shadow = np.array(values,dtype=np.uint8)
+        else:
+            self.shadow = array('B',values)
+
     def print_cell_states(self):
-        for i in range(self.grid_size[1]):
-            line = ""
-            for e in range(self.grid_size[0]):
-                line += "%02d " % (self.read_cell_state((e,i)))
-            print(line)
+        print(format_grid(self.read_grid()))
         return 0
 
     def start(self):
         self.wb.write(self.ba+0x0,1)
+        self.running = True
+        self.shadow  = None
     def stop(self):
         self.wb.write(self.ba+0x0,0)
+        self.running = False
     def reset(self):
         self.wb.write(self.ba+0x0,2)
+        self.running  = False
+        self.shadow   = None
+        self.last_gen = 0
     def set_gen_limit(self,limit):
         self.wb.write(self.ba+0x1,limit)
     def set_unlimited_gen(self):
-        self.set_gen_limit(0)
\ No newline at end of file
+        self.set_gen_limit(0)
+
+    # Compute 'n' more generations and return the final generation index
+    # Sleeps until shortly before the estimated end of the run and then polls
+    # the Current Generation Register with growing intervals.
+    def run_generations(self, n, min_poll=0.001, max_poll=0.5, timeout=None):
+        self.stop()
+        gen = self.read_current_gen()
+        target = gen+n
+        self.set_gen_limit(target)
+        t0 = time()
+        self.start()
+
+        if (self.gen_cycles is not None):
+            # Wake up a bit before the expected end
+            sleep(0.9*n*self.gen_cycles/self.clk_freq)
+
+        interval = min_poll
+        while (True):
+            cg = self.read_current_gen()
+            if (cg>=target):
+                break
+            now = time()
+            if (timeout is not None and now-t0>timeout):
+                raise TimeoutError("Generation %d not reached in %.1f s (current %d)" % (target,timeout,cg))
+            if (cg>gen):
+                # Half of the remaining time at the observed speed
+                delay = 0.5*(target-cg)*(now-t0)/(cg-gen)
+            else:
+                delay = interval
+            interval = min(interval*2,max_poll)
+            sleep(min(max(delay,min_poll),interval))
+        self.stop()
+        return cg
@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Pool of boards computing independent jobs concurrently
+# Each board is driven by its own thread. A job (initial state, number of
+# generations) runs on any healthy board with the same grid size; when it
+# fails on a board (e.g. response timeout), it is retried on another one.
+
+import serial
+import threading
+from argparse import ArgumentParser
+from concurrent.futures import Future
+from time import time
+
+from wishbone         import *
+from sys_module       import *
+from cellular_automat import *
+
+# System module versions of bitstreams the pool can work with
+known_versions = sorted(set([base_version,burst_version,sys_version]))
+
+class pool_job:
+    def __init__(self, state, gens, timeout):
+        self.state   = state
+        self.gens    = gens
+        self.timeout = timeout
+        self.size    = (len(state[0]),len(state)) # the same as grid_size
+        self.future  = Future()
+        self.tried   = set() # boards on which the job failed
+
+class pool_board:
+    def __init__(self, name, wb, gen_cycles=None):
+        self.name      = name
+        self.wb        = wb
+        self.sys_mod   = sys_module(wb)
+        self.version   = self.sys_mod.read_version()
+        self.cell_auto = cellular_automat(wb,0x8000,gen_cycles=gen_cycles)
+        self.grid_size = self.cell_auto.grid_size
+        self.healthy   = True
+        self.failures  = 0 # consecutive failures
+        self.jobs      = 0
+        self.gens      = 0
+        self.busy      = 0.0
+
+    def run(self, job):
+        self.cell_auto.stop()
+        self.cell_auto.write_grid(job.state)
+        self.cell_auto.run_generations(job.gens,timeout=job.timeout)
+        return self.cell_auto.read_grid()
+
+    # Drop late responses of a failed job, they would be taken for responses of the next one
+    def flush(self):
+        self.wb.drain()
+        # The automaton state is unknown after a failure
+        self.cell_auto.running = None
+        self.cell_auto.shadow  = None
+
+class device_pool:
+    # 'ports' are serial port names or open serial-port-like objects (e.g. fpga_emulator).
+    # Ports which cannot be opened or read are not used.
+    # A board is taken out of the pool after 'max_failures' consecutive failed jobs.
+    def __init__(self, ports, baudrate=9600, gen_cycles=None, versions=known_versions, max_failures=3):
+        self.max_failures = max_failures
+        self.boards = []
+        self.jobs   = []
+        self.cond   = threading.Condition()
+        self.closed = False
+        for port in ports:
+            wb = None
+            try:
+                wb = wishbone(port,baudrate)
+                board = pool_board(wb.uart.name,wb,gen_cycles)
+            except (IOError,serial.SerialException) as e:
+                print("Board %s cannot be used: %s" % (getattr(port,"name",port),e))
+                if (wb is not None):
+                    wb.close()
+                continue
+            if (board.version not in versions):
+                print("Board %s has unknown version 0x%08X, it is not used." % (board.name,board.version))
+                wb.close()
+                continue
+            print("Board %s: version 0x%08X, grid %dx%d" % (board.name,board.version,board.grid_size[0],board.grid_size[1]))
+            self.boards.append(board)
+        self.threads = [threading.Thread(target=self.worker,args=(b,),daemon=True) for b in self.boards]
+        self.t_start = time()
+        for t in self.threads:
+            t.start()
+
+    # Queue a job; returns a Future resolved with the final grid
+    def submit(self, state, gens, timeout=None):
+        job = pool_job(state,gens,timeout)
+        with self.cond:
+            if (not self.candidates(job)):
+                job.future.set_exception(RuntimeError("No healthy board with grid %dx%d" % job.size))
+            else:
+                self.jobs.append(job)
+                self.cond.notify_all()
+        return job.future
+
+    # Run jobs for all initial states and return the final grids in order
+    def map(self, states, gens, timeout=None):
+        futures = [self.submit(s,gens,timeout) for s in states]
+        return [f.result() for f in futures]
+
+    def candidates(self, job):
+        return [b for b in self.boards if (b.healthy and b.grid_size==job.size and b not in job.tried)]
+
+    # Next job the board can run (called with the lock held), None for a removed board
+    def take_job(self, board):
+        if (not board.healthy):
+            return None
+        for i,job in enumerate(self.jobs):
+            if (board.grid_size==job.size and board not in job.tried):
+                return self.jobs.pop(i)
+        return None
+
+    def worker(self, board):
+        while (True):
+            with self.cond:
+                job = self.take_job(board)
+                while (job is None and not self.closed and board.healthy):
+                    self.cond.wait()
+                    job = self.take_job(board)
+                if (job is None):
+                    return
+            t = time()
+            try:
+                grid = board.run(job)
+            except Exception as e:
+                # Any failure must resolve or requeue the job, map() waits for it
+                self.job_failed(board,job,e)
+                continue
+            board.busy += time()-t
+            board.jobs += 1
+            board.gens += job.gens
+            board.failures = 0
+            job.future.set_result(grid)
+
+    def job_failed(self, board, job, error):
+        board.flush()
+        with self.cond:
+            board.failures += 1
+            job.tried.add(board)
+            if (board.failures>=self.max_failures):
+                board.healthy = False
+                print("Board %s removed from the pool after %d failures (%s)" % (board.name,board.failures,error))
+                # Fail queued jobs nobody else can run
+                for j in [j for j in self.jobs if (not self.candidates(j))]:
+                    self.jobs.remove(j)
+                    j.future.set_exception(RuntimeError("No healthy board with grid %dx%d" % j.size))
+            if (self.candidates(job)):
+                self.jobs.insert(0,job)
+                self.cond.notify_all()
+            else:
+                job.future.set_exception(error)
+
+    def report(self):
+        t = time()-self.t_start
+        print("%-16s %7s %5s %8s %12s %10s" % ("board","healthy","jobs","failures","gens","busy [s]"))
+        for b in self.boards:
+            print("%-16s %7s %5d %8d %12d %10.3f" % (b.name,b.healthy,b.jobs,b.failures,b.gens,b.busy))
+        print("Aggregate: %d jobs, %.0f generations per second in %.3f s" % (sum(b.jobs for b in self.boards),sum(b.gens for b in self.boards)/t,t))
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        for t in self.threads:
+            t.join()
+        for b in self.boards:
+            b.wb.close()
+
+if __name__ == '__main__':
+    import random
+
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("--ports",nargs="+",default=["COM4"],help="Serial ports of the boards (default: COM4)")
+    parser.add_argument("--emulate",nargs=3,metavar=("N","CAS","TAB"),help="Use N emulators loaded with given '.cas' and '.tab' files instead of devices")
+    parser.add_argument("--baudrate",type=int,default=9600,help="UART baud rate (default: 9600)")
+    parser.add_argument("--jobs",type=int,default=16,help="Number of jobs with random initial states (default: 16)")
+    parser.add_argument("--gens",type=int,default=2**20,help="Generations computed by each job (default: 2**20)")
+    parser.add_argument("--timeout",type=float,default=None,help="Time limit of a job run in seconds (default: none)")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    ports = args.ports
+    gen_cycles = None
+    if (args.emulate):
+        from fpga_emulator import fpga_emulator
+        ports = [fpga_emulator(args.emulate[1],args.emulate[2],baudrate=args.baudrate) for i in range(int(args.emulate[0]))]
+        gen_cycles = ports[0].gen_cycles
+
+    pool = device_pool(ports,args.baudrate,gen_cycles)
+    if (not pool.boards):
+        exit(-1)
+    cols, rows = pool.boards[0].grid_size
+    states = [[[random.randint(0,1) for x in range(cols)] for y in range(rows)] for j in range(args.jobs)]
+    for grid in pool.map(states,args.gens,args.timeout)[:1]:
+        print(format_grid(grid))
+    pool.report()
+    pool.close()
@@ -0,0 +1,365 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# In-process emulator of the whole FPGA design as seen from the UART:
+# UART2WBM byte protocol, Wishbone splitter, System module and Cellular Automaton
+# register map. The emulator object behaves like an open serial port, so it can
+# be passed to 'wishbone' directly, or it can be served on a pseudo-terminal.
+
+import os
+import sys
+import threading
+from argparse import ArgumentParser
+from collections import deque
+from time import time, sleep
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","config"))
+from cell_auto_engine import cell_auto_engine
+from cellular_automat import grid_checksum, packed_window_bit, checksum_bit
+from wishbone import base_version, burst_version, sys_version, packed_version
+
+# Maximum number of remembered states used to skip over periodic behaviour
+max_history = 4096
+
+# Model of the System module (rtl/comp/base/sys_module.vhd)
+class sys_module_model:
+    def __init__(self, version=sys_version):
+        self.version   = version
+        self.debug_reg = 0
+
+    def read(self, addr, t):
+        if (addr==0x0000):
+            return self.version
+        if (addr==0x0004):
+            return self.debug_reg
+        return 0xDEADDEAD
+
+    def write(self, addr, data, t):
+        if (addr==0x0004):
+            self.debug_reg = data
+
+# Model of the Cellular Automaton (rtl/comp/cellular_automaton/cellular_automaton.vhd)
+# Generations advance with time 't' at the rate of clk_freq/gen_cycles,
+# but cell states are only computed when they are accessed.
+class automaton_model:
+    # 'packed_window' and 'checksum' are the generics PACKED_WINDOW and CHECKSUM
+    def __init__(self, engine, gen_cycles, clk_freq=50e6, packed_window=False, checksum=False):
+        self.engine     = engine
+        self.init_state = engine.grid.copy()
+        self.rows       = engine.grid.shape[0]
+        self.cols       = engine.grid.shape[1]
+        self.state_mask = 2**engine.state_w-1
+        self.packed     = packed_window
+        self.has_crc    = checksum
+        self.per_word   = 32//engine.state_w
+        self.checksum   = 0
+        self.gen_cycles = gen_cycles
+        self.clk_freq   = clk_freq
+
+        self.control_reg   = 0
+        self.gen_limit_reg = 0x80000000
+        self.t_last        = 0.0
+        self.cycles        = 0.0
+        self.reset()
+
+    def reset(self):
+        self.control_reg  = 0
+        self.gen_curr_reg = 0
+        self.grid         = self.init_state.copy()
+        self.pending      = 0
+        self.total        = 0
+        self.history      = {}
+
+    def cells_en(self):
+        return self.control_reg==1 and (self.gen_curr_reg<self.gen_limit_reg or self.gen_limit_reg==0)
+
+    # Count generations computed since the last access
+    def update(self, t):
+        if (self.cells_en()):
+            self.cycles += (t-self.t_last)*self.clk_freq
+            n = int(self.cycles//self.gen_cycles)
+            self.cycles -= n*self.gen_cycles
+            if (self.gen_limit_reg!=0):
+                n = min(n,self.gen_limit_reg-self.gen_curr_reg)
+            self.gen_curr_reg = (self.gen_curr_reg+n)%2**32
+            self.pending += n
+        else:
+            self.cycles = 0.0
+        self.t_last = max(self.t_last,t)
+
+    # Compute pending generations, skipping over repeated states
+    def materialize(self):
+        while (self.pending>0):
+            key = self.grid.tobytes()
+            if (key in self.history):
+                self.pending %= self.total-self.history[key]
+                self.history = {}
+                if (self.pending==0):
+                    break
+            elif (len(self.history)<max_history):
+                self.history[key] = self.total
+            self.grid = self.engine.next_state(self.grid)
+            self.total   += 1
+            self.pending -= 1
+
+    def read(self, addr, t):
+        self.update(t)
+        if (addr&0x6000==0x2000 and self.packed):
+            idx = (addr&0x1FFF)*self.per_word
+            if (idx>=self.rows*self.cols):
+                return 0xDEADBEEF
+            self.materialize()
+            word = 0
+            for k,v in enumerate(self.grid.ravel()[idx:idx+self.per_word].tolist()):
+                word |= v<<(k*self.engine.state_w)
+            return word
+        if (addr&0x4000==0):
+            if (addr==0):
+                return self.control_reg
+            if (addr==1):
+                return self.gen_limit_reg
+            if (addr==2):
+                return self.gen_curr_reg
+            if (addr==3):
+                return self.rows
+            if (addr==4):
+                return self.cols
+            if (addr==5 and (self.packed or self.has_crc)):
+                return (checksum_bit if (self.has_crc) else 0)|(packed_window_bit if (self.packed) else 0)|(self.engine.state_w<<16)|self.per_word
+            if (addr==6 and self.has_crc):
+                # Computed after the last change, stays unchanged while running
+                if (not self.cells_en()):
+                    self.materialize()
+                    self.checksum = grid_checksum(self.grid,self.engine.state_w)
+                return self.checksum
+            if (addr==7 and self.has_crc):
+                return 0 if (self.cells_en()) else 1
+            return 0xDEADCAFE
+        idx = addr&0x3FFF
+        if (idx<self.rows*self.cols):
+            self.materialize()
+            return int(self.grid[idx//self.cols,idx%self.cols])
+        return 0xDEADBEEF
+
+    def write(self, addr, data, t):
+        self.update(t)
+        if (addr==0):
+            if (data==2):
+                self.reset()
+            elif (data==1):
+                self.control_reg = 1
+            elif (data==0):
+                self.control_reg = 0
+        elif (addr==1):
+            if (self.control_reg==0):
+                self.gen_limit_reg = data
+        elif (addr&0x4000 and not self.cells_en()):
+            idx = addr&0x3FFF
+            if (idx<self.rows*self.cols):
+                self.materialize()
+                self.grid[idx//self.cols,idx%self.cols] = data&self.state_mask
+                self.history = {}
+
+# Model of the Wishbone splitter and UART2WBM request handling
+# Command bit 0 selects write, bit 1 burst (when 'bursts' is enabled, older
+# UART2WBM ignores it); a burst has a length byte and accesses len+1 words.
+class uart2wbm_model:
+    def __init__(self, slaves, bursts=True):
+        self.slaves = slaves # System module, Cellular Automaton
+        self.bursts = bursts
+        self.frame  = bytearray()
+
+    # Length of the frame 'frame' (so far received part of it)
+    def frame_len(self, frame):
+        cmd = frame[0]
+        if (self.bursts and cmd&0x2):
+            if (len(frame)<4):
+                return 4
+            return 4+4*(frame[3]+1) if (cmd&0x1) else 4
+        return 7 if (cmd&0x1) else 3
+
+    def idle(self):
+        return len(self.frame)==0
+
+    # Accept one received byte; returns the response bytes when a request is complete
+    def push(self, byte, t):
+        self.frame.append(byte)
+        if (len(self.frame)<self.frame_len(self.frame)):
+            return b""
+        frame = bytes(self.frame)
+        self.frame = bytearray()
+        return self.request(frame, t)
+
+    def request(self, frame, t):
+        cmd  = frame[0]
+        addr = int.from_bytes(frame[1:3],"little")
+        if (self.bursts and cmd&0x2):
+            n    = frame[3]+1
+            data = frame[4:]
+        else:
+            n    = 1
+            data = frame[3:]
+        resp = bytearray([cmd])
+        for i in range(n):
+            a = (addr+i)&0xFFFF
+            slave = self.slaves[a>>15]
+            if (cmd&0x1):
+                slave.write(a&0x7FFF,int.from_bytes(data[4*i:4*i+4],"little"),t)
+            else:
+                resp += slave.read(a&0x7FFF,t).to_bytes(4,"little")
+        return bytes(resp)
+
+# Emulated FPGA board behind a serial port
+# Bytes travel at 'baudrate' (10 bits per byte, no delays when 0) and wait
+# in a 'fifo_size' bytes long RX FIFO while the UART2WBM is busy; overflowing bytes are lost.
+# 'fifo_size' None means the RX FIFO of the emulated 'version': UART2WBM of base_version
+# has none and loses bytes received while it sends a response.
+# 'packed_window' and 'checksum' enable the optional automaton features (as the generics of rtl/fpga.vhd).
+class fpga_emulator:
+    def __init__(self, init_file, trans_tab_file, rom_ways=4, clk_freq=50e6, baudrate=9600, fifo_size=None, timeout=2, version=sys_version, packed_window=True, checksum=True):
+        self.engine = cell_auto_engine(trans_tab_file,init_file,rom_ways)
+        self.error  = self.engine.error
+        if (self.error):
+            return
+        self.gen_cycles = self.engine.act_rom_items+3
+        self.automaton  = automaton_model(self.engine,self.gen_cycles,clk_freq,packed_window and version>=packed_version,checksum and version>=packed_version)
+        self.sys_module = sys_module_model(version)
+        self.uart2wbm   = uart2wbm_model([self.sys_module,self.automaton],version>=burst_version)
+
+        self.name      = "emulator"
+        self.timeout   = timeout
+        self.byte_time = 10.0/baudrate if (baudrate) else 0.0
+        if (fifo_size is None):
+            fifo_size = 511 if (version>=burst_version) else 0
+        self.fifo_size = fifo_size
+        self.dropped   = 0
+
+        self.lock      = threading.Lock()
+        self.rx_time   = 0.0     # when the last received byte arrived
+        self.fsm_free  = 0.0     # when UART2WBM can accept next request
+        self.tx_free   = 0.0     # when the UART transmitter finishes the last byte
+        self.last_read = 0.0     # when the last byte was taken from the RX FIFO
+        self.rx_fifo   = deque() # times when bytes in the RX FIFO will be taken
+        self.tx_queue  = deque() # (arrival time at the host, byte)
+
+    def write(self, data):
+        with self.lock:
+            now = time()
+            bt  = self.byte_time
+            for b in data:
+                self.rx_time = max(self.rx_time,now)+bt
+                while (self.rx_fifo and self.rx_fifo[0]<=self.rx_time):
+                    self.rx_fifo.popleft()
+                t = max(self.rx_time,self.fsm_free,self.last_read)
+                # Only a byte which cannot be taken at once needs space in the FIFO
+                if (t>self.rx_time and len(self.rx_fifo)>=self.fifo_size):
+                    self.dropped += 1
+                    continue
+                self.last_read = t
+                self.rx_fifo.append(t)
+                resp = self.uart2wbm.push(b,t)
+                if (resp):
+                    start = max(t,self.tx_free)
+                    for k,r in enumerate(resp):
+                        self.tx_queue.append((start+(k+1)*bt,r))
+                    self.tx_free  = start+len(resp)*bt
+                    self.fsm_free = self.tx_free-bt
+        return len(data)
+
+    # Time when the next response byte arrives at the host (None when nothing is pending)
+    def next_ready(self):
+        with self.lock:
+            return self.tx_queue[0][0] if (self.tx_queue) else None
+
+    @property
+    def in_waiting(self):
+        with self.lock:
+            now = time()
+            return sum(1 for t,b in self.tx_queue if t<=now)
+
+    def read(self, size=1):
+        deadline = None if (self.timeout is None) else time()+self.timeout
+        data = bytearray()
+        while (len(data)<size):
+            with self.lock:
+                now = time()
+                while (self.tx_queue and self.tx_queue[0][0]<=now and len(data)<size):
+                    data.append(self.tx_queue.popleft()[1])
+                ready = self.tx_queue[0][0] if (self.tx_queue) else None
+            if (len(data)>=size):
+                break
+            wait = (ready if (ready is not None) else float("inf"))
+            if (deadline is not None):
+                if (now>=deadline):
+                    break
+                wait = min(wait,deadline)
+            sleep(max(0.0,wait-now))
+        return bytes(data)
+
+    def reset_input_buffer(self):
+        with self.lock:
+            self.tx_queue.clear()
+
+    def close(self):
+        pass
+
+# Serves an emulator on a pseudo-terminal, so it can be opened as a serial port
+class emulator_pty:
+    def __init__(self, emulator):
+        import tty
+        self.emu = emulator
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.running = True
+        self.thread = threading.Thread(target=self.serve,daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        import select
+        while (self.running):
+            ready = self.emu.next_ready()
+            wait = 0.05 if (ready is None) else min(0.05,max(0.0,ready-time()))
+            r,w,x = select.select([self.master],[],[],wait)
+            if (r):
+                self.emu.write(os.read(self.master,4096))
+            n = self.emu.in_waiting
+            if (n):
+                os.write(self.master,self.emu.read(n))
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+if __name__ == '__main__':
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("init_state_file",help="Name of input '.cas' file with initial automaton state")
+    parser.add_argument("trans_table_file",help="Name of input '.tab' file with explicit automaton transition rules")
+    parser.add_argument("--rom_ways",type=int,default=4,help="Number of parallel ways in Cell associative ROM (default: 4)")
+    parser.add_argument("--clk_freq",type=float,default=50e6,help="Emulated clock frequency in Hz (default: 50e6)")
+    parser.add_argument("--baudrate",type=int,default=9600,help="Emulated UART baud rate, 0 for unlimited (default: 9600)")
+    parser.add_argument("--no_packed_window",action="store_true",help="Emulate the automaton built without PACKED_WINDOW")
+    parser.add_argument("--no_checksum",action="store_true",help="Emulate the automaton built without CHECKSUM")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    emu = fpga_emulator(args.init_state_file,args.trans_table_file,args.rom_ways,args.clk_freq,args.baudrate,packed_window=not args.no_packed_window,checksum=not args.no_checksum)
+    if (emu.error!=0):
+        exit(emu.error)
+    pty = emulator_pty(emu)
+    print("Emulated FPGA (%dx%d, %d cycles per generation) is available on port %s" % (emu.automaton.cols,emu.automaton.rows,emu.gen_cycles,pty.port))
+    print("Press Ctrl+C to exit.")
+    try:
+        while (True):
+            sleep(1)
+    except KeyboardInterrupt:
+        pty.close()
@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Streaming capture and recording of automaton runs
+# A background thread reads frames (generation, time, grid) at a target rate
+# into a bounded ring buffer; when the consumer falls behind, the oldest frames
+# are dropped. Consumers take the frames from the 'frames()' generator: the
+# terminal viewer and the recorder writing a '.caf' file.
+#
+# '.caf' layout (little endian):
+#   header:  magic "CAF1", version (u16), state width (u8), reserved (u8), rows (u32), cols (u32)
+#   frames:  kind (u8, 0 key frame, 1 delta), generation (u64), time (f64), payload length (u32), payload
+#            payload: runs (u32), run lengths (u32 each), run values (u8 each) of the
+#            row-major cells (key frame) or of their XOR with the previous frame (delta)
+#   index:   key frames (u32), (frame number (u32), generation (u64), offset (u64)) each
+#   trailer: index offset (u64), magic "CAFI"
+# A file without the trailer (interrupted recording) is indexed by scanning it.
+
+import os
+import sys
+import threading
+from argparse import ArgumentParser
+from collections import deque
+from itertools import chain
+from struct import Struct
+from time import time, sleep
+
+import numpy as np
+
+from wishbone         import *
+from cellular_automat import *
+
+caf_magic   = b"CAF1"
+caf_version = 1
+caf_header  = Struct("<4sHBBII")
+caf_frame   = Struct("<BQdI")
+caf_key     = Struct("<IQQ")
+caf_trailer = Struct("<Q4s")
+
+# Run-length encoding of a flat array of cell states
+def rle_encode(values):
+    values = np.asarray(values,dtype=np.uint8).ravel()
+    if (len(values)==0):
+        return np.uint32(0).tobytes()
+    starts = np.flatnonzero(np.concatenate(([True],values[1:]!=values[:-1])))
+    lengths = np.diff(np.append(starts,len(values))).astype("<u4")
+    return np.uint32(len(starts)).tobytes()+lengths.tobytes()+values[starts].tobytes()
+
+def rle_decode(payload):
+    n = int(np.frombuffer(payload,dtype="<u4",count=1)[0])
+    lengths = np.frombuffer(payload,dtype="<u4",count=n,offset=4)
+    values  = np.frombuffer(payload,dtype=np.uint8,count=n,offset=4+4*n)
+    return np.repeat(values,lengths)
+
+class frame_capture:
+    # Frames are read by a separate 'cellular_automat' over the same bus
+    # (transfers are serialized by the wishbone lock), so the caller's cell cache
+    # is not affected. The generation of a frame is read just before its cells,
+    # while running the cells may be a few generations newer.
+    def __init__(self, cell_auto, rate=10.0, depth=64):
+        self.cell_auto = cellular_automat(cell_auto.wb,cell_auto.ba,cache=False)
+        self.period    = 1.0/rate
+        self.buffer    = deque(maxlen=depth)
+        self.cond      = threading.Condition()
+        self.running   = False
+        self.thread    = None
+        self.captured  = 0
+        self.dropped   = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.capture,daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if (self.thread is not None):
+            self.thread.join()
+        with self.cond:
+            self.cond.notify_all()
+
+    def capture(self):
+        t_next = time()
+        while (self.running):
+            gen  = self.cell_auto.read_current_gen()
+            grid = np.asarray(self.cell_auto.read_grid(),dtype=np.uint8)
+            with self.cond:
+                if (len(self.buffer)==self.buffer.maxlen):
+                    self.dropped += 1
+                self.buffer.append((gen,time(),grid))
+                self.captured += 1
+                self.cond.notify_all()
+            # Steady rate; after a stall the lost slots are skipped, not caught up
+            t_next += self.period
+            now = time()
+            if (t_next<now):
+                t_next = now
+            sleep(t_next-now)
+
+    # Captured frames (generation, time, grid) until the capture stops
+    def frames(self):
+        while (True):
+            with self.cond:
+                while (not self.buffer and self.running):
+                    self.cond.wait()
+                if (not self.buffer):
+                    return
+                frame = self.buffer.popleft()
+            yield frame
+
+    def report(self):
+        print("Frames captured: %d, dropped: %d" % (self.captured,self.dropped))
+
+# Terminal consumer: redraws the grid in place
+def terminal_viewer(frames, out=sys.stdout):
+    for gen,t,grid in frames:
+        out.write("\x1b[H\x1b[2J")
+        out.write("Generation %d\n" % (gen))
+        out.write(format_grid(grid)+"\n")
+        out.flush()
+
+class frame_recorder:
+    # A key frame is written every 'key_interval' frames, deltas in between
+    def __init__(self, file_name, rows, cols, state_w=1, key_interval=64):
+        self.f = open(file_name,"wb")
+        self.f.write(caf_header.pack(caf_magic,caf_version,state_w,0,rows,cols))
+        self.key_interval = key_interval
+        self.index  = [] # (frame number, generation, offset) of key frames
+        self.frames = 0
+        self.prev   = None
+        self.bytes  = 0 # payload bytes
+
+    def write(self, gen, t, grid):
+        cells = np.asarray(grid,dtype=np.uint8).ravel()
+        if (self.prev is None or self.frames%self.key_interval==0):
+            kind = 0
+            self.index.append((self.frames,gen,self.f.tell()))
+            payload = rle_encode(cells)
+        else:
+            kind = 1
+            payload = rle_encode(cells^self.prev)
+        self.f.write(caf_frame.pack(kind,gen,t,len(payload)))
+        self.f.write(payload)
+        self.prev = cells
+        self.frames += 1
+        self.bytes += len(payload)
+
+    # Consumer of frame_capture.frames()
+    def record(self, frames):
+        for gen,t,grid in frames:
+            self.write(gen,t,grid)
+
+    def close(self):
+        offset = self.f.tell()
+        self.f.write(np.uint32(len(self.index)).tobytes())
+        for k in self.index:
+            self.f.write(caf_key.pack(*k))
+        self.f.write(caf_trailer.pack(offset,b"CAFI"))
+        self.f.close()
+
+# Seekable reader of '.caf' files
+class frame_reader:
+    def __init__(self, file_name):
+        self.f = open(file_name,"rb")
+        magic, version, self.state_w, res, self.rows, self.cols = caf_header.unpack(self.f.read(caf_header.size))
+        if (magic!=caf_magic or version!=caf_version):
+            raise ValueError("File %s is not a version %d '.caf' file" % (file_name,caf_version))
+        self.data_end = self.read_index()
+
+    # Key frames from the trailer, or by scanning a file without it; returns the end of frames
+    def read_index(self):
+        size = self.f.seek(0,os.SEEK_END)
+        if (size>=caf_header.size+caf_trailer.size):
+            self.f.seek(size-caf_trailer.size)
+            offset, magic = caf_trailer.unpack(self.f.read(caf_trailer.size))
+            if (magic==b"CAFI"):
+                self.f.seek(offset)
+                n = int(np.frombuffer(self.f.read(4),dtype="<u4")[0])
+                self.index = [caf_key.unpack(self.f.read(caf_key.size)) for i in range(n)]
+                return offset
+        self.index = []
+        pos = caf_header.size
+        frame = 0
+        while (pos+caf_frame.size<=size):
+            self.f.seek(pos)
+            kind, gen, t, n = caf_frame.unpack(self.f.read(caf_frame.size))
+            if (pos+caf_frame.size+n>size):
+                break # incomplete last frame
+            if (kind==0):
+                self.index.append((frame,gen,pos))
+            pos += caf_frame.size+n
+            frame += 1
+        return pos
+
+    # Frames (generation, time, grid) starting at the key frame at 'offset'
+    def frames_from(self, offset):
+        pos = offset
+        cells = None
+        while (pos<self.data_end):
+            self.f.seek(pos)
+            kind, gen, t, n = caf_frame.unpack(self.f.read(caf_frame.size))
+            values = rle_decode(self.f.read(n))
+            cells = values if (kind==0) else cells^values
+            pos += caf_frame.size+n
+            yield (gen,t,cells.reshape(self.rows,self.cols))
+
+    def __iter__(self):
+        if (not self.index):
+            return iter([])
+        return self.frames_from(self.index[0][2])
+
+    # Frames from the last one with generation not above 'gen' (decoding starts at the nearest key frame)
+    def seek(self, gen):
+        keys = [k for k in self.index if (k[1]<=gen)]
+        if (not keys):
+            return iter([])
+        frames = self.frames_from(keys[-1][2])
+        prev = next(frames)
+        for frame in frames:
+            if (frame[0]>gen):
+                return chain([prev,frame],frames)
+            prev = frame
+        return iter([prev])
+
+    def close(self):
+        self.f.close()
+
+if __name__ == '__main__':
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("--port",default="COM4",help="Target device serial port name (default: COM4)")
+    parser.add_argument("--emulate",nargs=2,metavar=("CAS","TAB"),help="Use the emulator loaded with given '.cas' and '.tab' files instead of a device")
+    parser.add_argument("--baudrate",type=int,default=9600,help="UART baud rate (default: 9600)")
+    parser.add_argument("--rate",type=float,default=10.0,help="Frames captured per second (default: 10)")
+    parser.add_argument("--depth",type=int,default=64,help="Frames kept when the consumer falls behind (default: 64)")
+    parser.add_argument("--duration",type=float,default=10.0,help="Length of the captured run in seconds (default: 10)")
+    parser.add_argument("--gen_limit",type=int,default=0,help="Generation limit of the run, 0 for unlimited (default: 0)")
+    parser.add_argument("--record",default=None,help="Record the frames to this '.caf' file instead of showing them")
+    parser.add_argument("--play",default=None,help="Show frames of this '.caf' file instead of capturing")
+    parser.add_argument("--seek",type=int,default=0,help="Generation to start playing from (default: 0)")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    if (args.play):
+        reader = frame_reader(args.play)
+        def paced(frames):
+            last = None
+            for frame in frames:
+                if (last is not None):
+                    sleep(max(0.0,frame[1]-last))
+                last = frame[1]
+                yield frame
+        terminal_viewer(paced(reader.seek(args.seek)))
+        reader.close()
+        exit(0)
+
+    if (args.emulate):
+        from fpga_emulator import fpga_emulator
+        emu = fpga_emulator(args.emulate[0],args.emulate[1],baudrate=args.baudrate)
+        if (emu.error!=0):
+            exit(emu.error)
+        wb = wishbone(emu)
+    else:
+        wb = wishbone(args.port,args.baudrate)
+
+    cell_auto = cellular_automat(wb,0x8000)
+    cell_auto.reset()
+    capture = frame_capture(cell_auto,args.rate,args.depth)
+    state_w = cell_auto.state_w if (cell_auto.state_w is not None) else 8
+    if (args.record):
+        recorder = frame_recorder(args.record,cell_auto.grid_size[1],cell_auto.grid_size[0],state_w)
+        consumer = threading.Thread(target=recorder.record,args=(capture.frames(),))
+    else:
+        consumer = threading.Thread(target=terminal_viewer,args=(capture.frames(),))
+
+    cell_auto.set_gen_limit(args.gen_limit)
+    cell_auto.start()
+    capture.start()
+    consumer.start()
+    sleep(args.duration)
+    capture.stop()
+    consumer.join()
+    cell_auto.stop()
+    capture.report()
+    if (args.record):
+        recorder.close()
+        print("Recorded %d frames to %s (%d payload bytes)" % (recorder.frames,args.record,recorder.bytes))
+    wb.close()
@@ -7,7 +7,6 @@
 #-------------------------------------------------------------------------------
 
 from argparse         import ArgumentParser
-from time             import sleep,time
 
 from wishbone         import *
 from sys_module       import *
@@ -27,7 +26,7 @@ wb = wishbone(args.port)
 sys_mod = sys_module(wb)
 sys_mod.report()
 
-cell_auto = cellular_automat(wb,0x8000)
+cell_auto = cellular_automat(wb,0x8000,shadow=True)
 
 # Init FPGA Automaton
 cell_auto.reset()
@@ -54,14 +53,9 @@ print("------------")
 cell_auto.set_gen_limit(1)
 cell_auto.start()
 cell_auto.stop()
-state = []
-for i in range(cell_auto.grid_size[1]):
-    line = []
-    for e in range(cell_auto.grid_size[0]):
-        line.append(cell_auto.read_cell_state((e,i)))
-    state.append(line)
+state = cell_auto.read_grid()
 print("State after 1 step")
-cell_auto.print_cell_states()
+print(format_grid(state))
 print("------------")
 cell_auto.set_gen_limit(2)
 cell_auto.start()
@@ -69,10 +63,8 @@ cell_auto.stop()
 print("State after next step")
 cell_auto.print_cell_states()
 print("------------")
-for i in range(cell_auto.grid_size[1]):
-    for e in range(cell_auto.grid_size[0]):
-        cell_auto.write_cell_state((e,i), state[i][e])
-print("State after writing step 1 back")
+n = cell_auto.sync_grid(state)
+print("State after writing step 1 back (%d cells changed)" % n)
 cell_auto.print_cell_states()
 print("------------")
 cell_auto.set_gen_limit(3)
@@ -81,27 +73,4 @@ cell_auto.stop()
 print("State after next step again")
 cell_auto.print_cell_states()
 
-# TEST 3
-# Test computation speed when doubling
-# generations limit several times
-print("============")
-cell_auto.reset()
-t = [time()]
-for i in range(4):
-    g = 2**(23+i)
-    print("------------")
-    print("limit:",hex(g))
-    cell_auto.set_gen_limit(g)
-    t[-1] = time()
-    cell_auto.reset()
-    cell_auto.start()
-    ok = False
-    while (not ok):
-        sleep(0.01)
-        cg = cell_auto.read_current_gen()
-        #print(hex(cg))
-        ok = (cg==g)
-    cell_auto.stop()
-    t.append(time())
-    print("time:",t[-1]-t[-2],"s")
-    cell_auto.print_cell_states()
+# Computation speed is measured by benchmark.py
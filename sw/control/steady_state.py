@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Detection of still lifes and oscillations to stop runs early
+# The automaton is run in chunks of generations and a hash of each snapshot
+# is taken: the Checksum Register when the bitstream has it (one read), the
+# CRC-32 of the whole grid otherwise. Repeated hashes are found in a bounded
+# table of recent snapshots and, for cycles longer than the table, by Brent's
+# algorithm. The exact period is then found among divisors of the cycle length
+# and the generation where it starts by binary search from the initial state.
+# The board is finally left in the state the whole run would end in.
+
+import zlib
+from argparse import ArgumentParser
+from collections import OrderedDict
+
+from wishbone         import *
+from cellular_automat import *
+
+# Prime factors of 'n' with repetitions
+def prime_factors(n):
+    f = []
+    q = 2
+    while (q*q<=n):
+        while (n%q==0):
+            f.append(q)
+            n //= q
+        q += 1
+    if (n>1):
+        f.append(n)
+    return f
+
+class steady_state_detector:
+    # 'chunk' generations are run between snapshots, 'table_size' recent hashes are kept.
+    # With 'verify' a detected period is confirmed by comparing whole grids.
+    def __init__(self, cell_auto, chunk=16, table_size=1024, verify=True):
+        self.cell_auto  = cell_auto
+        self.chunk      = chunk
+        self.table_size = table_size
+        self.verify     = verify
+        self.clear()
+
+    def clear(self):
+        self.gen       = 0    # generations since the start of the run
+        self.hw_gens   = 0    # generations computed by the board
+        self.snapshots = 0
+        self.start     = None # first generation of the cycle
+        self.period    = None
+
+    def snapshot(self):
+        self.snapshots += 1
+        if (self.cell_auto.checksum):
+            return self.cell_auto.read_grid_checksum()
+        return zlib.crc32(bytes(flatten_grid(self.cell_auto.read_grid())))
+
+    def advance(self, n):
+        if (n>0):
+            self.cell_auto.run_generations(n)
+            self.gen     += n
+            self.hw_gens += n
+
+    # Return to the initial state of the run
+    def restore(self):
+        if (self.initial is None):
+            self.cell_auto.reset()
+        else:
+            self.cell_auto.write_grid(self.initial)
+        self.gen = 0
+
+    # Length of a cycle of chunks (in generations), None when the run ends first
+    def find_cycle(self, n):
+        h = self.snapshot()
+        table    = OrderedDict([(h,self.gen)])
+        tortoise = (h,self.gen)
+        power = lam = 1
+        while (self.gen+self.chunk<=n):
+            self.advance(self.chunk)
+            h = self.snapshot()
+            if (h in table):
+                return self.gen-table[h]
+            if (h==tortoise[0]):
+                return self.gen-tortoise[1]
+            table[h] = self.gen
+            if (len(table)>self.table_size):
+                table.popitem(last=False)
+            # Brent: the tortoise jumps to the hare at powers of 2
+            if (power==lam):
+                tortoise = (h,self.gen)
+                power *= 2
+                lam = 0
+            lam += 1
+        return None
+
+    # The smallest period dividing 'length', the current state is on the cycle
+    def exact_period(self, length):
+        h = self.snapshot()
+        pos = 0 # generations since the state with hash 'h' (modulo 'length')
+        p = length
+        for q in sorted(set(prime_factors(length))):
+            while (p%q==0):
+                self.advance((p//q-pos)%length)
+                pos = p//q
+                if (self.snapshot()!=h):
+                    break
+                p //= q
+                pos = 0
+        self.advance((-pos)%length)
+        return p
+
+    def confirm(self, p):
+        grid = flatten_grid(self.cell_auto.read_grid())
+        self.advance(p)
+        return flatten_grid(self.cell_auto.read_grid())==grid
+
+    # The first generation whose state repeats after 'p' generations, searched in [0,hi]
+    def find_start(self, p, hi):
+        lo = 0
+        while (lo<hi):
+            mid = (lo+hi)//2
+            self.restore()
+            self.advance(mid)
+            h = self.snapshot()
+            self.advance(p)
+            if (self.snapshot()==h):
+                hi = mid
+            else:
+                lo = mid+1
+        return lo
+
+    # Run 'n' generations from the current state (from the initial state
+    # after reset with 'from_reset'), stopping as soon as the state repeats.
+    # Returns (first generation of the cycle, period), (None,None) without a cycle.
+    def run(self, n, find_start=True, from_reset=False):
+        self.clear()
+        if (from_reset):
+            self.cell_auto.reset()
+        self.cell_auto.stop()
+        self.initial = None
+        if (find_start and not from_reset):
+            self.initial = self.cell_auto.read_grid()
+        while (True):
+            length = self.find_cycle(n)
+            if (length is None):
+                # No repetition before the end of the run
+                self.advance(n-self.gen)
+                return (None,None)
+            known = self.gen-length # generation known to be on the cycle
+            p = self.exact_period(length)
+            if (not self.verify or self.confirm(p)):
+                break
+            print("Hash collision at generation %d, detection continues" % (self.gen))
+        self.period = p
+        if (find_start):
+            self.start = self.find_start(p,known)
+            # Generation equivalent to the end of the run
+            self.restore()
+            self.advance(self.start+(n-self.start)%p)
+        else:
+            self.advance((n-self.gen)%p)
+        return (self.start,self.period)
+
+    def report(self, n):
+        if (self.period is None):
+            print("No steady state within %d generations" % (n))
+        elif (self.period==1):
+            print("Still life from generation %s" % (self.start if (self.start is not None) else "unknown"))
+        else:
+            print("Oscillation with period %d from generation %s" % (self.period,self.start if (self.start is not None) else "unknown"))
+        print("Generations requested: %d, computed by the board: %d, snapshots: %d" % (n,self.hw_gens,self.snapshots))
+
+if __name__ == '__main__':
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("--port",default="COM4",help="Target device serial port name (default: COM4)")
+    parser.add_argument("--emulate",nargs=2,metavar=("CAS","TAB"),help="Use the emulator loaded with given '.cas' and '.tab' files instead of a device")
+    parser.add_argument("--baudrate",type=int,default=9600,help="UART baud rate (default: 9600)")
+    parser.add_argument("--gens",type=int,default=2**26,help="Number of generations of the run (default: 2**26)")
+    parser.add_argument("--chunk",type=int,default=16,help="Generations between snapshots (default: 16)")
+    parser.add_argument("--table_size",type=int,default=1024,help="Number of recent snapshot hashes kept (default: 1024)")
+    parser.add_argument("--no_start",action="store_true",help="Do not search for the first generation of the cycle")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    gen_cycles = None
+    if (args.emulate):
+        from fpga_emulator import fpga_emulator
+        emu = fpga_emulator(args.emulate[0],args.emulate[1],baudrate=args.baudrate)
+        if (emu.error!=0):
+            exit(emu.error)
+        gen_cycles = emu.gen_cycles
+        wb = wishbone(emu)
+    else:
+        wb = wishbone(args.port,args.baudrate)
+
+    cell_auto = cellular_automat(wb,0x8000,gen_cycles=gen_cycles)
+    detector = steady_state_detector(cell_auto,args.chunk,args.table_size)
+    detector.run(args.gens,not args.no_start,from_reset=True)
+    detector.report(args.gens)
+    cell_auto.print_cell_states()
+
+    wb.close()
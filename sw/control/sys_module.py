@@ -11,8 +11,11 @@ class sys_module:
     def __init__(self, wishbone):
         self.wb = wishbone
 
+    def read_version(self):
+        return self.wb.read_static(0x0000)
+
     def report(self):
-        version_reg = self.wb.read(0x0000)
+        version_reg = self.read_version()
         debug_reg   = self.wb.read(0x0004)
 
         print("========================================")
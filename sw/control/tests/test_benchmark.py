@@ -0,0 +1,70 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+
+import json
+import os
+
+import pytest
+
+from fpga_emulator    import fpga_emulator
+from wishbone         import wishbone
+from cellular_automat import cellular_automat
+from benchmark        import benchmark, summarize, compare
+
+config = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","config")
+cas = os.path.join(config,"glider_init.cas")
+tab = os.path.join(config,"glider_trans.tab")
+
+def test_summarize():
+    m = summarize([10,1,9,2,8,3,7,4,6,5],"s")
+    assert m["n"]==10 and m["min"]==1 and m["max"]==10
+    assert m["mean"]==pytest.approx(5.5)
+    assert m["p50"]==pytest.approx(5.5)
+    assert m["p90"]==pytest.approx(9.1)
+    assert m["p99"]==pytest.approx(9.91)
+    assert m["variance"]==pytest.approx(m["stdev"]**2)
+    assert not m["higher_is_better"]
+
+def test_summarize_single_sample():
+    m = summarize([2.5],"gen/s",True)
+    assert m["mean"]==m["min"]==m["p50"]==m["p99"]==m["max"]==2.5
+    assert m["stdev"]==0.0 and m["variance"]==0.0
+    assert m["higher_is_better"]
+
+def test_compare():
+    baseline = {
+        "latency" : summarize([1.0],"s"),
+        "speed"   : summarize([100.0],"gen/s",True),
+        "upload"  : summarize([2.0],"s"),
+        "removed" : summarize([1.0],"s"),
+    }
+    metrics = {
+        "latency" : summarize([1.2],"s"),          # 20 % slower
+        "speed"   : summarize([80.0],"gen/s",True), # 20 % fewer generations
+        "upload"  : summarize([2.1],"s"),          # within the tolerance
+        "added"   : summarize([5.0],"s"),          # not in the baseline
+    }
+    assert compare(metrics,baseline,0.1)==["latency","speed"]
+    assert compare(metrics,baseline,0.25)==[]
+    # Improvements are never regressions
+    assert compare(baseline,metrics,0.1)==[]
+
+def test_benchmark_against_itself(tmp_path):
+    emu = fpga_emulator(cas,tab,baudrate=0)
+    wb = wishbone(emu)
+    bench = benchmark(wb,cellular_automat(wb,0x8000,gen_cycles=emu.gen_cycles))
+    bench.bench_latency(5)
+    bench.bench_grid(2)
+    bench.bench_speed([2**12,2**14],2)
+    assert {"uart_read_latency","uart_write_latency","grid_readback_time","grid_upload_time",
+            "gen_per_s_limit_4096","gen_per_s_limit_16384","gen_per_s_fit","run_overhead"}<=set(bench.metrics)
+    assert bench.metrics["gen_per_s_limit_4096"]["n"]==2
+    # Stored results compare without regressions with themselves
+    path = tmp_path/"baseline.json"
+    path.write_text(json.dumps({"metrics":bench.metrics}))
+    assert compare(bench.metrics,json.loads(path.read_text())["metrics"],0.0)==[]
+    wb.close()
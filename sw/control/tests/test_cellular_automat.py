@@ -0,0 +1,90 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+
+import os
+
+import numpy as np
+import pytest
+
+from fpga_emulator    import fpga_emulator
+from wishbone         import wishbone
+from cellular_automat import *
+
+config = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","config")
+
+def make_automat(packed_window=False, checksum=False, **kwargs):
+    emu = fpga_emulator(os.path.join(config,"glider_init.cas"),os.path.join(config,"glider_trans.tab"),baudrate=0,packed_window=packed_window,checksum=checksum)
+    return cellular_automat(wishbone(emu),0x8000,gen_cycles=emu.gen_cycles,**kwargs)
+
+def test_cache_is_opt_in():
+    cell_auto = make_automat()
+    cell_auto.stop()
+    cell_auto.read_grid()
+    cell_auto.read_grid()
+    assert cell_auto.shadow is None
+    assert (cell_auto.cache_hits,cell_auto.cache_misses)==(0,0)
+
+def test_shadow_without_cache():
+    # The shadow copy alone keeps the original behaviour: valid from the first read
+    cell_auto = make_automat(shadow=True)
+    grid = cell_auto.read_grid()
+    assert cell_auto.shadow is not None
+    grid = np.asarray(grid).copy()
+    grid[0][0] ^= 1
+    assert cell_auto.sync_grid(grid)==1
+    assert cell_auto.cache_hits==0
+
+def test_cache_hits_and_invalidation():
+    cell_auto = make_automat(cache=True)
+    cell_auto.read_grid()
+    assert cell_auto.cache_misses==1 # running state unknown
+    cell_auto.stop()
+    first = cell_auto.read_grid()
+    assert np.array_equal(cell_auto.read_grid(),first)
+    assert cell_auto.read_cell_state((1,0))==first[0][1]
+    assert cell_auto.cache_hits==2
+    cell_auto.run_generations(4)
+    after = cell_auto.read_grid()
+    assert cell_auto.cache_hits==2
+    cell_auto.use_cache = False
+    assert np.array_equal(cell_auto.read_grid(),after)
+
+def test_cell_read_fills_cache():
+    cell_auto = make_automat(cache=True)
+    cell_auto.stop()
+    transfers = []
+    transfer_raw = cell_auto.wb.transfer_raw
+    def counted(reqs):
+        transfers.append(len(reqs))
+        return transfer_raw(reqs)
+    cell_auto.wb.transfer_raw = counted
+    first = cell_auto.read_cell_state((1,0))
+    assert transfers and cell_auto.shadow is not None
+    n = len(transfers)
+    assert cell_auto.read_cell_state((1,0))==first
+    assert cell_auto.read_cell_state((2,1))==cell_auto.shadow[2+cell_auto.grid_size[0]]
+    assert len(transfers)==n
+    assert (cell_auto.cache_hits,cell_auto.cache_misses)==(2,1)
+
+@pytest.mark.parametrize("packed_window,checksum",[(False,False),(True,False),(False,True),(True,True)])
+def test_optional_features(packed_window, checksum):
+    cell_auto = make_automat(packed_window,checksum)
+    assert (cell_auto.packed is not None)==packed_window
+    assert cell_auto.checksum==checksum
+    plain = make_automat()
+    cell_auto.reset()
+    plain.reset()
+    cell_auto.run_generations(3)
+    plain.run_generations(3)
+    grid = cell_auto.read_grid()
+    assert np.array_equal(grid,plain.read_grid())
+    if (checksum):
+        assert cell_auto.read_grid_checksum()==grid_checksum(grid,cell_auto.state_w)
+        assert cell_auto.verify_grid(grid)
+    else:
+        with pytest.raises(IOError):
+            cell_auto.read_grid_checksum()
@@ -0,0 +1,49 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# The CRC-32 datapath of the automaton (CHECKSUM generic) simulated with GHDL
+# and compared with grid_checksum. The configuration package in the repository
+# is generated from glider_init.cas and glider_trans.tab.
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from fpga_emulator    import fpga_emulator
+from cellular_automat import grid_checksum
+
+ghdl = shutil.which("ghdl")
+pytestmark = pytest.mark.skipif(ghdl is None,reason="GHDL is not installed")
+
+root   = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","..")
+config = os.path.join(root,"sw","config")
+comp   = os.path.join(root,"rtl","comp","cellular_automaton")
+sources = [os.path.join(comp,f) for f in ["cellular_automaton_config_pkg.vhd","cell.vhd","cellular_automaton.vhd",os.path.join("sim","checksum_tb.vhd")]]
+
+def signed32(v):
+    return v-2**32 if (v>=2**31) else v
+
+def test_checksum_rtl(tmp_path):
+    engine = fpga_emulator(os.path.join(config,"glider_init.cas"),os.path.join(config,"glider_trans.tab"),baudrate=0).engine
+    grid = engine.grid.copy()
+    init = grid_checksum(grid,engine.state_w)
+    grid.ravel()[[0,13]] = 2
+    written = grid_checksum(grid,engine.state_w)
+    for i in range(4):
+        grid = engine.next_state(grid)
+    run = grid_checksum(grid,engine.state_w)
+    assert len(set([init,written,run]))==3
+
+    opts = ["--std=08","--workdir="+str(tmp_path)]
+    subprocess.run([ghdl,"-a"]+opts+sources,cwd=tmp_path,check=True)
+    subprocess.run([ghdl,"-e"]+opts+["CHECKSUM_TB"],cwd=tmp_path,check=True)
+    generics = ["-gINIT_CRC=%d" % signed32(init),"-gWRITTEN_CRC=%d" % signed32(written),"-gRUN_CRC=%d" % signed32(run),
+                "-gWRITE_CELL_0=0","-gWRITE_CELL_1=13","-gWRITE_VALUE=2","-gRUN_GENS=4"]
+    sim = subprocess.run([ghdl,"-r"]+opts+["CHECKSUM_TB"]+generics+["--stop-time=1ms"],cwd=tmp_path,capture_output=True,text=True)
+    assert sim.returncode==0, sim.stdout+sim.stderr
+    assert "CHECKSUM_TB passed" in sim.stdout+sim.stderr
@@ -0,0 +1,91 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+
+import os
+import threading
+from time import sleep
+
+import numpy as np
+import pytest
+
+from fpga_emulator import fpga_emulator
+from device_pool   import device_pool, known_versions
+from wishbone      import sys_version
+
+config = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","config")
+cas = os.path.join(config,"glider_init.cas")
+tab = os.path.join(config,"glider_trans.tab")
+
+def make_pool(n):
+    ports = [fpga_emulator(cas,tab,baudrate=0) for i in range(n)]
+    return device_pool(ports,gen_cycles=ports[0].gen_cycles)
+
+def test_known_versions():
+    assert sys_version in known_versions
+
+def test_unexpected_error_is_retried():
+    pool = make_pool(2)
+    cols, rows = pool.boards[0].grid_size
+    state = np.zeros((rows,cols),dtype=np.uint8)
+    expect = pool.map([state],4)[0]
+    # The first board fails with an error which is not an IOError
+    bad = pool.boards[0]
+    run = bad.run
+    def broken(job):
+        bad.run = run
+        raise ValueError("broken response")
+    bad.run = broken
+    grids = pool.map([state]*4,4)
+    assert all(np.array_equal(g,expect) for g in grids)
+    assert bad.failures+pool.boards[1].failures<=1
+    pool.close()
+
+def test_failure_resolves_future():
+    pool = make_pool(1)
+    pool.max_failures = 1
+    cols, rows = pool.boards[0].grid_size
+    def broken(job):
+        raise ValueError("broken response")
+    pool.boards[0].run = broken
+    f = pool.submit(np.zeros((rows,cols),dtype=np.uint8),1)
+    with pytest.raises(ValueError):
+        f.result(timeout=5)
+    pool.close()
+
+def test_removed_board_runs_no_jobs():
+    pool = make_pool(2)
+    pool.max_failures = 1
+    cols, rows = pool.boards[0].grid_size
+    bad, good = pool.boards
+    failed = threading.Event()
+    calls = []
+    def broken(job):
+        calls.append(job)
+        failed.set()
+        raise ValueError("broken response")
+    run = good.run
+    def delayed(job):
+        # Give the removed board time to take more jobs
+        failed.wait(5)
+        sleep(0.05)
+        return run(job)
+    bad.run   = broken
+    bad.flush = lambda: None
+    good.run  = delayed
+    grids = pool.map([np.zeros((rows,cols),dtype=np.uint8)]*8,4)
+    assert len(grids)==8
+    assert len(calls)==1
+    assert not bad.healthy and good.jobs==8
+    pool.close()
+
+def test_unusable_port_is_skipped(tmp_path):
+    emu = fpga_emulator(cas,tab,baudrate=0)
+    pool = device_pool([str(tmp_path/"no_such_port"),emu],gen_cycles=emu.gen_cycles)
+    assert len(pool.boards)==1 and pool.boards[0].wb.uart is emu
+    cols, rows = pool.boards[0].grid_size
+    assert len(pool.map([np.zeros((rows,cols),dtype=np.uint8)],2))==1
+    pool.close()
@@ -0,0 +1,87 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+
+import os
+
+import numpy as np
+import pytest
+
+from frame_capture import *
+
+def random_frames(n, shape=(6,9), seed=0):
+    rng = np.random.default_rng(seed)
+    grid = rng.integers(0,4,shape,dtype=np.uint8)
+    frames = []
+    for k in range(n):
+        # Few cells change between frames, as in a run
+        idx = rng.integers(0,grid.size,3)
+        grid = grid.copy()
+        grid.ravel()[idx] = rng.integers(0,4,3)
+        frames.append((3*k,0.5*k,grid))
+    return frames
+
+def record(path, frames, key_interval=4):
+    rec = frame_recorder(path,frames[0][2].shape[0],frames[0][2].shape[1],2,key_interval)
+    for frame in frames:
+        rec.write(*frame)
+    return rec
+
+def assert_frames(got, expect):
+    got = list(got)
+    assert len(got)==len(expect)
+    for (g,t,grid),(eg,et,egrid) in zip(got,expect):
+        assert (g,t)==(eg,et)
+        assert np.array_equal(grid,egrid)
+
+@pytest.mark.parametrize("values",[[],[0],[1,1,1],[0,1,1,2,2,2,0]])
+def test_rle_round_trip(values):
+    assert rle_decode(rle_encode(values)).tolist()==values
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path/"run.caf")
+    frames = random_frames(19)
+    record(path,frames).close()
+    reader = frame_reader(path)
+    assert (reader.rows,reader.cols,reader.state_w)==(6,9,2)
+    assert [k[0] for k in reader.index]==[0,4,8,12,16]
+    assert_frames(reader,frames)
+    reader.close()
+
+def test_seek(tmp_path):
+    path = str(tmp_path/"run.caf")
+    frames = random_frames(19)
+    record(path,frames).close()
+    reader = frame_reader(path)
+    # Exact generation, between two frames, before the first and after the last
+    assert_frames(reader.seek(30),frames[10:])
+    assert_frames(reader.seek(31),frames[10:])
+    assert_frames(reader.seek(1000),frames[-1:])
+    frames_from_start = list(reader.seek(0))
+    assert_frames(frames_from_start,frames)
+    reader.close()
+
+@pytest.mark.parametrize("cut",[1,7,caf_frame.size+2])
+def test_truncated_recording(tmp_path, cut):
+    # Interrupted recording: no index, the last frame incomplete
+    path = str(tmp_path/"run.caf")
+    frames = random_frames(11)
+    rec = record(path,frames)
+    rec.f.close()
+    size = os.path.getsize(path)
+    with open(path,"r+b") as f:
+        f.truncate(size-cut)
+    reader = frame_reader(path)
+    assert [k[0] for k in reader.index]==[0,4,8]
+    assert_frames(reader,frames[:-1])
+    assert_frames(reader.seek(24),frames[8:-1])
+    reader.close()
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path/"bad.caf"
+    path.write_bytes(b"CAF0"+bytes(20))
+    with pytest.raises(ValueError):
+        frame_reader(str(path))
@@ -0,0 +1,90 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# The detector compared with a brute force search of the first repeated state
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from fpga_emulator    import fpga_emulator
+from wishbone         import wishbone
+from cellular_automat import *
+from steady_state     import steady_state_detector, prime_factors
+
+config = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","config")
+sys.path.insert(0,config)
+
+from cell_auto_engine import cell_auto_engine
+
+tab = os.path.join(config,"game_of_life.tab")
+
+# (first generation of the cycle, period, state after 'n' generations)
+def brute_force(cas, n):
+    engine = cell_auto_engine(tab,cas)
+    seen = {}
+    grids = []
+    while (True):
+        key = engine.grid.tobytes()
+        if (key in seen):
+            start = seen[key]
+            period = len(grids)-start
+            break
+        seen[key] = len(grids)
+        grids.append(engine.grid.copy())
+        engine.step(1)
+    if (n<start+period):
+        return start,period,grids[n]
+    return start,period,grids[start+(n-start)%period]
+
+def make_automat(cas, checksum):
+    emu = fpga_emulator(cas,tab,baudrate=0,checksum=checksum)
+    return cellular_automat(wishbone(emu),0x8000,gen_cycles=emu.gen_cycles)
+
+def random_cas(path, seed):
+    grid = np.random.default_rng(seed).integers(0,2,(8,10),dtype=np.uint8)
+    np.savetxt(path,grid,fmt="%d")
+    return path
+
+@pytest.mark.parametrize("n",[1,2,3,4,6,12,30,48,60,64])
+def test_prime_factors(n):
+    f = prime_factors(n)
+    assert int(np.prod(f))==n
+    assert f==sorted(f)
+
+# Still lifes and oscillations with periods 2, 6 and 160
+@pytest.mark.parametrize("seed",[0,1,3,6,11,14,16,35])
+@pytest.mark.parametrize("chunk,table_size",[(1,1024),(3,2),(16,1024)])
+def test_detector(tmp_path, seed, chunk, table_size):
+    cas = random_cas(str(tmp_path/"init.cas"),seed)
+    # Long enough for Brent's algorithm to close the longest cycle with the small table
+    n = 2000
+    start, period, final = brute_force(cas,n)
+    cell_auto = make_automat(cas,checksum=(seed%2==1))
+    detector = steady_state_detector(cell_auto,chunk=chunk,table_size=table_size)
+    assert detector.run(n,from_reset=True)==(start,period)
+    assert np.array_equal(np.array(cell_auto.read_grid(),dtype=np.uint8),final)
+
+def test_detector_from_current_state(tmp_path):
+    cas = random_cas(str(tmp_path/"init.cas"),11)
+    start, period, final = brute_force(cas,500)
+    assert period==6
+    cell_auto = make_automat(cas,checksum=False)
+    detector = steady_state_detector(cell_auto,chunk=5)
+    assert detector.run(500,find_start=False)==(None,period)
+    assert np.array_equal(np.array(cell_auto.read_grid(),dtype=np.uint8),final)
+
+def test_no_steady_state_in_short_run(tmp_path):
+    # The glider on a torus repeats only after it crosses the whole grid
+    cas = os.path.join(config,"game_of_life.cas")
+    start, period, final = brute_force(cas,9)
+    assert start+period>9
+    cell_auto = make_automat(cas,checksum=False)
+    detector = steady_state_detector(cell_auto,chunk=2)
+    assert detector.run(9,from_reset=True)==(None,None)
+    assert np.array_equal(np.array(cell_auto.read_grid(),dtype=np.uint8),final)
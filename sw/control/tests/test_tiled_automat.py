@@ -0,0 +1,62 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Tiled computation on the emulator compared with the software model of the whole field
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from fpga_emulator    import fpga_emulator
+from wishbone         import wishbone
+from cellular_automat import *
+from tiled_automat    import tiled_automat, tile_origins
+
+config = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","config")
+sys.path.insert(0,config)
+
+from cell_auto_engine import cell_auto_engine
+
+tab = os.path.join(config,"game_of_life.tab")
+
+# FPGA grid of 8x10 cells
+def make_automat(tmp_path, shadow=True):
+    cas = str(tmp_path/"fabric.cas")
+    np.savetxt(cas,np.zeros((8,10),dtype=np.uint8),fmt="%d")
+    emu = fpga_emulator(cas,tab,baudrate=0)
+    cell_auto = cellular_automat(wishbone(emu),0x8000,shadow=shadow,gen_cycles=emu.gen_cycles)
+    cell_auto.reset()
+    return cell_auto
+
+def test_tile_origins():
+    assert tile_origins(8,10)==[0]
+    assert tile_origins(12,6)==[0,6]
+    assert tile_origins(13,6)==[0,6,7]
+
+# Field shapes give 1, 4, 9 and up to 70 tiles
+@pytest.mark.parametrize("shape,halo",[((8,10),0),((12,16),1),((13,17),1),((15,20),2),((20,25),2),((20,25),3)])
+def test_tiled_matches_engine(tmp_path, shape, halo):
+    field = np.random.default_rng(sum(shape)+halo).integers(0,2,shape,dtype=np.uint8)
+    tiled = tiled_automat(make_automat(tmp_path),field,halo,baudrate=0)
+    reference = cell_auto_engine(tab)
+    reference.set_state(field)
+    # Not a multiple of the halo, the last swap is shorter
+    for n in (7,3):
+        tiled.step(n)
+        reference.step(n)
+        assert np.array_equal(tiled.field,reference.grid)
+    assert tiled.gen==10
+
+def test_chosen_halo(tmp_path):
+    tiled = tiled_automat(make_automat(tmp_path),np.zeros((20,25),dtype=np.uint8),baudrate=115200)
+    assert 1<=tiled.halo<=3
+    assert tiled.cost(tiled.halo)==min(tiled.cost(h) for h in range(1,4))
+
+def test_shadow_required(tmp_path):
+    with pytest.raises(ValueError):
+        tiled_automat(make_automat(tmp_path,shadow=False),np.zeros((20,25),dtype=np.uint8),1,baudrate=0)
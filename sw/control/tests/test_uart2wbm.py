@@ -0,0 +1,261 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Framing of the UART2WBM protocol checked against a model of its RX/TX FSM
+# (rtl/comp/uart2wbm/uart2wbm.vhd). The model takes one received byte at a
+# time exactly as the FSM states do and answers Wishbone requests from a dict.
+
+import asyncio
+import os
+import random
+from struct import Struct
+
+import pytest
+
+from async_wishbone import async_wishbone
+from fpga_emulator import fpga_emulator
+from wishbone import *
+
+config = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","config")
+
+class uart2wbm_fsm:
+    def __init__(self, mem=None):
+        self.mem   = mem if (mem is not None) else {}
+        self.state = "cmd"
+        self.tx    = bytearray()
+        self.rx    = bytearray()
+        self.name  = "uart2wbm_fsm"
+        self.log   = [] # Wishbone requests (we, addr, data)
+
+    # Wishbone request of the 'request'/'wait4ack' states
+    def request(self):
+        we = self.cmd&0x1
+        if (we):
+            self.mem[self.addr] = self.dout
+            self.log.append((1,self.addr,self.dout))
+        else:
+            self.din = self.mem.get(self.addr,0xDEADCAFE)
+            self.log.append((0,self.addr,self.din))
+        if (we and self.cnt!=0):
+            # next word of burst write
+            self.cnt -= 1
+            self.addr = (self.addr+1)&0xFFFF
+            self.state = "dout0"
+            return
+        if (self.echo):
+            self.tx.append(self.cmd)
+            self.echo = False
+            if (we):
+                self.state = "cmd"
+                return
+        # din0-din3, then the next word of burst read
+        while (True):
+            self.tx += self.din.to_bytes(4,"little")
+            if (self.cnt==0):
+                break
+            self.cnt -= 1
+            self.addr = (self.addr+1)&0xFFFF
+            self.din = self.mem.get(self.addr,0xDEADCAFE)
+            self.log.append((0,self.addr,self.din))
+        self.state = "cmd"
+
+    def receive(self, byte):
+        s = self.state
+        if (s=="cmd"):
+            self.cmd  = byte
+            self.cnt  = 0
+            self.echo = True
+            self.state = "addr_low"
+        elif (s=="addr_low"):
+            self.addr = byte
+            self.state = "addr_high"
+        elif (s=="addr_high"):
+            self.addr |= byte<<8
+            if (self.cmd&0x2):
+                self.state = "burst_len"
+            elif (self.cmd&0x1):
+                self.state = "dout0"
+            else:
+                self.request()
+        elif (s=="burst_len"):
+            self.cnt = byte
+            if (self.cmd&0x1):
+                self.state = "dout0"
+            else:
+                self.request()
+        else:
+            k = int(s[4])
+            self.dout = byte if (k==0) else self.dout|(byte<<(8*k))
+            if (k<3):
+                self.state = "dout%d" % (k+1)
+            else:
+                self.request()
+
+    # Serial-port-like interface for 'wishbone'
+    def write(self, data):
+        for b in data:
+            self.receive(b)
+        return len(data)
+
+    def read(self, size=1):
+        data = bytes(self.tx[:size])
+        del self.tx[:size]
+        return data
+
+    def close(self):
+        pass
+
+def feed(model, stream, rng):
+    # Bytes arrive in chunks of random size, frames are split anywhere
+    i = 0
+    while (i<len(stream)):
+        n = rng.randint(1,9)
+        model.write(stream[i:i+n])
+        i += n
+
+def test_single_read_write():
+    model = uart2wbm_fsm({0x8001:0x1234})
+    model.write(read_cmd.pack(0x0,0x8001))
+    assert model.read(5)==read_resp.pack(0x0,0x1234)
+    model.write(write_cmd.pack(0x1,0x8001,0xCAFE))
+    assert model.read(5)==b"\x01"
+    assert model.mem[0x8001]==0xCAFE
+    assert model.state=="cmd"
+
+def test_burst_read():
+    mem = {0xC000+i:i*3 for i in range(10)}
+    model = uart2wbm_fsm(mem)
+    model.write(burst_cmd.pack(0x2,0xC000,9))
+    resp = model.read(100)
+    assert len(resp)==resp_len(burst_cmd.pack(0x2,0xC000,9))==1+4*10
+    assert resp[0]==0x2
+    assert decode_bursts([resp])==[i*3 for i in range(10)]
+
+def test_burst_write_split_across_reads():
+    rng = random.Random(1)
+    values = [rng.getrandbits(32) for i in range(37)]
+    (req, rlen), = burst_write_reqs(0xC010,values)
+    assert frame_len(req)==len(req)==4+4*37
+    model = uart2wbm_fsm()
+    for i in range(len(req)):
+        # nothing is answered before the last byte of the last word
+        assert model.read(1)==b""
+        model.write(req[i:i+1])
+    assert rlen==1
+    assert model.read(10)==b"\x03"
+    assert [model.mem[0xC010+i] for i in range(37)]==values
+    assert model.log==[(1,0xC010+i,v) for i,v in enumerate(values)]
+
+def test_max_burst_length():
+    values = list(range(max_burst+1))
+    reqs = burst_write_reqs(0x0100,values)
+    assert [frame_len(r) for r,l in reqs]==[4+4*max_burst,4+4]
+    model = uart2wbm_fsm()
+    for r,l in reqs:
+        model.write(r)
+    assert model.read(10)==b"\x03\x03"
+    reads = burst_read_reqs(0x0100,max_burst+1)
+    for r,l in reads:
+        model.write(r)
+    resps = [model.read(l) for r,l in reads]
+    assert decode_bursts(resps)==values
+
+def test_pipelined_frames():
+    rng = random.Random(2)
+    mem = {a:rng.getrandbits(32) for a in range(0x40)}
+    model = uart2wbm_fsm(dict(mem))
+    reqs = []
+    expect = []
+    for k in range(200):
+        kind = rng.randrange(4)
+        addr = rng.randrange(0x40)
+        if (kind==0):
+            reqs.append(read_cmd.pack(0x0,addr))
+            expect.append(read_resp.pack(0x0,mem[addr]))
+        elif (kind==1):
+            v = rng.getrandbits(32)
+            reqs.append(write_cmd.pack(0x1,addr,v))
+            mem[addr] = v
+            expect.append(b"\x01")
+        elif (kind==2):
+            n = rng.randint(1,8)
+            reqs.append(burst_cmd.pack(0x2,addr,n-1))
+            expect.append(bytes([0x2])+b"".join(mem.get(addr+i,0xDEADCAFE).to_bytes(4,"little") for i in range(n)))
+        else:
+            vals = [rng.getrandbits(32) for i in range(rng.randint(1,8))]
+            (r, l), = burst_write_reqs(addr,vals)
+            reqs.append(r)
+            for i,v in enumerate(vals):
+                mem[addr+i] = v
+            expect.append(b"\x03")
+    # The host splits the stream by frame_len and the responses by resp_len
+    stream = b"".join(reqs)
+    frames = []
+    i = 0
+    while (i<len(stream)):
+        n = frame_len(stream[i:i+4])
+        frames.append(stream[i:i+n])
+        i += n
+    assert frames==reqs
+    feed(model,stream,rng)
+    assert model.state=="cmd"
+    for r,e in zip(reqs,expect):
+        assert resp_len(r)==len(e)
+        assert model.read(len(e))==e
+    assert model.read(1)==b""
+
+def test_wishbone_over_model():
+    model = uart2wbm_fsm()
+    wb = wishbone(model,window=64)
+    wb.write_multi(range(16),range(100,116))
+    assert wb.read_multi(range(16))==list(range(100,116))
+    wb.write_burst(0xC000,list(range(600)))
+    assert wb.read_burst(0xC000,600)==list(range(600))
+    for a in range(4):
+        wb.queue_read(0xC000+a)
+        wb.queue_write(0xC100+a,a)
+    assert wb.flush()==[0,None,1,None,2,None,3,None]
+
+def make_emulator(version):
+    return fpga_emulator(os.path.join(config,"glider_init.cas"),os.path.join(config,"glider_trans.tab"),baudrate=1000000,timeout=0.2,version=version)
+
+def test_emulator_without_rx_fifo():
+    # UART2WBM of the original bitstream loses requests sent during a response
+    emu = make_emulator(base_version)
+    assert emu.fifo_size==0
+    with pytest.raises(IOError):
+        wishbone(emu,window=256).read_multi([0x8003]*20)
+    assert emu.dropped>0
+    emu = make_emulator(base_version)
+    assert wishbone(emu,window=0).read_multi([0x8003]*20)==[8]*20
+    assert emu.dropped==0
+
+def test_emulator_with_rx_fifo():
+    emu = make_emulator(burst_version)
+    wb = wishbone(emu,window=256)
+    assert wb.read_multi([0x8003]*20)==[8]*20
+    assert wb.read_burst(0x8003,2)==[8,12]
+    assert emu.dropped==0
+
+@pytest.mark.parametrize("version,window",[(base_version,0),(burst_version,default_window)])
+def test_window_follows_version(version, window):
+    emu = make_emulator(version)
+    wb = wishbone(emu)
+    assert wb.read_multi([0x8003,0x8004]*10)==[8,12]*10
+    assert wb.window==window
+    assert wb.read_static(0x0000)==version
+    assert emu.dropped==0
+
+def test_async_late_response_discarded():
+    async def run():
+        emu = fpga_emulator(os.path.join(config,"glider_init.cas"),os.path.join(config,"glider_trans.tab"),baudrate=9600)
+        wb = async_wishbone(emu,window=0,timeout=0.004)
+        # The response needs about 8 ms at 9600 Bd
+        with pytest.raises(IOError):
+            await wb.read(0x8003)
+        wb.timeout = 1
+        assert await wb.read(0x8004)==12
+    asyncio.run(run())
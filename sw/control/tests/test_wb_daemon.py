@@ -0,0 +1,156 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+
+import os
+import socket
+import threading
+
+import pytest
+
+from fpga_emulator    import fpga_emulator
+from wishbone         import *
+from wb_daemon        import wb_daemon, daemon_client
+from cellular_automat import cellular_automat
+
+config = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","config")
+
+@pytest.fixture
+def daemon(tmp_path):
+    emu = fpga_emulator(os.path.join(config,"glider_init.cas"),os.path.join(config,"glider_trans.tab"),baudrate=0)
+    d = wb_daemon(wishbone(emu),str(tmp_path/"wb.sock"))
+    t = threading.Thread(target=d.serve,daemon=True)
+    t.start()
+    yield d
+    d.running = False
+    t.join()
+    d.close()
+
+def client(daemon):
+    return wishbone("unix:"+daemon.path)
+
+def test_parse_split_requests():
+    a, b = socket.socketpair()
+    c = daemon_client(a,"test")
+    reqs = [read_cmd.pack(0x0,0x8002),write_cmd.pack(0x1,0x8001,7)]+[r for r,l in burst_write_reqs(0xC000,[1,2,3])]+[r for r,l in burst_read_reqs(0xC000,3)]
+    stream = b"".join(reqs)
+    for i in range(len(stream)):
+        c.rx += stream[i:i+1]
+        c.parse()
+    assert c.reqs==reqs
+    assert [resp_len(r) for r in c.reqs]==[5,1,1,13]
+    a.close()
+    b.close()
+
+def test_clients_share_the_board(daemon):
+    wbs = [client(daemon) for i in range(3)]
+    cas = [cellular_automat(wb,0x8000) for wb in wbs]
+    cas[0].stop()
+    grid = cas[0].read_grid()
+    for ca in cas[1:]:
+        assert (ca.read_grid()==grid).all()
+    assert daemon.cache_hits>0
+    for wb in wbs:
+        wb.close()
+
+def test_bus_error_is_retried(daemon):
+    wb = client(daemon)
+    transfer_raw = daemon.wb.transfer_raw
+    fails = [1]
+    def flaky(batch):
+        if (fails[0]):
+            fails[0] -= 1
+            raise IOError("test timeout")
+        return transfer_raw(batch)
+    daemon.wb.transfer_raw = flaky
+    assert wb.read(0x0000)==sys_version
+    assert daemon.bus_errors==1
+    wb.close()
+
+def test_bus_error_keeps_connection(daemon):
+    wb = client(daemon)
+    other = client(daemon)
+    transfer_raw = daemon.wb.transfer_raw
+    fails = [2]
+    def flaky(batch):
+        if (fails[0]):
+            fails[0] -= 1
+            raise IOError("test timeout")
+        return transfer_raw(batch)
+    daemon.wb.transfer_raw = flaky
+    with pytest.raises(IOError):
+        wb.read_multi([0x8002]*20)
+    # Both connections keep working
+    assert wb.read(0x0000)==sys_version
+    assert other.read(0x0000)==sys_version
+    assert len(daemon.clients)==2
+    wb.close()
+    other.close()
+
+def test_static_cache_kept_for_new_clients(daemon):
+    wb = client(daemon)
+    size = wb.read(0x8003)
+    assert wb.read(0x0000)==sys_version
+    wb.close()
+    hits = daemon.cache_hits
+    other = client(daemon)
+    assert other.read(0x0000)==sys_version
+    assert other.read(0x8003)==size
+    assert daemon.cache_hits==hits+2
+    other.close()
+
+def test_static_cache_follows_version(daemon):
+    wb = client(daemon)
+    size = wb.read(0x8003)
+    assert 0x8003 in daemon.cache
+    # Another bitstream is found by the version read after a bus error
+    daemon.wb.uart.sys_module.version = sys_version+1
+    transfer_raw = daemon.wb.transfer_raw
+    fails = [1]
+    def flaky(batch):
+        if (fails[0]):
+            fails[0] -= 1
+            raise IOError("test timeout")
+        return transfer_raw(batch)
+    daemon.wb.transfer_raw = flaky
+    assert wb.read(0x8002)==0
+    assert 0x8003 not in daemon.cache
+    assert daemon.version==read_resp.pack(0x0,sys_version+1)
+    assert wb.read(0x0000)==sys_version+1
+    assert wb.read(0x8003)==size
+    wb.close()
+
+def test_retry_only_unanswered_reads(daemon):
+    wb = client(daemon)
+    wb.write(0x0004,0x1234)
+    transfer_raw = daemon.wb.transfer_raw
+    calls = []
+    def flaky(batch):
+        calls.append(len(batch))
+        if (len(calls)==1):
+            raise wb_error("test timeout",transfer_raw(batch[:2]))
+        return transfer_raw(batch)
+    daemon.wb.transfer_raw = flaky
+    assert wb.read_multi([0x0004]*4)==[0x1234]*4
+    assert calls==[4,2]
+    wb.close()
+
+def test_writes_are_not_replayed(daemon):
+    wb = client(daemon)
+    transfer_raw = daemon.wb.transfer_raw
+    calls = []
+    def flaky(batch):
+        calls.append(len(batch))
+        if (len(calls)==1):
+            raise wb_error("test timeout",transfer_raw(batch[:1]))
+        return transfer_raw(batch)
+    daemon.wb.transfer_raw = flaky
+    with pytest.raises(IOError):
+        wb.transfer([(0x0004,1),(0x0004,None),(0x0004,2),(0x0004,None)])
+    assert calls==[4]
+    # The connection keeps working
+    assert wb.read(0x0004)==1
+    wb.close()
@@ -0,0 +1,104 @@
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+
+import json
+import os
+
+import pytest
+
+from fpga_emulator import fpga_emulator
+from wishbone      import wishbone, read_cmd, write_cmd, burst_cmd
+from wb_tracer     import *
+
+config = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","config")
+cas = os.path.join(config,"glider_init.cas")
+tab = os.path.join(config,"glider_trans.tab")
+
+def read_req(addr):
+    return read_cmd.pack(0x0,addr)
+
+def test_regions():
+    tracer = wb_tracer()
+    assert [tracer.region(a) for a in (0x0000,0x7FFF,0x8003,0xA000,0xBFFF,0xC000,0xFFFF)]==[
+        "sys_module","sys_module","control","packed","packed","cells","cells"]
+    tracer = wb_tracer(regions=[("low",0x0000,0x00FF)])
+    assert tracer.region(0x0010)=="low" and tracer.region(0x0100)=="other"
+    assert set(tracer.stats)=={"low","other"}
+
+def test_record_status():
+    tracer = wb_tracer()
+    burst = burst_cmd.pack(0x2,0xC000,3)
+    assert tracer.record(read_req(0x0000),b"\x00\x01\x02\x03\x04",5,0.0,1e-3)==trace_ok
+    assert tracer.record(read_req(0x0000),b"",5,0.0,2.0)==trace_timeout
+    assert tracer.record(read_req(0x8001),b"\x00\x01",5,0.0,2.0)==trace_short
+    assert tracer.record(write_cmd.pack(0x1,0x8001,7),b"\x00",1,0.0,1e-3)==trace_echo
+    assert tracer.record(burst,b"\x02"+bytes(16),17,0.0,1e-3)==trace_ok
+    sys_mod, control, cells = tracer.stats["sys_module"], tracer.stats["control"], tracer.stats["cells"]
+    assert (sys_mod.reads,sys_mod.writes,sys_mod.errors,sys_mod.rx_bytes)==(2,0,1,5)
+    assert (control.reads,control.writes,control.errors,control.tx_bytes)==(1,1,2,3+7)
+    assert (cells.reads,cells.words,cells.tx_bytes,cells.rx_bytes)==(1,4,4,17)
+    assert [r[7] for r in tracer.errors()]==[trace_timeout,trace_short,trace_echo]
+    assert "other" not in tracer.to_dict()["regions"]
+
+def test_histogram():
+    s = region_stats("test")
+    for lat in (0.5e-6,1e-6,3e-6,3e-6,1e-3,100.0):
+        s.add(False,1,3,5,lat,trace_ok)
+    # Bins are bounded by 1, 2, 4 ... us from above
+    assert s.histogram[0]==2 and s.histogram[2]==2 and s.histogram[-1]==1
+    assert s.histogram[10]==1 # 1 ms <= 1024 us
+    assert sum(s.histogram)==s.count()==6
+    assert s.percentile(0.3)==1e-6
+    assert s.percentile(0.5)==4e-6
+    assert s.percentile(1.0)==s.max_lat==100.0
+    assert region_stats("empty").percentile(0.99)==0.0
+
+def test_ring_buffer():
+    tracer = wb_tracer(capacity=3)
+    for i in range(5):
+        tracer.record(read_req(0x8000+i),b"\x00"+bytes(4),5,i,i+0.5)
+    assert len(tracer.records)==3 and tracer.dropped==2
+    assert [r[3] for r in tracer.records]==[0x8002,0x8003,0x8004]
+    # Statistics cover the dropped records too
+    assert tracer.stats["control"].reads==5
+    tracer.clear()
+    assert len(tracer.records)==0 and tracer.dropped==0 and tracer.records.maxlen==3
+    assert tracer.stats["control"].count()==0
+
+def test_export(tmp_path):
+    tracer = wb_tracer()
+    tracer.record(read_req(0x8003),b"\x00"+bytes(4),5,tracer.t0+1e-3,tracer.t0+2e-3)
+    tracer.record(burst_cmd.pack(0x3,0xC000,1)+bytes(8),b"",1,tracer.t0+3e-3,tracer.t0+4e-3)
+    tracer.export_json(str(tmp_path/"trace.json"))
+    d = json.load(open(str(tmp_path/"trace.json")))
+    assert set(d["regions"])=={"control","cells"}
+    assert [(r["addr"],r["words"],r["status"]) for r in d["records"]]==[(0x8003,1,trace_ok),(0xC000,2,trace_timeout)]
+    assert d["records"][0]["t_send"]==pytest.approx(1e-3)
+    tracer.export_chrome(str(tmp_path/"chrome.json"))
+    events = json.load(open(str(tmp_path/"chrome.json")))["traceEvents"]
+    threads = {e["args"]["name"] : e["tid"] for e in events if (e["ph"]=="M")}
+    assert set(threads)==set(tracer.stats)
+    spans = [e for e in events if (e["ph"]=="X")]
+    assert [(e["name"],e["cat"],e["tid"]) for e in spans]==[("R 0x8003",trace_ok,threads["control"]),("W 0xC000 x2",trace_timeout,threads["cells"])]
+    assert spans[0]["ts"]==pytest.approx(1e3) and spans[0]["dur"]==pytest.approx(1e3)
+
+def test_traced_bus():
+    tracer = wb_tracer()
+    wb = wishbone(fpga_emulator(cas,tab,baudrate=0),tracer=tracer)
+    # The first transfer also reads the version to choose the window
+    wb.read(0x0000)
+    assert tracer.stats["sys_module"].reads==2
+    tracer.clear()
+    wb.read(0x0000)
+    wb.write(0x8001,5)
+    wb.read_burst(0xC000,4)
+    assert tracer.stats["sys_module"].reads==1
+    assert tracer.stats["control"].writes==1
+    assert tracer.stats["cells"].words==4
+    assert tracer.errors()==[]
+    assert all(r[1]>=r[0] for r in tracer.records)
+    wb.close()
@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Computation of fields larger than the automaton in the FPGA
+# The field (a torus, the same as in the FPGA) is split into tiles of the FPGA
+# grid size. Each tile carries a halo of 'h' cells on every side taken from its
+# neighbours, so its interior stays exact for 'h' generations even though the
+# FPGA wraps the tile around. Tiles are computed one after another, 'h'
+# generations per swap, and the interiors are assembled into the next field.
+
+import os
+import sys
+from argparse import ArgumentParser
+from math import ceil
+from time import time
+
+import numpy as np
+
+from wishbone         import write_cmd, read_resp, burst_cmd, max_burst
+from cellular_automat import *
+
+# Tile origins along one axis of length 'size' for interiors of length 'inner'
+def tile_origins(size, inner):
+    if (size<=inner):
+        return [0]
+    return [min(k*inner,size-inner) for k in range(ceil(size/inner))]
+
+class tiled_automat:
+    # 'cell_auto' must be created with shadow=True, 'field' is a (rows,cols) array of cell states.
+    # Transfer times (in seconds) are used by the cost model choosing the halo;
+    # by default they are derived from the UART baud rate.
+    def __init__(self, cell_auto, field, halo=None, baudrate=9600, run_overhead=None):
+        self.cell_auto = cell_auto
+        self.field     = np.array(field,dtype=np.uint8)
+        self.fabric    = (cell_auto.grid_size[1],cell_auto.grid_size[0]) # (rows,cols)
+        # Shadow copy lets sync_grid write only cells differing from the last read tile
+        if (not cell_auto.use_shadow):
+            raise ValueError("Tiling needs the automaton created with shadow=True")
+
+        # Baud rate 0 is the unlimited emulator
+        self.byte_time    = 10.0/baudrate if (baudrate) else 0.0
+        # stop, read generation, set limit, start, two polls, stop
+        self.run_overhead = run_overhead if (run_overhead is not None) else 7*8*self.byte_time
+        self.gen_time     = 0.0
+        if (cell_auto.gen_cycles is not None):
+            self.gen_time = cell_auto.gen_cycles/cell_auto.clk_freq
+
+        self.halo = self.choose_halo() if (halo is None) else halo
+        if (self.fabric!=self.field.shape and 2*self.halo>=min(self.fabric)):
+            raise ValueError("Halo %d leaves no interior in %dx%d tiles" % (self.halo,self.fabric[1],self.fabric[0]))
+
+        self.gen    = 0
+        self.time   = 0.0
+        self.swaps  = 0
+        self.writes = 0
+        self.reads  = 0
+
+    def tiles(self, h):
+        inner = (self.fabric[0]-2*h,self.fabric[1]-2*h)
+        return [(y,x) for y in tile_origins(self.field.shape[0],inner[0]) for x in tile_origins(self.field.shape[1],inner[1])]
+
+    # Bytes sent to write a whole tile (the echos go in parallel), using
+    # the same transfers as cellular_automat.write_grid
+    def write_bytes(self):
+        cells = self.fabric[0]*self.fabric[1]
+        if (self.cell_auto.bursts):
+            return 4*cells+burst_cmd.size*ceil(cells/max_burst)
+        return write_cmd.size*cells
+
+    # Bytes received to read a whole tile (the requests go in parallel), using
+    # the same transfers as cellular_automat.read_grid
+    def read_bytes(self):
+        words = self.fabric[0]*self.fabric[1]
+        if (self.cell_auto.packed is not None):
+            words = ceil(words/self.cell_auto.packed[0])
+        if (self.cell_auto.bursts):
+            return 4*words+ceil(words/max_burst)
+        return read_resp.size*words
+
+    # Estimated time of one generation of the whole field with halo 'h'
+    def cost(self, h):
+        swap = (self.write_bytes()+self.read_bytes())*self.byte_time+self.run_overhead+h*self.gen_time
+        return len(self.tiles(h))*swap/h
+
+    # Halo with the lowest estimated cost; deeper halos need fewer swaps per
+    # generation but more tiles, as the interiors get smaller
+    def choose_halo(self):
+        if (self.fabric==self.field.shape):
+            return 0 # The field wraps around exactly as the FPGA grid does
+        h_max = (min(self.fabric)-1)//2
+        if (h_max<1):
+            raise ValueError("FPGA grid %dx%d is too small for tiling" % (self.fabric[1],self.fabric[0]))
+        return min(range(1,h_max+1),key=self.cost)
+
+    # Compute 'n' generations of the field
+    def step(self, n):
+        t = time()
+        if (self.halo==0):
+            self.writes += self.cell_auto.sync_grid(self.field)
+            self.cell_auto.run_generations(n)
+            self.field = np.asarray(self.cell_auto.read_grid(),dtype=np.uint8)
+            self.swaps += 1
+            self.reads += self.field.size
+            self.gen += n
+            n = 0
+        h = self.halo
+        rows, cols = self.field.shape
+        while (n>0):
+            k = min(h,n)
+            new = self.field.copy()
+            for y0,x0 in self.tiles(h):
+                ty = (np.arange(-h,self.fabric[0]-h)+y0)%rows
+                tx = (np.arange(-h,self.fabric[1]-h)+x0)%cols
+                self.writes += self.cell_auto.sync_grid(self.field[np.ix_(ty,tx)])
+                self.cell_auto.run_generations(k)
+                tile = np.asarray(self.cell_auto.read_grid(),dtype=np.uint8)
+                self.reads += tile.size
+                ny = min(self.fabric[0]-2*h,rows)
+                nx = min(self.fabric[1]-2*h,cols)
+                new[y0:y0+ny,x0:x0+nx] = tile[h:h+ny,h:h+nx]
+                self.swaps += 1
+            self.field = new
+            n -= k
+            self.gen += k
+        self.time += time()-t
+        return self.field
+
+    def gen_per_s(self):
+        return self.gen/self.time if (self.time>0) else 0.0
+
+    def report(self):
+        print("Field %dx%d on %dx%d FPGA grid, halo %d, %d tiles" % (self.field.shape[1],self.field.shape[0],self.fabric[1],self.fabric[0],self.halo,len(self.tiles(self.halo)) if (self.halo) else 1))
+        print("Generations: %d, swaps: %d, cells written: %d, cells read: %d" % (self.gen,self.swaps,self.writes,self.reads))
+        print("Time: %.3f s, effective speed: %.2f generations per second" % (self.time,self.gen_per_s()))
+        if (self.halo):
+            cost = self.cost(self.halo)
+            print("Speed estimated by the cost model: %s generations per second" % ("%.2f" % (1/cost) if (cost>0) else "unlimited"))
+
+if __name__ == '__main__':
+    from wishbone import wishbone
+
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("field_file",help="Name of '.cas' (or '.cab') file with the initial state of the large field")
+    parser.add_argument("--port",default="COM4",help="Target device serial port name (default: COM4)")
+    parser.add_argument("--emulate",nargs=2,metavar=("CAS","TAB"),help="Use the emulator loaded with given '.cas' and '.tab' files instead of a device")
+    parser.add_argument("--rom_ways",type=int,default=4,help="ROM ways of the emulated configuration (default: 4)")
+    parser.add_argument("--baudrate",type=int,default=9600,help="UART baud rate (default: 9600)")
+    parser.add_argument("--gen_cycles",type=int,default=None,help="GEN_CYCLES of the loaded configuration (default: unknown)")
+    parser.add_argument("--gens",type=int,default=8,help="Number of generations to compute (default: 8)")
+    parser.add_argument("--halo",type=int,default=None,help="Halo depth (default: chosen by the cost model)")
+    parser.add_argument("--validate",default=None,metavar="TAB",help="Compare the result with the software model running this '.tab' file")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","config"))
+    from cell_auto_engine import cell_auto_engine
+    from cell_auto_bin    import is_cab_file, cab_file
+
+    gen_cycles = args.gen_cycles
+    if (args.emulate):
+        from fpga_emulator import fpga_emulator
+        emu = fpga_emulator(args.emulate[0],args.emulate[1],args.rom_ways,baudrate=args.baudrate)
+        if (emu.error!=0):
+            exit(emu.error)
+        gen_cycles = emu.gen_cycles
+        wb = wishbone(emu)
+    else:
+        wb = wishbone(args.port,args.baudrate)
+
+    cell_auto = cellular_automat(wb,0x8000,shadow=True,gen_cycles=gen_cycles)
+    cell_auto.reset()
+
+    if (is_cab_file(args.field_file)):
+        cab = cab_file(args.field_file)
+        field = cab.cells()
+        cab.close()
+    else:
+        field = np.loadtxt(args.field_file,dtype=np.uint8,ndmin=2)
+
+    # Software model computing the same field
+    reference = None
+    tab = args.validate if (args.validate) else args.emulate[1] if (args.emulate) else None
+    if (tab is not None):
+        reference = cell_auto_engine(tab)
+        if (reference.error!=0):
+            exit(reference.error)
+        reference.set_state(field)
+
+    tiled = tiled_automat(cell_auto,field,args.halo,args.baudrate)
+    tiled.step(args.gens)
+    tiled.report()
+
+    if (reference is not None):
+        reference.step(args.gens)
+        diff = int(np.count_nonzero(reference.grid!=tiled.field))
+        print("Validation against the software model:","OK" if (diff==0) else "%d cells differ" % (diff))
+        if (diff):
+            sys.exit(1)
+
+    wb.close()
@@ -0,0 +1,335 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Daemon sharing one board among many local clients
+# The daemon keeps the 'wishbone' connection open and listens on a Unix socket.
+# Clients speak the UART2WBM protocol over the socket (see README), so any
+# script works through it by opening port "unix:<socket>" instead of a serial
+# port. Requests of all clients are collected, taken round-robin (at most
+# 'quantum' requests of each client per round) and sent to the board as one
+# pipelined batch. Reads of static registers are answered from a cache kept for
+# all connections. After a bus error the line is drained and the requests
+# without a response are retried once when none of them is a write (a write
+# may have reached the bus already). Each client with a request left without
+# a response gets an error response (0xFF bytes instead of the echo, so its
+# 'wishbone' raises IOError) and the rest of its queued requests is dropped.
+#
+# Usage:
+#   python3 wb_daemon.py --port COM4 &
+#   python3 benchmark.py --port unix:/tmp/cellular_automaton.sock
+
+import os
+import selectors
+import socket
+from argparse import ArgumentParser
+from time import time
+
+from wishbone import wishbone, frame_len, resp_len, read_resp
+
+default_socket = "/tmp/cellular_automaton.sock"
+
+# Sending to a client which stopped reading must not block the others forever
+send_timeout = 5
+
+# Registers which do not change while the bitstream is loaded:
+# column size, row size and packed format
+static_addrs = [0x8003,0x8004,0x8005]
+
+# The version register is cached too. It is read from the bus again after a bus
+# error, a new version means a new bitstream and empties the cache.
+version_addr = 0x0000
+
+# Serial-port-like client of the daemon (used by 'wishbone' for "unix:" ports)
+class wb_client:
+    def __init__(self, path=default_socket, timeout=2):
+        self.sock = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.name = "unix:"+path
+        self.timeout = timeout
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self._timeout = value
+        self.sock.settimeout(value)
+
+    def write(self, data):
+        self.sock.sendall(data)
+        return len(data)
+
+    # Returns fewer bytes than 'size' when the timeout expires
+    def read(self, size=1):
+        data = bytearray()
+        deadline = time()+(self._timeout or 0)
+        while (len(data)<size):
+            try:
+                chunk = self.sock.recv(size-len(data))
+            except (socket.timeout,BlockingIOError):
+                break
+            if (not chunk):
+                break # daemon closed the connection
+            data += chunk
+            if (self._timeout):
+                left = deadline-time()
+                if (left<=0):
+                    break
+                self.sock.settimeout(left)
+        if (self._timeout):
+            self.sock.settimeout(self._timeout)
+        return bytes(data)
+
+    def reset_input_buffer(self):
+        self.sock.setblocking(False)
+        try:
+            while (self.sock.recv(4096)):
+                pass
+        except BlockingIOError:
+            pass
+        self.sock.settimeout(self._timeout)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.sock.close()
+
+class daemon_client:
+    def __init__(self, sock, name):
+        self.sock = sock
+        self.name = name
+        self.rx   = bytearray()
+        self.reqs = [] # complete requests waiting for the bus
+
+    # Drop requests queued or still in the socket, after an error response
+    # they belong to a transfer the client has given up
+    def discard(self):
+        self.reqs = []
+        self.rx   = bytearray()
+        self.sock.setblocking(False)
+        try:
+            while (self.sock.recv(65536)):
+                pass
+        except OSError:
+            pass
+        self.sock.settimeout(send_timeout)
+
+    # Split received bytes into complete requests
+    def parse(self):
+        while (self.rx):
+            n = frame_len(self.rx)
+            if (len(self.rx)<n):
+                break
+            self.reqs.append(bytes(self.rx[:n]))
+            del self.rx[:n]
+
+class wb_daemon:
+    def __init__(self, wb, path=default_socket, quantum=64, static=static_addrs):
+        self.wb      = wb
+        self.path    = path
+        self.quantum = quantum
+        self.static  = set(static)
+        self.cache   = {} # static address -> response
+        self.version = None # confirmed version response
+        # Window resolved by 'wb' from the version register, again after a bus error
+        self.auto_window = wb.window is None
+        self.clients = []
+        self.next_id = 0
+        self.running = True
+        # Statistics
+        self.requests    = 0
+        self.batches     = 0
+        self.cache_hits  = 0
+        self.bus_errors  = 0
+
+        if (os.path.exists(path)):
+            os.unlink(path) # socket of a previous daemon
+        self.server = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen()
+        self.sel = selectors.DefaultSelector()
+        self.sel.register(self.server,selectors.EVENT_READ)
+
+    def accept(self):
+        sock, addr = self.server.accept()
+        sock.settimeout(send_timeout)
+        client = daemon_client(sock,"client %d" % (self.next_id))
+        self.next_id += 1
+        self.clients.append(client)
+        self.sel.register(sock,selectors.EVENT_READ,client)
+
+    def drop(self, client):
+        self.sel.unregister(client.sock)
+        client.sock.close()
+        self.clients.remove(client)
+
+    def receive(self, client):
+        try:
+            data = client.sock.recv(65536)
+        except OSError:
+            data = b""
+        if (not data):
+            self.drop(client)
+            return
+        client.rx += data
+        client.parse()
+
+    # One round: up to 'quantum' requests of each client go to the bus in one batch
+    def run_batch(self):
+        batch  = [] # (request, expected response length)
+        served = [] # (client, responses: bytes or index into the batch)
+        for client in [c for c in self.clients if (c.reqs)]:
+            reqs = client.reqs[:self.quantum]
+            del client.reqs[:self.quantum]
+            resps = []
+            for r in reqs:
+                if (r[0]==0x0 and int.from_bytes(r[1:3],"little") in self.cache):
+                    resps.append(self.cache[int.from_bytes(r[1:3],"little")])
+                    self.cache_hits += 1
+                else:
+                    resps.append(len(batch))
+                    batch.append((r,resp_len(r)))
+            served.append((client,resps))
+        # Clients served first in this round go last in the next one
+        for client,resps in served:
+            self.clients.remove(client)
+            self.clients.append(client)
+        self.requests += sum(len(resps) for c,resps in served)
+
+        results = []
+        if (batch):
+            self.batches += 1
+            results = self.transfer(batch)
+            # 'wb' reads the version itself when it resolves the window
+            if (self.version is None and version_addr in self.wb.static):
+                self.check_version(read_resp.pack(0x0,self.wb.static[version_addr]))
+            for (r,rlen),resp in zip(batch,results):
+                addr = int.from_bytes(r[1:3],"little")
+                if (r[0]==0x0 and addr==version_addr):
+                    self.check_version(resp)
+                elif (r[0]==0x0 and addr in self.static):
+                    self.cache[addr] = resp
+            if (len(results)<len(batch)):
+                self.send_errors(batch,served,results)
+                return
+
+        for client,resps in served:
+            out = b"".join(results[r] if (isinstance(r,int)) else r for r in resps)
+            try:
+                client.sock.sendall(out)
+            except OSError:
+                self.drop(client)
+
+    # A version read from the bus empties the cache when it differs from the
+    # confirmed one, then it is confirmed and served from the cache
+    def check_version(self, resp):
+        if (resp!=self.version):
+            self.cache   = {}
+            self.version = resp
+        self.cache[version_addr] = resp
+
+    # Batch transfer; after a bus error the requests without a response are
+    # retried once when they are all reads. Returns the responses received,
+    # fewer than requests when the batch failed.
+    def transfer(self, batch):
+        results = []
+        for attempt in range(2):
+            try:
+                results += self.wb.transfer_raw(batch[len(results):])
+                break
+            except IOError as e:
+                self.bus_errors += 1
+                print("Bus error: %s" % (e))
+                results += getattr(e,"resps",[])
+                # Responses to requests in flight would be taken for those of the retry
+                self.wb.drain()
+                if (hasattr(self.wb.uart,"reset_input_buffer")):
+                    self.wb.uart.reset_input_buffer()
+                self.invalidate()
+                rest = batch[len(results):]
+                if (not rest or any(r[0]&0x1 for r,rlen in rest)):
+                    break
+        return results
+
+    # The bitstream may have changed, the version is read from the bus again
+    def invalidate(self):
+        self.cache     = {}
+        self.version   = None
+        self.wb.static = {}
+        if (self.auto_window):
+            self.wb.window = None
+
+    # Clients with requests left without a response get the responses preceding
+    # the first of them and an error response instead of it; their connections stay open
+    def send_errors(self, batch, served, results):
+        for client,resps in served:
+            k = next((k for k,r in enumerate(resps) if (isinstance(r,int) and r>=len(results))),None)
+            out = b"".join(results[r] if (isinstance(r,int)) else r for r in resps[:k])
+            if (k is not None):
+                out += b"\xFF"*batch[resps[k]][1]
+                client.discard()
+            try:
+                client.sock.sendall(out)
+            except OSError:
+                self.drop(client)
+
+    def serve(self):
+        while (self.running):
+            pending = any(c.reqs for c in self.clients)
+            for key,mask in self.sel.select(timeout=0 if (pending) else 0.5):
+                if (key.fileobj is self.server):
+                    self.accept()
+                else:
+                    self.receive(key.data)
+            if (any(c.reqs for c in self.clients)):
+                self.run_batch()
+
+    def report(self):
+        print("Clients: %d, requests: %d, bus batches: %d, static reads from cache: %d, bus errors: %d" % (len(self.clients),self.requests,self.batches,self.cache_hits,self.bus_errors))
+
+    def close(self):
+        for c in list(self.clients):
+            self.drop(c)
+        self.sel.close()
+        self.server.close()
+        if (os.path.exists(self.path)):
+            os.unlink(self.path)
+        self.wb.close()
+
+if __name__ == '__main__':
+    # Define parameters
+    parser = ArgumentParser()
+
+    parser.add_argument("--port",default="COM4",help="Target device serial port name (default: COM4)")
+    parser.add_argument("--emulate",nargs=2,metavar=("CAS","TAB"),help="Serve the emulator loaded with given '.cas' and '.tab' files instead of a device")
+    parser.add_argument("--baudrate",type=int,default=9600,help="UART baud rate (default: 9600)")
+    parser.add_argument("--socket",default=default_socket,help="Path of the Unix socket (default: %s)" % (default_socket))
+    parser.add_argument("--quantum",type=int,default=64,help="Requests of one client sent to the board in each round (default: 64)")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    if (args.emulate):
+        from fpga_emulator import fpga_emulator
+        emu = fpga_emulator(args.emulate[0],args.emulate[1],baudrate=args.baudrate)
+        if (emu.error!=0):
+            exit(emu.error)
+        wb = wishbone(emu)
+    else:
+        wb = wishbone(args.port,args.baudrate)
+
+    daemon = wb_daemon(wb,args.socket,args.quantum)
+    print("Serving the board on unix:%s" % (args.socket))
+    print("Press Ctrl+C to exit.")
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        pass
+    daemon.report()
+    daemon.close()
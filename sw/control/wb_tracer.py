@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+#-------------------------------------------------------------------------------
+# PROJECT: CELLULAR AUTOMATON FPGA
+#-------------------------------------------------------------------------------
+# AUTHORS: Jan Kubalek <kubalekj492@gmail.com>
+# LICENSE: The MIT License, please read LICENSE file
+#-------------------------------------------------------------------------------
+# Tracing of Wishbone transactions
+# A tracer attached to 'wishbone' (or 'async_wishbone') records every UART2WBM
+# request: send and response timestamps, address, direction, number of words,
+# bytes on the wire and failures (timeouts, short reads, wrong echos).
+# Per-region statistics and latency histograms cover all transactions, while
+# individual records are kept in a ring buffer of 'capacity' items (all of
+# them when 'capacity' is None). Records can be exported as JSON or in the
+# Chrome trace format (chrome://tracing, Perfetto).
+#
+# Usage:
+#   tracer = wb_tracer(capacity=10000)
+#   wb = wishbone("COM4",tracer=tracer)
+#   ...
+#   tracer.report()
+#   tracer.export_chrome("trace.json")
+
+import json
+from collections import deque
+from time import perf_counter
+
+# Address regions of the FPGA (host addresses)
+default_regions = [
+    ("sys_module", 0x0000, 0x7FFF),
+    ("control",    0x8000, 0x9FFF),
+    ("packed",     0xA000, 0xBFFF),
+    ("cells",      0xC000, 0xFFFF),
+]
+
+# Upper bounds of latency histogram bins in seconds (powers of 2 from 1 us)
+latency_bins = [2**k*1e-6 for k in range(24)]
+
+# Statuses of records
+trace_ok      = "ok"
+trace_timeout = "timeout" # no byte received
+trace_short   = "short"   # response incomplete
+trace_echo    = "echo"    # echo differs from the command
+
+class region_stats:
+    def __init__(self, name):
+        self.name      = name
+        self.reads     = 0
+        self.writes    = 0
+        self.words     = 0
+        self.tx_bytes  = 0
+        self.rx_bytes  = 0
+        self.errors    = 0
+        self.latency   = 0.0 # sum
+        self.max_lat   = 0.0
+        self.histogram = [0]*(len(latency_bins)+1)
+
+    def add(self, write, words, tx, rx, latency, status):
+        if (write):
+            self.writes += 1
+        else:
+            self.reads += 1
+        self.words    += words
+        self.tx_bytes += tx
+        self.rx_bytes += rx
+        if (status!=trace_ok):
+            self.errors += 1
+        self.latency += latency
+        self.max_lat  = max(self.max_lat,latency)
+        b = 0
+        while (b<len(latency_bins) and latency>latency_bins[b]):
+            b += 1
+        self.histogram[b] += 1
+
+    def count(self):
+        return self.reads+self.writes
+
+    # Latency below which a fraction 'p' of transactions finished (upper bin bound)
+    def percentile(self, p):
+        n = self.count()
+        if (n==0):
+            return 0.0
+        acc = 0
+        for b,c in enumerate(self.histogram):
+            acc += c
+            if (acc>=p*n):
+                return min(latency_bins[b],self.max_lat) if (b<len(latency_bins)) else self.max_lat
+        return self.max_lat
+
+    def to_dict(self):
+        return {
+            "reads"       : self.reads,
+            "writes"      : self.writes,
+            "words"       : self.words,
+            "tx_bytes"    : self.tx_bytes,
+            "rx_bytes"    : self.rx_bytes,
+            "errors"      : self.errors,
+            "mean_s"      : self.latency/self.count() if (self.count()) else 0.0,
+            "max_s"       : self.max_lat,
+            "histogram"   : self.histogram,
+        }
+
+class wb_tracer:
+    def __init__(self, capacity=None, regions=default_regions):
+        self.regions = regions
+        self.stats   = {name : region_stats(name) for name,lo,hi in regions}
+        self.stats["other"] = region_stats("other")
+        # Records: (t_send, t_done, cmd, addr, words, tx bytes, rx bytes, status)
+        self.records = deque(maxlen=capacity)
+        self.dropped = 0
+        self.t0      = perf_counter()
+
+    def region(self, addr):
+        for name,lo,hi in self.regions:
+            if (lo<=addr<=hi):
+                return name
+        return "other"
+
+    # Called by the bus for every request when its response arrived (or failed)
+    # 'req' is the encoded request, 'resp' the received bytes, 'rlen' the expected length
+    def record(self, req, resp, rlen, t_send, t_done):
+        cmd   = req[0]
+        addr  = req[1]|(req[2]<<8)
+        words = req[3]+1 if (cmd&0x2) else 1
+        if (len(resp)==0):
+            status = trace_timeout
+        elif (len(resp)<rlen):
+            status = trace_short
+        elif (resp[0]!=cmd):
+            status = trace_echo
+        else:
+            status = trace_ok
+        self.stats[self.region(addr)].add(cmd&0x1,words,len(req),len(resp),t_done-t_send,status)
+        if (len(self.records)==self.records.maxlen):
+            self.dropped += 1
+        self.records.append((t_send,t_done,cmd,addr,words,len(req),len(resp),status))
+        return status
+
+    def clear(self):
+        self.__init__(self.records.maxlen,self.regions)
+
+    def errors(self):
+        return [r for r in self.records if (r[7]!=trace_ok)]
+
+    def to_dict(self):
+        return {
+            "latency_bins" : latency_bins,
+            "dropped"      : self.dropped,
+            "regions"      : {name : s.to_dict() for name,s in self.stats.items() if (s.count())},
+            "records"      : [{
+                "t_send"   : r[0]-self.t0,
+                "t_done"   : r[1]-self.t0,
+                "cmd"      : r[2],
+                "addr"     : r[3],
+                "words"    : r[4],
+                "tx_bytes" : r[5],
+                "rx_bytes" : r[6],
+                "status"   : r[7],
+            } for r in self.records],
+        }
+
+    def export_json(self, file_name):
+        with open(file_name,"w") as f:
+            json.dump(self.to_dict(),f,indent=1)
+
+    # Chrome trace format: one complete event per transaction, one thread per region
+    def export_chrome(self, file_name):
+        tids = {name : i for i,name in enumerate(self.stats)}
+        events = [{"name":"thread_name","ph":"M","pid":0,"tid":i,"args":{"name":name}} for name,i in tids.items()]
+        for t_send,t_done,cmd,addr,words,tx,rx,status in self.records:
+            events.append({
+                "name" : "%s 0x%04X%s" % ("W" if (cmd&0x1) else "R",addr," x%d" % (words) if (cmd&0x2) else ""),
+                "cat"  : status,
+                "ph"   : "X",
+                "pid"  : 0,
+                "tid"  : tids[self.region(addr)],
+                "ts"   : (t_send-self.t0)*1e6,
+                "dur"  : (t_done-t_send)*1e6,
+                "args" : {"words":words,"tx_bytes":tx,"rx_bytes":rx,"status":status},
+            })
+        with open(file_name,"w") as f:
+            json.dump({"traceEvents":events,"displayTimeUnit":"ms"},f)
+
+    def report(self):
+        print("%-12s %8s %8s %9s %10s %10s %7s %10s %10s %10s" % ("region","reads","writes","words","tx bytes","rx bytes","errors","mean [ms]","p99 [ms]","max [ms]"))
+        for name,s in self.stats.items():
+            if (s.count()==0):
+                continue
+            print("%-12s %8d %8d %9d %10d %10d %7d %10.3f %10.3f %10.3f" % (name,s.reads,s.writes,s.words,s.tx_bytes,s.rx_bytes,s.errors,
+                s.latency/s.count()*1e3,s.percentile(0.99)*1e3,s.max_lat*1e3))
+        if (self.dropped):
+            print("%d oldest records dropped from the ring buffer" % (self.dropped))
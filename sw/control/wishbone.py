@@ -7,35 +7,244 @@
 #-------------------------------------------------------------------------------
 
 import serial
+import threading
+from collections import deque
+from struct import Struct
+from time import perf_counter
 
 byteorder="little"
 
+# UART2WBM framing
+# Read:        cmd(0x0), addr(2)                  -> echo(1), data(4)
+# Write:       cmd(0x1), addr(2), data(4)         -> echo(1)
+# Burst read:  cmd(0x2), addr(2), len(1)          -> echo(1), data(4*(len+1))
+# Burst write: cmd(0x3), addr(2), len(1), data(4*(len+1)) -> echo(1)
+# Bursts access len+1 words at incrementing addresses.
+read_cmd  = Struct("<BH")
+write_cmd = Struct("<BHI")
+read_resp = Struct("<BI")
+burst_cmd = Struct("<BHB")
+
+# Maximum number of words in one burst
+max_burst = 256
+
+# System module version of the first bitstream supporting bursts
+burst_version = 0x20261016
+
+# System module versions of the original bitstream and of the current one
+base_version = 0x20241229
+sys_version  = burst_version
+
+# System module version of the first bitstream with the RX FIFO in UART2WBM
+# (the FIFO came before bursts, but the version was only changed with them)
+fifo_version = burst_version
+
+# System module version of the first bitstream with the Packed Cells Format
+# and Checksum Registers (added with the bursts)
+packed_version = burst_version
+
+# Number of request bytes which may be sent ahead of the responses.
+# Must not exceed the size of the RX FIFO in UART2WBM (2**RX_FIFO_WIDTH-1 bytes).
+# Window 0 sends each request only after the previous one is finished,
+# UART2WBM without the RX FIFO loses bytes received while it sends a response.
+default_window = 256
+
+# After a failed transfer, responses still on their way are discarded until
+# no byte comes for this time (seconds)
+quiet_time = 0.05
+
+# Length of the request starting with bytes 'frame' (at least 4 bytes are
+# needed to know the length of a burst write)
+def frame_len(frame):
+    cmd = frame[0]
+    if (cmd&0x2):
+        if (len(frame)<4):
+            return 4
+        return 4+4*(frame[3]+1) if (cmd&0x1) else 4
+    return write_cmd.size if (cmd&0x1) else read_cmd.size
+
+# Length of the response to a complete request
+def resp_len(frame):
+    cmd = frame[0]
+    if (cmd&0x1):
+        return 1
+    return 1+4*(frame[3]+1) if (cmd&0x2) else read_resp.size
+
+# Encoded burst requests for transfer_raw
+def burst_read_reqs(addr,n):
+    reqs = []
+    for a in range(addr,addr+n,max_burst):
+        k = min(max_burst,addr+n-a)
+        reqs.append((burst_cmd.pack(0x2,a,k-1),1+4*k))
+    return reqs
+
+def burst_write_reqs(addr,values):
+    reqs = []
+    for i in range(0,len(values),max_burst):
+        chunk = values[i:i+max_burst]
+        reqs.append((burst_cmd.pack(0x3,addr+i,len(chunk)-1)+Struct("<%dI" % (len(chunk))).pack(*chunk),1))
+    return reqs
+
+# Read words of burst responses (write echos contain none)
+def decode_bursts(resps):
+    values = []
+    for r in resps:
+        values += Struct("<%dI" % ((len(r)-1)//4)).unpack_from(r,1)
+    return values
+
+# Bus error of a transfer, 'resps' are the responses received before it
+class wb_error(IOError):
+    def __init__(self, msg, resps):
+        IOError.__init__(self,msg)
+        self.resps = resps
+
 class wishbone:
-    def __init__(self, port="COM1", baudrate=9600):
-        self.uart = serial.Serial(port, baudrate, timeout=2)
+    def __init__(self, port="COM1", baudrate=9600, window=None, tracer=None):
+        # 'port' is either a serial port name, "unix:" followed by the socket
+        # of wb_daemon, or an open serial-port-like object (e.g. fpga_emulator)
+        # 'window' None means default_window when the version register says
+        # the bitstream has the RX FIFO, 0 otherwise (see fifo_window)
+        # 'tracer' records all transactions (see wb_tracer)
+        if (isinstance(port,str) and port.startswith("unix:")):
+            from wb_daemon import wb_client
+            self.uart = wb_client(port[5:],timeout=2)
+            # The daemon buffers requests, it checks the bitstream itself
+            if (window is None):
+                window = default_window
+        elif (isinstance(port,str)):
+            self.uart = serial.Serial(port, baudrate, timeout=2)
+        else:
+            self.uart = port
+        self.window = window
+        self.queue = []
+        self.tracer = tracer
+        # Transfers of different threads (e.g. frame_capture) must not interleave
+        self.lock = threading.Lock()
+        # Values of registers which do not change while the bitstream is loaded
+        self.static = {}
         print("The UART on " + self.uart.name + " is open.")
         print("The wishbone bus is ready.\n")
 
     def read(self,addr):
-        cmd = 0x0
-        cmd = cmd.to_bytes(1,byteorder)
-        self.uart.write(cmd)
-        addr = addr.to_bytes(2,byteorder)
-        self.uart.write(addr)
-        rbytes=self.uart.read(1)
-        rbytes=self.uart.read(4)
-        drd=int.from_bytes(rbytes,byteorder)
-        return drd
+        return self.transfer([(addr,None)])[0]
 
     def write(self, addr, data):
-        cmd = 0x1
-        cmd = cmd.to_bytes(1,byteorder)
-        self.uart.write(cmd)
-        addr = addr.to_bytes(2,byteorder)
-        self.uart.write(addr)
-        data = data.to_bytes(4,byteorder)
-        self.uart.write(data)
-        rbytes=self.uart.read(1)
+        self.transfer([(addr,data)])
+
+    # Read of a static register (version, grid size, ...), only the first one goes to the bus
+    def read_static(self,addr):
+        if (addr not in self.static):
+            self.static[addr] = self.read(addr)
+        return self.static[addr]
+
+    # Queued (pipelined) transactions
+    # Reads and writes are only queued until flush() is called,
+    # which sends them all as one byte stream and returns
+    # the results in order (read data or None for writes).
+    def queue_read(self,addr):
+        self.queue.append((addr,None))
+
+    def queue_write(self,addr,data):
+        self.queue.append((addr,data))
+
+    def flush(self):
+        trans = self.queue
+        self.queue = []
+        return self.transfer(trans)
+
+    def read_multi(self,addrs):
+        return self.transfer([(a,None) for a in addrs])
+
+    def write_multi(self,addrs,values):
+        self.transfer(list(zip(addrs,values)))
+
+    # Burst access to 'n' words from address 'addr' (needs bitstream version >= burst_version)
+    def read_burst(self,addr,n):
+        return self.transfer_bursts(burst_read_reqs(addr,n))
+
+    def write_burst(self,addr,values):
+        self.transfer_bursts(burst_write_reqs(addr,values))
+
+    # Transfer of requests made by burst_read_reqs/burst_write_reqs (which can be mixed),
+    # returns all read words
+    def transfer_bursts(self,reqs):
+        return decode_bursts(self.transfer_raw(reqs))
+
+    # Pipelined transfer of (addr,data) pairs, data None means read
+    def transfer(self,trans):
+        reqs = []
+        for addr,data in trans:
+            if data is None:
+                reqs.append((read_cmd.pack(0x0,addr),read_resp.size))
+            else:
+                reqs.append((write_cmd.pack(0x1,addr,data),1))
+        resps = self.transfer_raw(reqs)
+        return [read_resp.unpack(r)[1] if len(r)==read_resp.size else None for r in resps]
+
+    # Pipelined transfer of already encoded requests
+    # Each item of 'reqs' is a pair (request bytes, expected response length).
+    # Requests are streamed to the UART while at most 'window' request bytes
+    # wait for their responses; raw responses are returned in order.
+    # Each response must start with the echo of its command.
+    def transfer_raw(self,reqs):
+        with self.lock:
+            return self.transfer_locked(reqs)
+
+    # Window for the connected bitstream, the version read goes to the bus alone
+    def fifo_window(self):
+        self.window = 0
+        try:
+            version = read_resp.unpack(self.transfer_locked([(read_cmd.pack(0x0,0x0000),read_resp.size)])[0])[1]
+        except IOError:
+            self.window = None
+            raise
+        self.static[0x0000] = version
+        self.window = default_window if (version>=fifo_version) else 0
+
+    def transfer_locked(self,reqs):
+        if (self.window is None):
+            self.fifo_window()
+        resps   = []
+        pending = deque()
+        flight  = 0
+        tracer  = self.tracer
+        i = 0
+        while (len(resps)<len(reqs)):
+            # Send as many requests as fit into the window (at least one)
+            chunk = bytearray()
+            t = perf_counter() if (tracer is not None) else 0.0
+            while (i<len(reqs) and (flight==0 or flight+len(reqs[i][0])<=self.window)):
+                chunk += reqs[i][0]
+                flight += len(reqs[i][0])
+                pending.append((i,t))
+                i += 1
+            if (chunk):
+                self.uart.write(chunk)
+            # Collect response of the oldest request
+            e, t = pending.popleft()
+            rlen = reqs[e][1]
+            rbytes = self.uart.read(rlen)
+            if (tracer is not None):
+                tracer.record(reqs[e][0],rbytes,rlen,t,perf_counter())
+            if (len(rbytes)!=rlen):
+                raise wb_error("Wishbone response timeout (%d of %d bytes received)" % (len(rbytes),rlen),resps)
+            if (rbytes[0]!=reqs[e][0][0]):
+                raise wb_error("Wishbone response echo 0x%02X does not match command 0x%02X" % (rbytes[0],reqs[e][0][0]),resps)
+            flight -= len(reqs[e][0])
+            resps.append(rbytes)
+        return resps
+
+    # Drop received bytes until the line is quiet for 'quiet_time'
+    # (responses of requests still in flight after a failed transfer)
+    def drain(self):
+        with self.lock:
+            timeout = self.uart.timeout
+            self.uart.timeout = quiet_time
+            try:
+                while (self.uart.read(4096)):
+                    pass
+            finally:
+                self.uart.timeout = timeout
 
     def close(self):
         self.uart.close()
@@ -64,5 +273,10 @@ if __name__ == '__main__':
     rd = wb.read(0x1)
     print("0x%02X" % rd)
 
+    print("\nPIPELINED READ from 0x0-0x2:")
+    for a in range(3):
+        wb.queue_read(a)
+    print(" ".join("0x%02X" % rd for rd in wb.flush()))
+
     wb.close()
     print("\nThe UART is closed.")